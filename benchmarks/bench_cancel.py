@@ -0,0 +1,60 @@
+# --- benchmarks/bench_cancel.py ---
+"""
+How quickly a StreamHandle.cancel() tears down a live stream.
+
+The stand-in server sends a long, slow reply; after the first chunk arrives we
+cancel and time (a) until the engine's queue gets its end sentinel and (b) until
+the server notices the closed connection on its next write.
+
+Run from the repo root:  python -m benchmarks.bench_cancel --runs 10
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.stand_in_server import start_in_background
+from utils.gemini_client import GeminiClient
+from utils.stream_engine import StreamEngine
+
+HISTORY = [{"role": "user", "parts": [{"text": "Tell me a very long story."}]}]
+
+
+def run(runs, chunk_delay):
+    server, base_url = start_in_background(reply_chunks=[f"word{i} " for i in range(500)], chunk_delay=chunk_delay)
+    engine = StreamEngine()
+    client = GeminiClient(base_url=base_url)
+    to_sentinel, to_server = [], []
+    for _ in range(runs):
+        seen = len(server.disconnects)
+        handle = engine.submit(lambda: client.stream("bench-key-000000", HISTORY, "gemini-bench"))
+        handle.queue.get(timeout=5) # First chunk
+
+        start = time.perf_counter()
+        handle.cancel()
+        while handle.queue.get(timeout=5) is not None:
+            pass
+        to_sentinel.append(time.perf_counter() - start)
+
+        deadline = time.time() + 2
+        while len(server.disconnects) == seen and time.time() < deadline:
+            time.sleep(0.001)
+        if len(server.disconnects) > seen:
+            to_server.append(server.disconnects[-1] - start)
+
+    engine.run(client.aclose(), timeout=2)
+    engine.close()
+    server.shutdown()
+    return to_sentinel, to_server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    to_sentinel, to_server = run(args.runs, args.chunk_delay)
+    print(f"cancel -> stream closed on client: median {statistics.median(to_sentinel) * 1000:6.2f} ms | max {max(to_sentinel) * 1000:6.2f} ms")
+    if to_server:
+        print(f"cancel -> server sees disconnect:  median {statistics.median(to_server) * 1000:6.2f} ms "
+              f"(it only notices on a write, one or two {args.chunk_delay * 1000:.0f} ms intervals later)")
@@ -0,0 +1,150 @@
+# --- benchmarks/bench_capture.py ---
+"""
+Submit-to-request latency of a capture turn: fading the overlay out vs
+capturing with it in place.
+
+"fade" is the old path: fade out in 15 ms steps, withdraw, grab, fade back in.
+"in-place" grabs right away; the overlay is left out of the capture (Windows
+10 2004+) or masked out of the frame. Both drive OverlayApp.on_user_submit()
+in "Capture Fullscreen" mode on a real Tk window and stop the clock when
+process_stream() is called with the image, so no request is sent.
+
+It also compares a capture done the old way (a fresh mss per call, grab and
+encode on the caller's thread) with the persistent CaptureService, where the
+caller only submits a job: how long the caller is blocked, the end-to-end
+latency, and the service's grab/encode times per resolution.
+
+The mask cost on synthetic frames needs no display; the other parts need one
+(use Xvfb on Linux) and are skipped when there is none.
+
+Run from the repo root:  python -m benchmarks.bench_capture --runs 10
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from utils import screen_capture
+from utils.capture_service import CaptureService
+
+RESOLUTIONS = [(1920, 1080), (2560, 1440), (3840, 2160)]
+OVERLAY_RECT = (400, 200, 1100, 700) # The default window size, somewhere on screen
+
+
+def _synthetic_shot(width, height):
+    from mss.screenshot import ScreenShot
+    return ScreenShot(bytearray(os.urandom(width * height * 4)), {"left": 0, "top": 0, "width": width, "height": height})
+
+
+def bench_mask(repeat):
+    for width, height in RESOLUTIONS:
+        times = []
+        for _ in range(repeat):
+            shot = _synthetic_shot(width, height)
+            start = time.perf_counter()
+            screen_capture.mask_rect(shot, OVERLAY_RECT)
+            times.append(time.perf_counter() - start)
+        print(f"[BENCH] mask {width}x{height}: {statistics.median(times) * 1000:6.2f} ms per frame")
+
+
+def _fresh_capture():
+    """The old path: open mss, grab the primary monitor and PNG-encode it, all on the caller's thread."""
+    import mss
+    with mss.mss() as sct:
+        return screen_capture.encode_png(sct.grab(sct.monitors[1]))
+
+
+def bench_service(runs):
+    try:
+        _fresh_capture()
+    except Exception as e:
+        print(f"[BENCH] Capture service part skipped, cannot grab the screen here: {e}")
+        return
+    fresh = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _fresh_capture()
+        fresh.append(time.perf_counter() - start)
+
+    service = CaptureService()
+    blocked, latency = [], []
+    try:
+        service.submit().result() # Starts the thread and opens mss
+        service.timings.clear()
+        for _ in range(runs):
+            start = time.perf_counter()
+            future = service.submit()
+            blocked.append(time.perf_counter() - start)
+            future.result()
+            latency.append(time.perf_counter() - start)
+    finally:
+        service.close()
+    ms = lambda values: f"{statistics.median(values) * 1000:7.2f} ms"
+    print(f"[BENCH] fresh mss, caller thread: blocked {ms(fresh)}")
+    print(f"[BENCH] capture service:          blocked {ms(blocked)}, result after {ms(latency)}")
+    for line in service.summary():
+        print(f"[BENCH]   {line}")
+
+
+def run_ui(runs):
+    """Returns {path: [seconds]}; None (after saying why) if the app cannot start here."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        print(f"[BENCH] Window part skipped, no display: {e}")
+        return None
+    # The app reads and writes settings.json in the working directory; keep the user's untouched
+    os.chdir(tempfile.mkdtemp(prefix="bench-capture-"))
+    try:
+        from ui.main_window import OverlayApp
+        app = OverlayApp(root)
+    except Exception as e:
+        print(f"[BENCH] Window part skipped, the app could not start here: {e}")
+        root.destroy()
+        return None
+    app.autopilot.stop()
+    app.capture_mode_var.set("Capture Fullscreen")
+    app.screen_change_detector.threshold = 0 # Every frame is encoded, like a changed screen
+
+    plan = [path for path in ("fade", "in-place") for _ in range(runs)]
+    results = {"fade": [], "in-place": []}
+    state = {}
+
+    def _process_stream(image, active_context):
+        results[state["path"]].append(time.perf_counter() - state["start"])
+        app.conversation.clear()
+        root.after(600, _next) # Let the fade-in finish before the next turn
+
+    def _next():
+        if not plan:
+            app._shutdown()
+            return
+        state["path"] = path = plan.pop(0)
+        app.settings.capture_in_place = path == "in-place"
+        app._configure_capture_exclusion()
+        app.user_input.delete(0, "end")
+        app.user_input.insert(0, "What's on my screen?")
+        state["start"] = time.perf_counter()
+        app.on_user_submit()
+
+    app.process_stream = _process_stream
+    root.after(500, _next) # Let the window settle first
+    root.mainloop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20, help="Mask timings per resolution")
+    args = parser.parse_args()
+
+    bench_mask(args.repeat)
+    bench_service(args.runs)
+    results = run_ui(args.runs)
+    if results:
+        for path, times in results.items():
+            print(f"[BENCH] {path:>8}: submit -> request {statistics.median(times) * 1000:7.1f} ms median, "
+                  f"{max(times) * 1000:7.1f} ms worst ({len(times)} turns)")
@@ -0,0 +1,98 @@
+# --- benchmarks/bench_chat_view.py ---
+"""
+Cost of showing a loaded session: every bubble packed at once (the old
+rebuild_chat_display) vs the virtualized ChatView, which only creates bubbles
+for the viewport plus overscan and recycles them while scrolling. Also times
+drag-resizing the window, where bubble heights come from cached font metrics.
+
+Needs a display (use Xvfb on Linux); it says so and exits when there is none.
+
+Run from the repo root:  python -m benchmarks.bench_chat_view --messages 300
+"""
+import argparse
+import time
+import tkinter as tk
+
+from benchmarks.bench_render import _Host
+from ui.chat_view import ChatView
+from ui.message_bubble import MessageBubble
+from utils.conversation_store import Message
+
+USER_TEXT = "Can you explain what this stack trace means and how I fix it?"
+MODEL_TEXT = ("The **error** comes from `parse()` being handed an empty string.\n\n"
+              "- Check the input first\n- Then retry\n\n"
+              "```python\nif not text:\n    return None\n```\n") * 3
+
+
+def _messages(count):
+    return [Message.from_text("user", USER_TEXT) if i % 2 == 0 else Message.from_text("model", MODEL_TEXT)
+            for i in range(count)]
+
+
+def _legacy(root, host, messages):
+    canvas = tk.Canvas(root)
+    canvas.pack(fill="both", expand=True)
+    frame = tk.Frame(canvas)
+    canvas.create_window((0, 0), window=frame, anchor="nw", width=660)
+    start = time.perf_counter()
+    for message in messages:
+        MessageBubble(frame, message, host).pack(fill="x", expand=True, padx=20, pady=10)
+    root.update()
+    elapsed = time.perf_counter() - start
+    canvas.destroy()
+    return elapsed, len(messages)
+
+
+def _virtual(root, host, messages, scroll_steps, resizes):
+    canvas = tk.Canvas(root)
+    canvas.pack(fill="both", expand=True)
+    root.update()
+    view = ChatView(canvas, lambda parent, message: MessageBubble(parent, message, host))
+    start = time.perf_counter()
+    view.set_messages(messages)
+    root.update()
+    elapsed = time.perf_counter() - start
+
+    costs = []
+    for step in range(scroll_steps + 1):
+        start = time.perf_counter()
+        canvas.yview_moveto(1 - step / scroll_steps)
+        root.update()
+        costs.append(time.perf_counter() - start)
+
+    resize_costs = []
+    for step in range(resizes):
+        start = time.perf_counter()
+        root.geometry(f"{500 + (step * 7) % 400}x900") # Like dragging the window edge back and forth
+        root.update()
+        resize_costs.append(time.perf_counter() - start)
+    canvas.destroy()
+    return elapsed, view, sorted(costs), sorted(resize_costs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300, help="Messages in the loaded session")
+    parser.add_argument("--scroll-steps", type=int, default=50, help="Jumps from the bottom to the top")
+    parser.add_argument("--resizes", type=int, default=60, help="Window width changes")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SystemExit(f"[BENCH] Needs a display (try xvfb-run): {e}")
+    root.geometry("700x900")
+    host = _Host(root)
+    messages = _messages(args.messages)
+    print(f"[BENCH] Showing a session of {len(messages)} messages")
+
+    seconds, bubbles = _legacy(root, host, messages)
+    print(f"  legacy: {seconds * 1000:8.1f} ms | {bubbles} bubbles")
+    seconds, view, costs, resize_costs = _virtual(root, host, messages, args.scroll_steps, args.resizes)
+    print(f" virtual: {seconds * 1000:8.1f} ms | {view.created} bubbles")
+    print(f"  scroll: p50 {costs[len(costs) // 2] * 1000:.1f} ms / max {costs[-1] * 1000:.1f} ms per jump, "
+          f"{view.created} bubbles created, {view.reused} reuses")
+    measurer = host.text_measurer
+    print(f"  resize: p50 {resize_costs[len(resize_costs) // 2] * 1000:.1f} ms / max {resize_costs[-1] * 1000:.1f} ms "
+          f"per width change | line counts {measurer.hits} cached, {measurer.misses} measured")
+    root.destroy()
@@ -0,0 +1,164 @@
+# --- benchmarks/bench_e2e.py ---
+"""
+End-to-end streaming latency against the local stand-in server.
+
+For each scenario (chunk sizes, pacing, 429s, mid-stream errors, an overloaded
+model) it reports time-to-first-token, chunks/s, total latency, the client's CPU
+time and how many retries and fallbacks the client needed. The server runs in
+its own process so its CPU time is not counted.
+
+With --ui it also drives OverlayApp.process_stream() on a real Tk window (use
+Xvfb on Linux) and measures until the first character is drawn and the reply
+is finalized, plus the render scheduler's frame stats. That part is skipped when no display or UI dependency is available.
+
+Run from the repo root:  python -m benchmarks.bench_e2e --runs 10 [--ui]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.stand_in_server import start_in_subprocess
+from utils.gemini_client import GeminiClient
+from utils.resilience import RetryPolicy
+
+HISTORY = [{"role": "user", "parts": [{"text": "Explain what you see on my screen."}]}]
+LONG_REPLY = ["Here is a fairly long, markdown-flavoured answer. " * 4 + "`code` and **bold** text.\n"] * 20
+
+SCENARIOS = {
+    "small-reply":   dict(),
+    "tiny-chunks":   dict(reply_chunks=LONG_REPLY, chunk_size=8),
+    "large-chunks":  dict(reply_chunks=LONG_REPLY, chunk_size=1024),
+    "paced":         dict(reply_chunks=LONG_REPLY, chunk_size=64, first_chunk_delay=0.2, chunk_delay=0.01),
+    "rate-limited":  dict(rate_limit_every=2, retry_after=0), # Every turn's first try gets a 429
+    "error-midway":  dict(reply_chunks=LONG_REPLY, chunk_size=64, error_after=5),
+    "fallback":      dict(unavailable_models=["gemini-bench"]),
+}
+FALLBACK_MODELS = ["gemini-bench-lite"]
+
+
+class Sample:
+    __slots__ = ("ttft", "total", "cpu", "chunks", "error")
+
+    def __init__(self, ttft, total, cpu, chunks, error):
+        self.ttft, self.total, self.cpu, self.chunks, self.error = ttft, total, cpu, chunks, error
+
+
+async def _one_turn(client):
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    ttft, chunks, error = None, 0, None
+    async for chunk in client.stream("bench-key-000000", HISTORY, "gemini-bench", "You are a benchmark.",
+                                     fallback_models=FALLBACK_MODELS):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        if chunk.startswith("Error"):
+            error = chunk
+        chunks += 1
+    return Sample(ttft, time.perf_counter() - start, time.process_time() - cpu_start, chunks, error)
+
+
+async def run_client(base_url, runs):
+    # Short backoff so the retry scenarios measure the client, not the sleep
+    client = GeminiClient(base_url=base_url, retry_policy=RetryPolicy(base_delay=0.01, max_delay=0.05))
+    try:
+        return [await _one_turn(client) for _ in range(runs)], client.attempt_log.counts()
+    finally:
+        await client.aclose()
+
+
+def run_ui(base_url, runs):
+    """Drives the real Tk app; returns None (after saying why) if it cannot start here."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        print(f"[BENCH] UI path skipped, no display: {e}")
+        return None
+    # The app reads and writes settings.json in the working directory; keep the user's untouched
+    os.chdir(tempfile.mkdtemp(prefix="bench-e2e-"))
+    os.environ["GEMINI_BASE_URL"] = base_url
+    try:
+        from ui.main_window import OverlayApp
+        from utils.conversation_store import Message
+        app = OverlayApp(root)
+    except Exception as e:
+        print(f"[BENCH] UI path skipped, the app could not start here: {e}")
+        root.destroy()
+        return None
+    app.settings.api_key = "bench-key-000000"
+    app.autopilot.stop()
+
+    samples, marks = [], {}
+    on_stream_text, finalize_stream = app._on_stream_text, app._finalize_stream
+
+    def _on_text(*args, **kwargs):
+        marks.setdefault("first", time.perf_counter())
+        return on_stream_text(*args, **kwargs)
+
+    def _finalize(*args, **kwargs):
+        finalize_stream(*args, **kwargs)
+        end = time.perf_counter()
+        first = marks.get("first", end)
+        samples.append(Sample(first - marks["start"], end - marks["start"],
+                              time.process_time() - marks["cpu"], None, None))
+        root.after(0, _next_turn)
+
+    def _next_turn():
+        if len(samples) == runs:
+            print(f"[BENCH] Render scheduler: {app.render_scheduler.stats.summary()}")
+            app._shutdown()
+            return
+        marks.clear()
+        app.clear_chat(feedback=False)
+        app.conversation.append(Message.from_text("user", HISTORY[0]["parts"][0]["text"]))
+        marks["cpu"], marks["start"] = time.process_time(), time.perf_counter()
+        app.process_stream(None, "Benchmark")
+
+    app._on_stream_text, app._finalize_stream = _on_text, _finalize
+    root.after(500, _next_turn) # Let the window settle first
+    root.mainloop()
+    return samples
+
+
+def _ms(values):
+    return f"{statistics.median(values) * 1000:8.2f} ms" if values else "     n/a   "
+
+
+def _report(name, samples, attempts=None):
+    ttfts = [s.ttft for s in samples if s.ttft is not None]
+    totals = [s.total for s in samples]
+    rates = [s.chunks / (s.total - s.ttft) for s in samples if s.chunks and not s.error and s.ttft is not None and s.total > s.ttft]
+    errors = sum(1 for s in samples if s.error)
+    rate = f"{statistics.median(rates):9.0f}" if rates else "      n/a"
+    print(f"{name:>13} | TTFT {_ms(ttfts)} | total {_ms(totals)} | {rate} chunks/s | "
+          f"CPU {_ms([s.cpu for s in samples])} | errors {errors}/{len(samples)}"
+          + (f" | retries {attempts.get('retry', 0)}, fallbacks {attempts.get('fallback', 0)}" if attempts else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="Only run these scenarios (repeatable)")
+    parser.add_argument("--ui", action="store_true", help="Also drive process_stream() on a real Tk window")
+    args = parser.parse_args()
+
+    print(f"[BENCH] {args.runs} runs per scenario, medians shown")
+    for name in args.scenario or SCENARIOS:
+        process, base_url = start_in_subprocess(**SCENARIOS[name])
+        try:
+            _report(name, *asyncio.run(run_client(base_url, args.runs)))
+        finally:
+            process.terminate()
+
+    if args.ui:
+        process, base_url = start_in_subprocess(**SCENARIOS["paced"])
+        try:
+            samples = run_ui(base_url, args.runs)
+            if samples:
+                _report("ui:paced", samples)
+        finally:
+            process.terminate()
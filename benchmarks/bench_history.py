@@ -0,0 +1,59 @@
+# --- benchmarks/bench_history.py ---
+"""
+Per-turn history overhead: what it costs to turn the conversation into a
+request payload before anything goes over the wire.
+
+"deepcopy" is the old path (one deepcopy in process_stream, another in the client).
+"store" is a ConversationStore snapshot plus window_history(), which builds the
+request contents (with a budget that keeps every message, so both do the same work).
+
+Run from the repo root:  python -m benchmarks.bench_history
+"""
+import argparse
+import copy
+import time
+
+from utils.conversation_store import ConversationStore, Message
+from utils.history_window import window_history
+
+USER_TEXT = "Can you explain what this error in my terminal means and how to fix it? " * 2
+MODEL_TEXT = "Sure! That traceback means the module could not be found. Here's how to fix it:\n\n```bash\npip install -r requirements.txt\n```\n" * 4
+
+
+def _build(n):
+    dicts, store = [], ConversationStore()
+    for i in range(n):
+        role, text = ("user", USER_TEXT) if i % 2 == 0 else ("model", MODEL_TEXT)
+        dicts.append({"role": role, "parts": [{"text": text}]})
+        store.append(Message.from_text(role, text))
+    return dicts, store
+
+
+def _deepcopy_turn(history):
+    history_for_api = copy.deepcopy(history)       # OverlayApp.process_stream
+    return copy.deepcopy(history_for_api)          # get_gemini_response_stream
+
+
+def _store_turn(store):
+    snapshot = store.snapshot()                    # OverlayApp.process_stream
+    return window_history(snapshot, float("inf")).contents # GeminiClient.stream gets this list
+
+
+def _per_turn(func, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'messages':>9} | {'deepcopy':>12} | {'store':>12} | speed-up")
+    for n in (10, 100, 1000):
+        dicts, store = _build(n)
+        old = _per_turn(_deepcopy_turn, dicts, args.repeat)
+        new = _per_turn(_store_turn, store, args.repeat)
+        print(f"{n:>9} | {old * 1e6:9.1f} us | {new * 1e6:9.1f} us | {old / new:6.1f}x")
@@ -0,0 +1,134 @@
+# --- benchmarks/bench_image_encoding.py ---
+"""
+Screenshot encoding: encode time vs payload size vs time-to-first-token.
+
+Each strategy encodes synthetic screens at 1080p, 1440p and 4K, then the
+result is sent through GeminiClient to the local stand-in server, which reads
+the request no faster than --upload-kbps (a home uplink by default; 0 for
+loopback speed). TTFT runs from stream() to the first text chunk, so it covers
+base64, the JSON body and the upload.
+
+  png (old)   full resolution, mss' own PNG encoder (the path before this change)
+  lossless    ImageEncoder with no byte budget: downscaled PNG
+  NNN KB      ImageEncoder with that byte budget: PNG if it fits, else JPEG/WebP
+
+"text" screens are dark text on a light page (an editor or a web page); "mixed"
+screens have a gradient-and-noise photo in the bottom half, which PNG handles
+badly. Needs Pillow.
+
+Run from the repo root:  python -m benchmarks.bench_image_encoding --runs 5
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks.stand_in_server import start_in_subprocess
+from utils import screen_capture
+from utils.gemini_client import GeminiClient
+from utils.image_encoder import DEFAULT_MAX_EDGE, ImageEncoder
+
+RESOLUTIONS = [(1920, 1080), (2560, 1440), (3840, 2160)]
+BUDGETS_KB = (800, 400, 200)
+HISTORY = [{"role": "user", "parts": [{"text": "What's on my screen?"}]}]
+
+
+def synthetic_shot(width, height, mixed):
+    """An mss ScreenShot of a text page, optionally with a photo-like bottom half."""
+    import numpy as np
+    from mss.screenshot import ScreenShot
+    from PIL import Image, ImageDraw
+    page = Image.new("RGB", (width, height), (245, 245, 245))
+    draw = ImageDraw.Draw(page)
+    rng = random.Random(1)
+    text_rows = height // 2 if mixed else height
+    for y in range(0, text_rows, 18):
+        line = "".join(rng.choice("abcdefghij klmnop qrstuv wxyz(){}=;") for _ in range(rng.randint(20, width // 8)))
+        draw.text((20, y), line, fill=(20, 20, 20))
+    pixels = np.array(page)
+    if mixed:
+        rows = height - height // 2
+        yy, xx = np.mgrid[0:rows, 0:width]
+        photo = pixels[height // 2:]
+        photo[..., 0] = xx * 255 // width
+        photo[..., 1] = yy * 255 // rows
+        photo[..., 2] = np.random.default_rng(1).integers(0, 60, (rows, width))
+    bgra = np.dstack([pixels[..., 2], pixels[..., 1], pixels[..., 0], np.full((height, width), 255, np.uint8)])
+    return ScreenShot(bytearray(bgra.tobytes()), {"left": 0, "top": 0, "width": width, "height": height})
+
+
+class _OldPng:
+    """The pre-ImageEncoder path, shaped like an EncodedImage."""
+    mime_type = "image/png"
+
+    def __init__(self, shot):
+        self.data = screen_capture.encode_png(shot)
+
+
+def strategies(max_edge):
+    yield "png (old)", _OldPng
+    yield "lossless", ImageEncoder(max_edge, 0).encode
+    for budget in BUDGETS_KB:
+        yield f"{budget} KB", ImageEncoder(max_edge, budget * 1000).encode
+
+
+async def _time_to_first_token(client, image):
+    start = time.perf_counter()
+    elapsed = None
+    async for chunk in client.stream("bench-key-000000", HISTORY, "gemini-bench", "You are a benchmark.",
+                                     image.data, "Benchmark", image_mime_type=image.mime_type):
+        if elapsed is None:
+            elapsed = time.perf_counter() - start
+            if chunk.startswith("Error"):
+                raise RuntimeError(chunk)
+    return elapsed
+
+
+async def measure_ttft(base_url, images, runs):
+    """images: [(label, image)] -> {label: median TTFT seconds}"""
+    client = GeminiClient(base_url=base_url)
+    try:
+        await _time_to_first_token(client, images[0][1]) # Open the pooled connection first
+        results = {}
+        for label, image in images:
+            results[label] = statistics.median([await _time_to_first_token(client, image) for _ in range(runs)])
+        return results
+    finally:
+        await client.aclose()
+
+
+def run(runs, max_edge, upload_kbps):
+    process, base_url = start_in_subprocess(upload_kbps=upload_kbps)
+    uplink = f"{upload_kbps / 1000:g} Mbit/s uplink" if upload_kbps else "no upload cap"
+    print(f"[BENCH] Stand-in at {base_url}, {uplink}, long edge {max_edge or 'full'}, {runs} runs each")
+    try:
+        for width, height in RESOLUTIONS:
+            for mixed in (False, True):
+                shot = synthetic_shot(width, height, mixed)
+                images = []
+                for label, encode in strategies(max_edge):
+                    times = []
+                    for _ in range(runs):
+                        start = time.perf_counter()
+                        image = encode(shot)
+                        times.append(time.perf_counter() - start)
+                    images.append((label, image, statistics.median(times)))
+                ttft = asyncio.run(measure_ttft(base_url, [(label, image) for label, image, _ in images], runs))
+                print(f"[BENCH] {width}x{height} {'mixed' if mixed else 'text'}:")
+                for label, image, encode_s in images:
+                    described = image.describe() if hasattr(image, "describe") else f"PNG {width}x{height}"
+                    print(f"[BENCH]   {label:>10}: encode {encode_s * 1000:7.1f} ms | {len(image.data) // 1024:6d} KB "
+                          f"| TTFT {ttft[label] * 1000:7.1f} ms | encode+TTFT {(encode_s + ttft[label]) * 1000:7.1f} ms "
+                          f"| {described}")
+    finally:
+        process.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-edge", type=int, default=DEFAULT_MAX_EDGE, help="Long-edge limit in px (0 = full)")
+    parser.add_argument("--upload-kbps", type=int, default=20_000, help="Stand-in upload cap in kilobits/s (0 = none)")
+    args = parser.parse_args()
+    run(args.runs, args.max_edge, args.upload_kbps)
@@ -0,0 +1,109 @@
+# --- benchmarks/bench_input_activity.py ---
+"""
+Per-event cost of the input-activity hook, and of reading it.
+
+The keyboard and mouse hooks call the monitor on every key press and release
+and every mouse move, so the callback has to stay in the microseconds (Windows
+drops low-level hooks that are slow to return). "lock-free" is the callback the
+app installs; "locked" is the same bookkeeping behind a threading.Lock, for
+comparison. Mouse moves are timed too; most of them only update the idle time
+(they count towards the rate once per MOVE_SAMPLE_S). Reads (idle seconds,
+events per minute) happen once per Autopilot tick, but are timed too. A second
+thread reading in a tight loop checks that readers don't slow the hook down.
+
+Events are fed straight to the callbacks, so no hook, display or permission is
+needed. Exits 1 when the callback is over --budget-us.
+
+Run from the repo root:  python -m benchmarks.bench_input_activity --events 200000
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+
+from utils.input_activity import InputActivityMonitor, _Channel, _key_action, _mouse_action
+
+
+class _KeyEvent:
+    """Shaped like keyboard.KeyboardEvent as far as the monitor looks."""
+    event_type = "down"
+
+
+class _MoveEvent:
+    """Shaped like mouse.MoveEvent: no button."""
+    x = y = 0
+
+
+class _LockedChannel(_Channel):
+    __slots__ = ("lock",)
+
+    def __init__(self, name, half_life, action):
+        super().__init__(name, half_life, action)
+        self.lock = threading.Lock()
+
+    def on_event(self, event=None):
+        with self.lock:
+            super().on_event(event)
+
+
+def per_event_ns(callback, events, repeat, event=None):
+    """Median ns per call over 'repeat' batches of 'events' calls."""
+    batches = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(events):
+            callback(event)
+        batches.append((time.perf_counter_ns() - start) / events)
+    return statistics.median(batches)
+
+
+def run(events, repeat):
+    monitor = InputActivityMonitor()
+    monitor._started = time.monotonic() # As after start(), without installing real hooks
+    keyboard = _Channel("keyboard", monitor.half_life, _key_action)
+    mouse = _Channel("mouse", monitor.half_life, _mouse_action)
+    monitor.channels = [keyboard, mouse]
+
+    key = _KeyEvent()
+    results = {
+        "lock-free": per_event_ns(keyboard.on_event, events, repeat, key),
+        "locked": per_event_ns(_LockedChannel("keyboard", monitor.half_life, _key_action).on_event, events, repeat, key),
+        "mouse move": per_event_ns(mouse.on_event, events, repeat, _MoveEvent()),
+    }
+
+    stop = threading.Event()
+    reads = [0]
+
+    def _reader():
+        while not stop.is_set():
+            monitor.seconds_since_input()
+            monitor.rate_per_min()
+            reads[0] += 1
+
+    reader = threading.Thread(target=_reader, daemon=True)
+    reader.start()
+    results["lock-free, busy reader"] = per_event_ns(keyboard.on_event, events, repeat, key)
+    stop.set()
+    reader.join()
+
+    read_ns = per_event_ns(lambda _: (monitor.seconds_since_input(), monitor.rate_per_min()), events // 10, repeat)
+    return results, read_ns, monitor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200_000, help="Events per batch")
+    parser.add_argument("--repeat", type=int, default=5, help="Batches per measurement")
+    parser.add_argument("--budget-us", type=float, default=5.0, help="Max callback cost per event")
+    args = parser.parse_args()
+
+    results, read_ns, monitor = run(args.events, args.repeat)
+    for name, ns in results.items():
+        print(f"[BENCH] {name:>22}: {ns / 1000:6.3f} us per event")
+    print(f"[BENCH] {'read idle + rate':>22}: {read_ns / 1000:6.3f} us per read ({monitor.describe()})")
+    worst = max(results["lock-free"], results["mouse move"], results["lock-free, busy reader"]) / 1000
+    if worst > args.budget_us:
+        print(f"[BENCH] Over budget: {worst:.3f} us per event > {args.budget_us} us")
+        sys.exit(1)
+    print(f"[BENCH] Within budget: {worst:.3f} us per event <= {args.budget_us} us")
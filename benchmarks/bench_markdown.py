@@ -0,0 +1,95 @@
+# --- benchmarks/bench_markdown.py ---
+"""
+Throughput of the streaming markdown tokenizer on large model-style replies.
+
+"whole" tokenizes a finished reply in one call (rebuild_chat_display).
+"stream" feeds it in small chunks, as a live reply arrives.
+"reparse" is the old approach for comparison: every chunk re-parses the whole
+buffer so far, which is what set_text() did for each streamed character.
+
+Run from the repo root:  python -m benchmarks.bench_markdown --kb 200
+"""
+import argparse
+import time
+
+from ui.markdown_stream import MarkdownStream, render_segments
+
+REPLY_BLOCK = (
+    "## Step {n}: what changed\n\n"
+    "The **client** keeps a single connection open and the *engine* streams every "
+    "request; `process_stream()` only touches the Tk thread. Some snake_case_names "
+    "and a lone 2 * 3 should stay as they are.\n\n"
+    "- First, the **pool** is created once\n"
+    "- Then each turn reuses it\n"
+    "1. Numbered items work too\n\n"
+    "```python\n"
+    "async def stream(self, prompt):\n"
+    "    async for chunk in self.http.stream(prompt):  # **not bold**\n"
+    "        yield chunk\n"
+    "```\n\n"
+)
+
+
+def _reply(kb):
+    text, n = "", 1
+    while len(text) < kb * 1024:
+        text += REPLY_BLOCK.format(n=n)
+        n += 1
+    return text
+
+
+def _legacy_parse(text):
+    # The old set_text() parser: fenced blocks only, over the whole text
+    out, in_code = [], False
+    for line in text.split("\n"):
+        if line.strip().startswith("```"):
+            in_code = not in_code
+            continue
+        out.append((line + "\n", "code_block" if in_code else None))
+    return out
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _stream(text, chunk):
+    def run():
+        stream = MarkdownStream()
+        for i in range(0, len(text), chunk):
+            stream.feed(text[i:i + chunk])
+        stream.flush()
+    return run
+
+
+def _reparse(text, chunk):
+    def run():
+        for i in range(chunk, len(text) + chunk, chunk):
+            _legacy_parse(text[:i])
+    return run
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", type=int, default=200, help="Reply size")
+    parser.add_argument("--chunk", type=int, default=40, help="Characters per streamed chunk")
+    parser.add_argument("--reparse-kb", type=int, default=50, help="Size cap for the slow re-parse run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = _reply(args.kb)
+    mb = len(text.encode("utf-8")) / 1_000_000
+    print(f"[BENCH] {len(text) // 1024} KB reply, {args.chunk}-character chunks, best of {args.repeat}")
+    for name, fn in (("whole", lambda: render_segments(text)), ("stream", _stream(text, args.chunk))):
+        seconds = _time(fn, args.repeat)
+        print(f"{name:>8}: {seconds * 1000:8.1f} ms | {mb / seconds:6.1f} MB/s")
+
+    small = text[:args.reparse_kb * 1024]
+    seconds = _time(_reparse(small, args.chunk), 1)
+    print(f"{'reparse':>8}: {seconds * 1000:8.1f} ms for only {len(small) // 1024} KB "
+          f"| {len(small.encode('utf-8')) / 1_000_000 / seconds:6.2f} MB/s")
@@ -0,0 +1,90 @@
+# --- benchmarks/bench_render.py ---
+"""
+Per-chunk cost of drawing a streamed reply into a MessageBubble as it grows.
+
+"set_text" is the old path: every chunk redraws the whole reply.
+"append" is MessageBubble.append_text(): only the new chunk is parsed and inserted.
+
+Needs a display (use Xvfb on Linux); it says so and exits when there is none.
+
+Run from the repo root:  python -m benchmarks.bench_render --kb 40
+"""
+import argparse
+import statistics
+import time
+import tkinter as tk
+
+from ui.code_highlighter import CodeHighlighter
+from ui.message_bubble import MessageBubble, BODY_FONT, TAG_FONTS, TAG_MARGINS
+from ui.text_measure import TextMeasurer
+from utils.conversation_store import Message
+from utils.theme_manager import ThemeProvider
+
+PARAGRAPH = ("Here is how the pieces fit together. The **client** keeps one connection open, "
+             "and the `engine` runs every request on its own loop.\n\n")
+CODE = "```python\nfor chunk in stream:\n    bubble.append_text(chunk)\n```\n\n"
+
+
+class _Host:
+    """The parts of the app MessageBubble uses."""
+    def __init__(self, root):
+        self.theme_provider = ThemeProvider("dark")
+        self.current_theme = tk.StringVar(root, value="dark")
+        self.code_highlighter = CodeHighlighter(root)
+        self.text_measurer = TextMeasurer(root, BODY_FONT, TAG_FONTS, TAG_MARGINS)
+
+    def copy_to_clipboard(self, text):
+        pass
+
+
+def _reply(kb):
+    text = ""
+    while len(text) < kb * 1024:
+        text += PARAGRAPH * 3 + CODE
+    return text[:kb * 1024]
+
+
+def _run(root, host, text, chunk_size, mode):
+    bubble = MessageBubble(root, Message.from_text("model", ""), host)
+    bubble.pack(fill="x")
+    root.update()
+    costs, buffer = [], ""
+    for i in range(0, len(text), chunk_size):
+        chunk = text[i:i + chunk_size]
+        start = time.perf_counter()
+        if mode == "append":
+            bubble.append_text(chunk)
+        else:
+            buffer += chunk
+            bubble.set_text(buffer)
+        root.update_idletasks() # Include the layout work the chunk causes
+        costs.append(time.perf_counter() - start)
+    bubble.destroy()
+    return costs
+
+
+def _report(mode, costs, chunk_size):
+    per_kb = max(1, 1024 // chunk_size)
+    buckets = [costs[i:i + 10 * per_kb] for i in range(0, len(costs), 10 * per_kb)]
+    cells = " | ".join(f"{(n + 1) * 10:>3} KB {statistics.median(b) * 1000:7.3f} ms" for n, b in enumerate(buckets))
+    print(f"{mode:>8}: {cells}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", type=int, default=40, help="Reply size")
+    parser.add_argument("--chunk", type=int, default=40, help="Characters per streamed chunk")
+    parser.add_argument("--legacy-kb", type=int, default=20, help="Stop the slow set_text run at this size")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SystemExit(f"[BENCH] Needs a display (try xvfb-run): {e}")
+    root.geometry("700x900")
+    host = _Host(root)
+    text = _reply(args.kb)
+    print(f"[BENCH] {len(text) // 1024} KB reply in {args.chunk}-character chunks, median cost per chunk by reply size")
+    _report("append", _run(root, host, text, args.chunk, "append"), args.chunk)
+    _report("set_text", _run(root, host, text[:args.legacy_kb * 1024], args.chunk, "set_text"), args.chunk)
+    root.destroy()
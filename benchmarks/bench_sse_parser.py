@@ -0,0 +1,78 @@
+# --- benchmarks/bench_sse_parser.py ---
+"""
+Replays the recorded Gemini streams in benchmarks/recordings/ through the SSE
+parser and reports parse throughput in MB/s.
+
+"legacy" is the old iter_lines() loop (decode twice, slice 'data: ', json.loads).
+The others are SSEParser with each installed JSON backend.
+
+Run from the repo root:  python -m benchmarks.bench_sse_parser --repeat 200
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+from utils.sse_parser import JSON_BACKENDS, SSEParser, iter_text_parts
+
+RECORDINGS = os.path.join(os.path.dirname(__file__), "recordings")
+
+
+def _network_chunks(data, size):
+    """Splits a recording the way a socket would, ignoring line boundaries."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _legacy(chunks):
+    # Mirrors requests' iter_lines() plus the old per-line decode/slice/loads
+    pending = b""
+    texts = []
+    for chunk in chunks:
+        lines = (pending + chunk).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(b"\n") else b""
+        for line in lines:
+            line = line.rstrip(b"\r\n")
+            if line and line.decode('utf-8').startswith('data: '):
+                try:
+                    event = json.loads(line.decode('utf-8')[6:])
+                    texts.append(event['candidates'][0]['content']['parts'][0]['text'])
+                except (json.JSONDecodeError, KeyError, IndexError):
+                    continue
+    return texts
+
+
+def _parser(chunks, backend):
+    parser = SSEParser(backend)
+    texts = []
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            texts.extend(iter_text_parts(event))
+    for event in parser.flush():
+        texts.extend(iter_text_parts(event))
+    return texts
+
+
+def bench(name, func, chunks, total_bytes, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        texts = func(chunks)
+    elapsed = time.perf_counter() - start
+    mb_per_s = total_bytes * repeat / elapsed / 1e6
+    print(f"  {name:>8}: {mb_per_s:8.1f} MB/s  ({len(texts)} text parts)")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    arg_parser.add_argument("--chunk-size", type=int, default=1400, help="Bytes per simulated socket read")
+    args = arg_parser.parse_args()
+
+    for path in sorted(glob.glob(os.path.join(RECORDINGS, "*.sse"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        chunks = _network_chunks(data, args.chunk_size)
+        print(f"{os.path.basename(path)} ({len(data)} bytes, {len(chunks)} reads)")
+        bench("legacy", _legacy, chunks, len(data), args.repeat)
+        for backend in JSON_BACKENDS:
+            bench(backend, lambda c, b=backend: _parser(c, b), chunks, len(data), args.repeat)
@@ -0,0 +1,100 @@
+# --- benchmarks/bench_startup.py ---
+"""
+Cold start regression check.
+
+Each run is a fresh interpreter, so nothing is cached in sys.modules:
+  imports      time to import what main.py imports before building the window
+  window built `main.py --profile-startup --exit-after-startup`, time from
+  first frame  process start until OverlayApp is constructed and until its
+               first painted frame, i.e. time to interactive (needs a display)
+
+It also checks that none of the deferred heavy modules (httpx, numpy, mss,
+pygments, keyboard, pywinstyles) are pulled in by those imports. Exits with
+status 1 when a budget is exceeded or a heavy module is imported eagerly, so it
+can gate a CI job.
+
+Run from the repo root:  python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("httpx", "numpy", "mss", "pygments", "keyboard", "pywinstyles", "PIL")
+
+# Mirrors the imports at the top of main.py
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import utils.startup_profiler
+import tkinter
+import dotenv
+import ui.main_window
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"ms": elapsed * 1000, "heavy": heavy}}))
+"""
+
+
+def _import_run():
+    code = _IMPORT_PROBE.format(heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _frame_run(timeout):
+    out = subprocess.run([sys.executable, "main.py", "--profile-startup", "--exit-after-startup"],
+                         cwd=REPO_ROOT, capture_output=True, text=True, timeout=timeout)
+    marks = {label: float(ms) for label, ms in re.findall(r"\[STARTUP\] ([\w ]+): ([\d.]+) ms after start", out.stdout)}
+    if "first frame" not in marks:
+        raise RuntimeError((out.stderr or out.stdout).strip().splitlines()[-1:] or "no [STARTUP] output")
+    return marks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement (median is reported)")
+    parser.add_argument("--import-budget-ms", type=float, default=250.0)
+    parser.add_argument("--frame-budget-ms", type=float, default=1500.0)
+    parser.add_argument("--skip-frame", action="store_true", help="only measure imports (no display needed)")
+    args = parser.parse_args()
+
+    failures = []
+
+    runs = [_import_run() for _ in range(args.runs)]
+    import_ms = statistics.median(r["ms"] for r in runs)
+    heavy = sorted({name for r in runs for name in r["heavy"]})
+    print(f"[BENCH] imports      median {import_ms:7.1f} ms  (best {min(r['ms'] for r in runs):.1f}, budget {args.import_budget_ms:.0f})")
+    print(f"[BENCH] heavy modules imported eagerly: {', '.join(heavy) or 'none'}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"imports took {import_ms:.1f} ms (budget {args.import_budget_ms:.0f} ms)")
+    if heavy:
+        failures.append(f"deferred modules imported at startup: {', '.join(heavy)}")
+
+    if not args.skip_frame:
+        try:
+            marks = [_frame_run(timeout=30) for _ in range(args.runs)]
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"[BENCH] first frame skipped, the app did not start (needs a display, try xvfb-run): {e}")
+        else:
+            built = [m["window built"] for m in marks if "window built" in m]
+            if built:
+                print(f"[BENCH] window built median {statistics.median(built):7.1f} ms  (best {min(built):.1f})")
+            frames = [m["first frame"] for m in marks]
+            frame_ms = statistics.median(frames)
+            print(f"[BENCH] first frame  median {frame_ms:7.1f} ms  (best {min(frames):.1f}, budget {args.frame_budget_ms:.0f})")
+            if frame_ms > args.frame_budget_ms:
+                failures.append(f"first frame took {frame_ms:.1f} ms (budget {args.frame_budget_ms:.0f} ms)")
+
+    for failure in failures:
+        print(f"[BENCH] OVER BUDGET: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
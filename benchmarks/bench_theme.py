@@ -0,0 +1,98 @@
+# --- benchmarks/bench_theme.py ---
+"""
+Theme switch time on a long session.
+
+"rebuild" is the old path: every bubble of the session is destroyed and created
+again in the new colours. "in-place" is the ThemeRegistry pass: registered
+widgets get one config() each and the bubbles the ChatView holds (a screenful
+plus its pool) are recoloured without being recreated.
+
+Needs a display (use Xvfb on Linux); it says so and exits when there is none.
+
+Run from the repo root:  python -m benchmarks.bench_theme --messages 500
+"""
+import argparse
+import time
+import tkinter as tk
+
+from benchmarks.bench_chat_view import _messages
+from benchmarks.bench_render import _Host
+from ui.chat_view import ChatView
+from ui.message_bubble import MessageBubble
+from ui.theme_registry import ThemeRegistry
+
+
+def _switch(host):
+    theme, _ = host.theme_provider.switch_theme()
+    host.current_theme.set(theme)
+
+
+def _recolor(view):
+    count = 0
+    for bubble in view.bubbles():
+        bubble.apply_theme()
+        count += 1
+    return count
+
+
+def _rebuild(root, host, messages, switches):
+    frame = tk.Frame(root)
+    frame.pack(fill="both", expand=True)
+    bubbles = [MessageBubble(frame, m, host) for m in messages]
+    for bubble in bubbles:
+        bubble.pack(fill="x", padx=20, pady=10)
+    root.update()
+    costs = []
+    for _ in range(switches):
+        start = time.perf_counter()
+        _switch(host)
+        for bubble in bubbles:
+            bubble.destroy()
+        bubbles = [MessageBubble(frame, m, host) for m in messages]
+        for bubble in bubbles:
+            bubble.pack(fill="x", padx=20, pady=10)
+        root.update()
+        costs.append(time.perf_counter() - start)
+    frame.destroy()
+    return sorted(costs)
+
+
+def _in_place(root, host, messages, switches):
+    registry = ThemeRegistry(host.theme_provider)
+    canvas = registry.register(tk.Canvas(root), "window")
+    canvas.pack(fill="both", expand=True)
+    root.update()
+    view = ChatView(canvas, lambda parent, message: MessageBubble(parent, message, host))
+    registry.add_hook(lambda palette: _recolor(view))
+    view.set_messages(messages)
+    root.update()
+    costs = []
+    for _ in range(switches):
+        start = time.perf_counter()
+        _switch(host)
+        recolored = registry.apply()
+        root.update()
+        costs.append(time.perf_counter() - start)
+    canvas.destroy()
+    return sorted(costs), recolored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500, help="Messages in the session")
+    parser.add_argument("--switches", type=int, default=6, help="Theme switches to time")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SystemExit(f"[BENCH] Needs a display (try xvfb-run): {e}")
+    root.geometry("700x900")
+    host = _Host(root)
+    messages = _messages(args.messages)
+    print(f"[BENCH] Theme switch with {len(messages)} messages, median of {args.switches}")
+    costs, recolored = _in_place(root, host, messages, args.switches)
+    print(f"in-place: {costs[len(costs) // 2] * 1000:8.1f} ms | {recolored} widgets and bubbles recoloured")
+    costs = _rebuild(root, host, messages, args.switches)
+    print(f" rebuild: {costs[len(costs) // 2] * 1000:8.1f} ms | {len(messages)} bubbles recreated")
+    root.destroy()
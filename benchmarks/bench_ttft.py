@@ -0,0 +1,66 @@
+# --- benchmarks/bench_ttft.py ---
+"""
+Time-to-first-token against the local HTTPS stand-in server.
+
+"fresh" opens a new client for every turn (a new connection each time),
+"pooled" reuses one GeminiClient across turns.
+
+Run from the repo root:  python -m benchmarks.bench_ttft --turns 30
+"""
+import argparse
+import asyncio
+import ssl
+import statistics
+import time
+
+from benchmarks.stand_in_server import make_self_signed_cert, start_in_background
+from utils.gemini_client import GeminiClient
+
+HISTORY = [{"role": "user", "parts": [{"text": "Hi there!"}]}]
+
+
+async def _time_to_first_token(client):
+    start = time.perf_counter()
+    elapsed = None
+    async for chunk in client.stream("bench-key-000000", HISTORY, "gemini-bench", "You are a benchmark."):
+        if elapsed is None:
+            elapsed = time.perf_counter() - start
+            if chunk.startswith("Error"):
+                raise RuntimeError(chunk)
+        # Keep draining so the connection goes back to the pool
+    return elapsed
+
+
+async def run(turns, ssl_context, base_url):
+    fresh = []
+    for _ in range(turns):
+        client = GeminiClient(base_url=base_url, verify=ssl_context)
+        fresh.append(await _time_to_first_token(client))
+        await client.aclose()
+
+    pooled = []
+    client = GeminiClient(base_url=base_url, verify=ssl_context)
+    for _ in range(turns):
+        pooled.append(await _time_to_first_token(client))
+    await client.aclose()
+    return fresh, pooled
+
+
+def _report(name, samples):
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(f"{name:>7}: first {samples[0] * 1000:7.2f} ms | median {statistics.median(ms):7.2f} ms | p95 {p95:7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    args = parser.parse_args()
+
+    certfile, keyfile = make_self_signed_cert()
+    server, base_url = start_in_background(certfile=certfile, keyfile=keyfile)
+    print(f"[BENCH] Stand-in server at {base_url}, {args.turns} turns per mode")
+    fresh, pooled = asyncio.run(run(args.turns, ssl.create_default_context(cafile=certfile), base_url))
+    _report("fresh", fresh)
+    _report("pooled", pooled)
+    server.shutdown()
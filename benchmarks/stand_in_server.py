@@ -0,0 +1,225 @@
+# --- benchmarks/stand_in_server.py ---
+"""
+A tiny local stand-in for the Gemini streamGenerateContent?alt=sse endpoint.
+It speaks HTTP/1.1 with keep-alive and chunked transfer encoding, like the real
+API, and can optionally serve over TLS with a throwaway self-signed certificate.
+
+Its behaviour is configurable: chunk sizes, a delay before the first chunk and
+between chunks, HTTP errors, 429s with Retry-After, errors mid-stream, and a
+capped upload rate that makes big request bodies (screenshots) cost time.
+Point the app at it with GEMINI_BASE_URL=http://127.0.0.1:8765.
+"""
+import json
+import multiprocessing
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_self_signed_cert(directory=None):
+    """Creates a localhost certificate with the openssl CLI. Returns (certfile, keyfile)."""
+    directory = directory or tempfile.mkdtemp(prefix="standin-cert-")
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+         "-keyout", keyfile, "-out", certfile],
+        check=True, capture_output=True,
+    )
+    return certfile, keyfile
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, so pooled clients can reuse the connection
+    disable_nagle_algorithm = True # Flush every SSE event immediately, like a real streaming server
+
+    # Replaced per server instance through make_server()
+    reply_chunks = ["Hello", " from", " the", " stand-in", " server."]
+    chunk_delay = 0.0 # Seconds between SSE events
+    first_chunk_delay = 0.0 # Seconds of "thinking" before the first event
+    rate_limit_first = 0 # Answer the first N requests with 429 Too Many Requests
+    rate_limit_every = 0 # Answer every Nth request with 429 (1st, N+1th, ...), to exercise retries
+    retry_after = 1 # Seconds, sent in the Retry-After header of a 429
+    error_status = None # Answer every request with this HTTP status (e.g. 500)
+    error_after = None # Send an error event after this many chunks and end the stream
+    unavailable_models = () # Model ids answered with 503, to exercise model fallback
+    upload_kbps = 0 # Read the request body at most this fast (kilobits/s), like a slow uplink; 0 = no cap
+
+    def log_message(self, format, *args):
+        pass # Keep benchmark output clean
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    def _send_error_json(self, status, message, extra_headers=()):
+        body = json.dumps({"error": {"code": status, "message": message}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in extra_headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self, length):
+        if not self.upload_kbps:
+            return self.rfile.read(length)
+        # Reading slowly fills the socket buffers, so the client's send is held back too
+        start, received, parts = time.perf_counter(), 0, []
+        while received < length:
+            part = self.rfile.read(min(16384, length - received))
+            if not part:
+                break
+            parts.append(part)
+            received += len(part)
+            ahead = received * 8 / (self.upload_kbps * 1000) - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+        return b"".join(parts)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._read_body(length)
+        with self.server.lock:
+            self.server.requests += 1
+            request_number = self.server.requests
+
+        rate_limited = request_number <= self.rate_limit_first or (
+            self.rate_limit_every and (request_number - 1) % self.rate_limit_every == 0)
+        if rate_limited:
+            self._send_error_json(429, "Resource has been exhausted (stand-in rate limit).",
+                                  [("Retry-After", str(self.retry_after))])
+            return
+        if self.error_status:
+            self._send_error_json(self.error_status, "Stand-in server error.")
+            return
+        model_id = self.path.split("/models/", 1)[-1].split(":", 1)[0]
+        if model_id in self.unavailable_models:
+            self._send_error_json(503, f"The model {model_id} is overloaded (stand-in).")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            if self.first_chunk_delay:
+                time.sleep(self.first_chunk_delay)
+            for i, text in enumerate(self.reply_chunks):
+                if i and self.chunk_delay:
+                    time.sleep(self.chunk_delay)
+                if i == self.error_after:
+                    event = {"error": {"code": 500, "message": "Stand-in stream interrupted."}}
+                    self._write_chunk(b"data: " + json.dumps(event).encode("utf-8") + b"\r\n\r\n")
+                    break
+                event = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+                if i == len(self.reply_chunks) - 1:
+                    event["candidates"][0]["finishReason"] = "STOP"
+                self._write_chunk(b"data: " + json.dumps(event).encode("utf-8") + b"\r\n\r\n")
+            self._write_chunk(b"")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, ssl.SSLError):
+            # The client hung up mid-stream (e.g. the user pressed Stop)
+            self.server.disconnects.append(time.perf_counter())
+            self.close_connection = True
+
+
+def split_reply(text, chunk_size):
+    """Cuts a reply into chunks of chunk_size characters."""
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+def make_server(host="127.0.0.1", port=0, certfile=None, keyfile=None, reply_chunks=None, chunk_size=None,
+                chunk_delay=0.0, first_chunk_delay=0.0, rate_limit_first=0, rate_limit_every=0, retry_after=1,
+                error_status=None, error_after=None, unavailable_models=(), upload_kbps=0):
+    """
+    Builds the server (not started). Port 0 picks a free port; see server.server_port.
+    With chunk_size, the reply is re-split into chunks of that many characters.
+    """
+    handler = type("ConfiguredStandInHandler", (StandInHandler,), {
+        "chunk_delay": chunk_delay, "first_chunk_delay": first_chunk_delay,
+        "rate_limit_first": rate_limit_first, "rate_limit_every": rate_limit_every, "retry_after": retry_after,
+        "error_status": error_status, "error_after": error_after, "unavailable_models": tuple(unavailable_models),
+        "upload_kbps": upload_kbps,
+    })
+    if reply_chunks is not None:
+        handler.reply_chunks = list(reply_chunks)
+    if chunk_size:
+        handler.reply_chunks = split_reply("".join(handler.reply_chunks), chunk_size)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.disconnects = [] # perf_counter() timestamps of streams the client abandoned
+    server.requests = 0
+    server.lock = threading.Lock()
+    server.scheme = "http"
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        server.scheme = "https"
+    return server
+
+
+def start_in_background(**kwargs):
+    """Starts a server on a daemon thread and returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = "localhost" if server.scheme == "https" else server.server_address[0]
+    return server, f"{server.scheme}://{host}:{server.server_port}"
+
+
+def _serve_in_child(kwargs, ready):
+    server = make_server(**kwargs)
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+def start_in_subprocess(**kwargs):
+    """
+    Starts a plain-HTTP server in a separate process and returns (process, base_url).
+    Keeps the server's CPU time out of the benchmark's own process_time().
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_in_child, args=(kwargs, ready), daemon=True)
+    process.start()
+    port = ready.get(timeout=10)
+    return process, f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Local Gemini SSE stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tls", action="store_true", help="Serve HTTPS with a self-signed cert")
+    parser.add_argument("--chunk-size", type=int, help="Re-split the reply into chunks of this many characters")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between chunks")
+    parser.add_argument("--first-chunk-delay", type=float, default=0.0, help="Seconds before the first chunk")
+    parser.add_argument("--rate-limit-first", type=int, default=0, help="Answer the first N requests with 429")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--error-status", type=int, help="Answer every request with this HTTP status")
+    parser.add_argument("--error-after", type=int, help="Break off with an error event after N chunks")
+    parser.add_argument("--unavailable-model", action="append", default=[], help="Answer this model with 503 (repeatable)")
+    parser.add_argument("--upload-kbps", type=int, default=0, help="Cap the request upload rate (kilobits/s)")
+    args = parser.parse_args()
+
+    certfile = keyfile = None
+    if args.tls:
+        certfile, keyfile = make_self_signed_cert()
+        print(f"[STAND-IN] Certificate: {certfile}")
+    server = make_server(port=args.port, certfile=certfile, keyfile=keyfile, chunk_size=args.chunk_size,
+                         chunk_delay=args.chunk_delay, first_chunk_delay=args.first_chunk_delay,
+                         rate_limit_first=args.rate_limit_first, rate_limit_every=args.rate_limit_every,
+                         retry_after=args.retry_after, error_status=args.error_status,
+                         error_after=args.error_after, unavailable_models=args.unavailable_model,
+                         upload_kbps=args.upload_kbps)
+    print(f"[STAND-IN] Listening on {server.scheme}://localhost:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,14 +1,43 @@
 # --- main.py ---
+import sys
+
+from utils.startup_profiler import StartupProfiler, warm_up
+
+# --profile-startup prints import times and the time to the first painted frame;
+# --exit-after-startup quits right after that (used by benchmarks.bench_startup)
+PROFILE = "--profile-startup" in sys.argv
+EXIT_AFTER_STARTUP = "--exit-after-startup" in sys.argv
+
+profiler = StartupProfiler()
+if PROFILE:
+    profiler.time_imports()
+
 import tkinter as tk
 from dotenv import load_dotenv
 
 # Import from the new structure
 from ui.main_window import OverlayApp
-from utils.hotkey_manager import setup_hotkey_listener
+
+
+def _after_first_frame(root, app):
+    # Global hotkeys (and the keyboard hook) only once the window is up
+    from utils.hotkey_manager import setup_hotkey_listener
+    setup_hotkey_listener(app)
+    app.input_activity.start() # Real idle time for Autopilot, from the same keyboard hook
+    warm_up() # Capture, HTTP and highlighting modules, off the Tk thread
+    profiler.mark("hotkeys ready")
+    if PROFILE:
+        profiler.stop_timing_imports()
+        profiler.report()
+    if EXIT_AFTER_STARTUP:
+        root.after(0, root.destroy)
+
 
 if __name__ == "__main__":
     load_dotenv()
+    profiler.mark("imports done")
     root = tk.Tk()
     app = OverlayApp(root)
-    setup_hotkey_listener(app)
-    root.mainloop()
\ No newline at end of file
+    profiler.mark("window built")
+    profiler.mark_first_frame(app.container, lambda: root.after_idle(_after_first_frame, root, app))
+    root.mainloop()
@@ -0,0 +1,30 @@
+# --- tests/conftest.py ---
+import pytest
+
+from benchmarks.stand_in_server import start_in_background
+
+
+@pytest.fixture
+def stand_in():
+    """
+    Starts a stand-in Gemini server for one test. Call it with make_server()'s
+    options; returns (server, base_url). server.connections counts accepted connections.
+    """
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_in_background(**kwargs)
+        server.connections = 0
+        accept = server.get_request
+
+        def counting_accept():
+            server.connections += 1
+            return accept()
+        server.get_request = counting_accept
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
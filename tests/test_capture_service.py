@@ -0,0 +1,109 @@
+# --- tests/test_capture_service.py ---
+import threading
+from concurrent.futures import CancelledError
+
+import mss
+import numpy as np
+import pytest
+from mss.screenshot import ScreenShot
+
+from utils.capture_service import CaptureService
+from utils.frame_diff import ScreenChangeDetector
+from utils.image_encoder import ImageEncoder
+
+MONITOR = {"left": 0, "top": 0, "width": 320, "height": 180}
+
+
+class _FakeMSS:
+    """Stands in for mss.mss(): hands out flat frames, optionally waiting on a gate first."""
+    gate = None
+    grabs = []
+
+    def __init__(self):
+        self.monitors = [MONITOR, MONITOR]
+        self.closed = False
+
+    def grab(self, monitor):
+        if self.gate is not None:
+            self.gate.wait(10)
+        type(self).grabs.append(monitor)
+        pixels = np.full((monitor["height"], monitor["width"], 4), 90, np.uint8)
+        return ScreenShot(bytearray(pixels.tobytes()), monitor)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_mss(monkeypatch):
+    monkeypatch.setattr(_FakeMSS, "gate", None)
+    monkeypatch.setattr(_FakeMSS, "grabs", [])
+    monkeypatch.setattr(mss, "mss", _FakeMSS)
+    return _FakeMSS
+
+
+@pytest.fixture
+def service(fake_mss):
+    service = CaptureService(ImageEncoder(max_edge=0, byte_budget=0))
+    yield service
+    service.close()
+
+
+def test_capture_is_grabbed_and_encoded_off_the_caller_thread(service):
+    capture = service.submit().result(5)
+    assert not capture.unchanged and capture.image.format == "PNG"
+    assert capture.image.data.startswith(b"\x89PNG")
+    assert capture.size == (320, 180)
+    assert service.summary()[0].startswith("320x180: grab")
+
+
+def test_unchanged_screen_is_not_encoded(service):
+    detector = ScreenChangeDetector()
+    first = service.submit(detector=detector).result(5)
+    detector.mark_sent(first.screen_reference, len(first.image.data))
+    second = service.submit(detector=detector).result(5)
+    assert second.unchanged and second.image is None
+    assert detector.skipped == 1
+
+
+def test_region_capture_skips_the_change_check(service):
+    detector = ScreenChangeDetector()
+    region = {"left": 10, "top": 10, "width": 64, "height": 32}
+    capture = service.submit(region=region, detector=detector).result(5)
+    assert capture.size == (64, 32) and capture.screen_reference is None
+    assert detector.last_score is None
+
+
+def test_probe_returns_a_thumbnail_without_encoding(service):
+    thumb = service.submit_probe(mask=(0, 0, 10, 10)).result(5)
+    assert thumb.shape == (90, 160)
+
+
+def test_a_failing_job_fails_only_its_future(service, monkeypatch):
+    monkeypatch.setattr(service.encoder, "encode", lambda shot: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        service.submit().result(5)
+    assert service.submit_probe().result(5) is not None
+
+
+def test_close_cancels_jobs_the_thread_cannot_reach(fake_mss):
+    fake_mss.gate = threading.Event() # The first grab hangs, like a stuck capture
+    service = CaptureService()
+    stuck = service.submit_probe()
+    pending = [service.submit() for _ in range(3)]
+    service.close()
+    for future in pending:
+        with pytest.raises(CancelledError):
+            future.result(1)
+    with pytest.raises(RuntimeError):
+        service.submit()
+    fake_mss.gate.set() # Let the stuck grab finish; the thread then sees the stop signal
+    assert stuck.result(5).shape == (90, 160)
+
+
+def test_close_runs_jobs_already_queued_and_is_idempotent(fake_mss):
+    service = CaptureService()
+    futures = [service.submit_probe() for _ in range(3)]
+    service.close()
+    service.close()
+    assert all(f.result(1) is not None for f in futures)
@@ -0,0 +1,49 @@
+# --- tests/test_conversation_store.py ---
+import pytest
+
+from utils.conversation_store import ConversationStore, Message
+
+
+def _store(*texts):
+    roles = ("user", "model")
+    return ConversationStore(Message.from_text(roles[i % 2], text) for i, text in enumerate(texts))
+
+
+def test_messages_are_immutable():
+    message = Message.from_text("user", "hi")
+    with pytest.raises(AttributeError):
+        message.role = "model"
+    assert message.to_dict() is message.to_dict() # Cached, shared with every payload
+
+
+def test_snapshot_keeps_the_messages_it_was_taken_with():
+    store = _store("a", "b")
+    snapshot = store.snapshot()
+    store.append(Message.from_text("user", "c"))
+    store.replace(store[0], Message.from_text("user", "A"))
+    assert [m.text for m in snapshot] == ["a", "b"]
+    assert [m.text for m in store] == ["A", "b", "c"]
+    assert len(snapshot) == 2 and snapshot.last.text == "b"
+
+
+def test_replace_remove_and_pop_match_by_identity():
+    store = _store("a", "b", "c")
+    b = store[1]
+    store.remove(b)
+    assert [m.text for m in store] == ["a", "c"]
+    with pytest.raises(ValueError):
+        store.remove(Message.from_text("model", "b")) # Equal text, different message
+    assert store.pop().text == "c"
+    assert len(store) == 1 and store.last.text == "a"
+
+
+def test_negative_indexes_walk_from_the_newest():
+    store = _store("a", "b", "c")
+    assert store[-1].text == "c" and store[-3].text == "a"
+    with pytest.raises(IndexError):
+        store[-4]
+
+
+def test_to_list_round_trips_through_from_list():
+    store = _store("a", "b")
+    assert [m.to_dict() for m in ConversationStore.from_list(store.to_list())] == store.to_list()
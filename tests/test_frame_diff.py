@@ -0,0 +1,117 @@
+# --- tests/test_frame_diff.py ---
+import numpy as np
+
+from utils.frame_diff import ActivityDetector, ScreenChangeDetector, change_score, thumbnail
+
+WIDTH, HEIGHT = 640, 360
+
+
+class _Shot:
+    """Shaped like an mss ScreenShot as far as frame_diff looks."""
+    def __init__(self, pixels):
+        self.height, self.width = pixels.shape[:2]
+        self.raw = bytearray(pixels.tobytes())
+
+
+def _frame(gray=40, box=None, box_gray=220):
+    """A flat BGRA frame, optionally with a bright box (top, left, bottom, right)."""
+    pixels = np.full((HEIGHT, WIDTH, 4), gray, np.uint8)
+    pixels[..., 3] = 255
+    if box:
+        top, left, bottom, right = box
+        pixels[top:bottom, left:right, :3] = box_gray
+    return _Shot(pixels)
+
+
+def test_thumbnail_is_a_grid_of_block_brightness():
+    thumb = thumbnail(_frame(100).raw, WIDTH, HEIGHT)
+    assert thumb.shape == (90, 160)
+    assert np.allclose(thumb, 100)
+
+
+def test_change_score_is_the_changed_fraction():
+    before = thumbnail(_frame().raw, WIDTH, HEIGHT)
+    after = thumbnail(_frame(box=(0, 0, HEIGHT // 2, WIDTH)).raw, WIDTH, HEIGHT)
+    assert change_score(before, before) == 0.0
+    assert change_score(before, after) == 0.5
+    assert change_score(None, after) == 1.0
+
+
+def test_first_frame_is_always_sent():
+    detector = ScreenChangeDetector()
+    assert detector.check(_frame()) is not None
+    assert detector.last_score == 1.0
+
+
+def test_unchanged_frame_is_skipped_once_the_reference_was_sent():
+    detector = ScreenChangeDetector()
+    thumb = detector.check(_frame())
+    detector.mark_sent(thumb, 5000)
+    assert detector.check(_frame(box=(0, 0, 4, 4))) is None # A blinking cursor
+    assert (detector.sent, detector.skipped, detector.bytes_saved) == (1, 1, 5000)
+
+
+def test_changed_frame_is_sent():
+    detector = ScreenChangeDetector()
+    detector.mark_sent(detector.check(_frame()), 5000)
+    assert detector.check(_frame(box=(50, 50, 250, 450))) is not None
+
+
+def test_a_frame_that_was_never_sent_is_not_the_reference():
+    # The request carrying it was cancelled or failed: the next capture must still go out
+    detector = ScreenChangeDetector()
+    assert detector.check(_frame()) is not None
+    assert detector.check(_frame()) is not None
+    assert detector.skipped == 0
+
+
+def test_reset_and_zero_threshold_always_send():
+    detector = ScreenChangeDetector()
+    detector.mark_sent(detector.check(_frame()), 5000)
+    detector.reset()
+    assert detector.check(_frame()) is not None
+    always = ScreenChangeDetector(threshold=0)
+    always.mark_sent(always.check(_frame()), 5000)
+    assert always.check(_frame()) is not None
+
+
+def _probe(**frame):
+    return thumbnail(_frame(**frame).raw, WIDTH, HEIGHT)
+
+
+def test_first_tick_fires():
+    detector = ActivityDetector()
+    assert detector.should_fire(_probe(), {"title": "Editor"})
+
+
+def test_static_screen_and_same_window_skip():
+    detector = ActivityDetector()
+    detector.should_fire(_probe(), {"title": "Editor"})
+    assert not detector.should_fire(_probe(box=(0, 0, 4, 4)), {"title": "Editor"})
+    assert (detector.fired, detector.skipped) == (1, 1)
+    assert detector.describe() == "Autopilot: 1 fired, 1 skipped (1 API calls saved)"
+
+
+def test_window_change_alone_fires():
+    detector = ActivityDetector()
+    detector.should_fire(_probe(), {"title": "Editor"})
+    assert detector.should_fire(_probe(), {"title": "Browser"})
+    assert detector.last_score == 1.0
+
+
+def test_slow_drift_adds_up_because_skips_keep_the_reference():
+    detector = ActivityDetector(threshold=0.05)
+    detector.should_fire(_probe(), None)
+    # Each step changes ~3% of the screen more than the last fired tick
+    fired = [detector.should_fire(_probe(box=(0, 0, HEIGHT, WIDTH * step // 32)), None) for step in (1, 2)]
+    assert fired == [False, True]
+
+
+def test_zero_threshold_always_fires_and_reset_forgets():
+    always = ActivityDetector(threshold=0)
+    always.should_fire(_probe(), None)
+    assert always.should_fire(_probe(), None)
+    detector = ActivityDetector()
+    detector.should_fire(_probe(), {"title": "Editor"})
+    detector.reset()
+    assert detector.should_fire(_probe(), {"title": "Editor"})
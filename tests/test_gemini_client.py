@@ -0,0 +1,38 @@
+# --- tests/test_gemini_client.py ---
+import asyncio
+
+from utils.gemini_client import GeminiClient, _model_id
+
+HISTORY = [{"role": "user", "parts": [{"text": "Hi"}]}]
+
+
+def _collect(base_url, turns=1, api_key="test-key-000000", **kwargs):
+    """Runs 'turns' streams on one client and returns each reply's joined text."""
+    async def run():
+        client = GeminiClient(base_url=base_url)
+        try:
+            replies = []
+            for _ in range(turns):
+                replies.append("".join([chunk async for chunk in client.stream(api_key, HISTORY, "gemini-test", **kwargs)]))
+            return replies
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_turns_reuse_one_pooled_connection(stand_in):
+    server, base_url = stand_in(reply_chunks=["Hello", " there."])
+    assert _collect(base_url, turns=3) == ["Hello there."] * 3
+    assert server.requests == 3
+    assert server.connections == 1
+
+
+def test_missing_key_is_an_error_without_a_request(stand_in):
+    server, base_url = stand_in()
+    assert _collect(base_url, api_key="  ") == ["Error: Gemini API key is missing."]
+    assert server.requests == 0
+
+
+def test_model_id_accepts_both_forms():
+    assert _model_id("models/gemini-test") == "gemini-test"
+    assert _model_id(" gemini-test ") == "gemini-test"
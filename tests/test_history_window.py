@@ -0,0 +1,83 @@
+# --- tests/test_history_window.py ---
+from utils.conversation_store import ConversationStore, Message
+from utils.history_window import IMAGE_TOKENS, SYSTEM_INSTRUCTION_TOKENS, window_history
+
+LONG = "x" * 4000 # About 1,000 tokens
+
+
+def _snapshot(*texts):
+    """Alternating turns that end with the user's, like a request."""
+    count = len(texts)
+    return ConversationStore(Message.from_text("user" if (count - i) % 2 else "model", t)
+                             for i, t in enumerate(texts)).snapshot()
+
+
+def _roles(window):
+    return [c["role"] for c in window.contents]
+
+
+def _alternates(window):
+    roles = _roles(window)
+    return all(a != b for a, b in zip(roles, roles[1:]))
+
+
+def test_everything_fits_and_is_shared_not_copied():
+    snapshot = _snapshot("hi", "hello", "how are you?")
+    window = window_history(snapshot, 8000)
+    assert window.trimmed_count == 0
+    assert [c is m.to_dict() for c, m in zip(window.contents, snapshot)] == [True] * 3
+    assert window.used_tokens == SYSTEM_INSTRUCTION_TOKENS + sum(m.token_estimate for m in snapshot)
+
+
+def test_oldest_messages_are_trimmed_first():
+    window = window_history(_snapshot(LONG, LONG, LONG, LONG, "newest"), 1500)
+    assert window.trimmed_count == 3
+    assert window.used_tokens <= window.budget + 50 # Plus the stub
+    assert window.contents[-1]["parts"][0]["text"] == "newest"
+    assert _alternates(window)
+    assert window.describe().endswith(", 3 trimmed")
+
+
+def test_stub_is_folded_into_a_leading_user_turn():
+    window = window_history(_snapshot(LONG, LONG, "question", "answer", "follow-up"), 1000)
+    assert _roles(window) == ["user", "model", "user"]
+    first = window.contents[0]["parts"]
+    assert first[0]["text"].startswith("(Earlier conversation trimmed: 2 older")
+    assert first[1]["text"] == "question"
+
+
+def test_stub_goes_before_a_leading_model_turn():
+    window = window_history(_snapshot(LONG, LONG, "answer", "follow-up"), 1000)
+    assert _roles(window) == ["user", "model", "user"]
+    assert window.contents[0]["parts"][0]["text"].startswith("(Earlier conversation trimmed")
+
+
+def test_only_the_newest_fits_roles_still_alternate_and_marker_stays_first():
+    observation = "(System Observation) The user is reading."
+    window = window_history(_snapshot(LONG, LONG, LONG, observation), 500)
+    assert _roles(window) == ["user"]
+    parts = window.contents[0]["parts"]
+    assert parts[0]["text"] == observation
+    assert parts[-1]["text"].startswith("(Earlier conversation trimmed: 3 older")
+
+
+def test_newest_is_kept_even_when_it_alone_is_over_budget():
+    window = window_history(_snapshot(LONG), 300)
+    assert window.trimmed_count == 0 and len(window.contents) == 1
+    assert window.used_tokens > window.budget
+
+
+def test_image_and_persona_count_against_the_budget():
+    snapshot = _snapshot(LONG, LONG, "newest")
+    without = window_history(snapshot, 2500)
+    with_image = window_history(snapshot, 2500, persona_text="p" * 400, has_image=True)
+    assert with_image.trimmed_count > without.trimmed_count
+    assert with_image.used_tokens >= IMAGE_TOKENS
+
+
+def test_snapshot_messages_are_never_modified():
+    snapshot = _snapshot(LONG, LONG, "question", "answer", "follow-up")
+    before = [list(m.to_dict()["parts"]) for m in snapshot]
+    window_history(snapshot, 1000)
+    window_history(snapshot, 100)
+    assert [m.to_dict()["parts"] for m in snapshot] == before
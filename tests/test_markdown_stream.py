@@ -0,0 +1,121 @@
+# --- tests/test_markdown_stream.py ---
+import pytest
+
+from ui.markdown_stream import FENCE_CLOSE, FENCE_OPEN, MarkdownStream, render_segments
+
+REPLY = (
+    "## Step 1: what changed\n\n"
+    "The **client** keeps one connection and the *engine* streams; `process_stream()` "
+    "only touches _Tk_. Some snake_case_names, __init__ and a lone 2 * 3 stay as they are.\n"
+    "- First, the **pool**\n"
+    "1. Numbered\n"
+    "```python\n"
+    "def f(a_b):  # **not bold**\n"
+    "    return a_b * 2\n"
+    "```\n"
+    "Done *unclosed and `open\n"
+)
+
+
+def _merged(segments):
+    """Joins neighbouring segments with the same tags, since chunking may split them differently."""
+    merged = []
+    for text, tags in segments:
+        if merged and merged[-1][1] == tags and tags[:1] not in ((FENCE_OPEN,), (FENCE_CLOSE,)):
+            merged[-1] = (merged[-1][0] + text, tags)
+        elif text or tags[:1] in ((FENCE_OPEN,), (FENCE_CLOSE,)):
+            merged.append((text, tags))
+    return merged
+
+
+def _streamed(text, size):
+    stream = MarkdownStream()
+    segments = []
+    for i in range(0, len(text), size):
+        segments += stream.feed(text[i:i + size])
+    return segments + stream.flush()
+
+
+def _text(segments):
+    return "".join(text for text, _ in segments)
+
+
+def _styled(text):
+    return [(t, tags) for t, tags in _merged(render_segments(text)) if t.strip() and tags]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 16, 1000])
+def test_streamed_output_matches_the_whole_text(size):
+    assert _merged(_streamed(REPLY, size)) == _merged(render_segments(REPLY))
+
+
+def test_blocks_and_inline_styles():
+    segments = _merged(render_segments(REPLY))
+    assert ("Step 1: what changed\n", ("h2",)) in segments
+    assert ("client", ("bold",)) in segments
+    assert ("engine", ("italic",)) in segments
+    assert ("process_stream()", ("code",)) in segments
+    assert ("Tk", ("italic",)) in segments
+    assert ("• First, the ", ("list",)) in segments and ("pool", ("list", "bold")) in segments
+    assert ("", (FENCE_OPEN, "python")) in segments and ("", (FENCE_CLOSE,)) in segments
+    assert ("def f(a_b):  # **not bold**\n    return a_b * 2\n", ("code_block",)) in segments
+
+
+@pytest.mark.parametrize("text", [
+    "after __init__ runs",
+    "snake_case_name and CONST_VALUE_",
+    "a lone 2 * 3 and 4*5",
+    "___ and ** and __",
+    "*never closed",
+    "an _open one",
+    "`open code",
+    "a_ b_c and _d",
+])
+def test_text_is_never_lost(text):
+    assert _text(render_segments(text)) == text + "\n"
+
+
+def test_dunder_names_are_plain_text():
+    assert _merged(render_segments("after __init__ runs")) == [("after __init__ runs\n", ())]
+
+
+def test_underscores_only_emphasise_whole_words():
+    assert _styled("an _italic_ word") == [("italic", ("italic",))]
+    assert _styled("snake_case_name") == []
+    assert _styled("(_wrapped_)") == [("wrapped", ("italic",))]
+    assert _styled("_a_b_ c") == [("a_b", ("italic",))]
+
+
+def test_unclosed_delimiters_are_shown_as_typed():
+    assert _merged(render_segments("a **b and *c")) == [("a **b and *c\n", ())]
+    assert _merged(render_segments("x `y")) == [("x `y\n", ())]
+
+
+def test_styles_do_not_run_past_the_line():
+    assert _merged(render_segments("*a\nb*")) == [("*a\nb*\n", ())]
+
+
+def test_delimiters_inside_inline_code_are_literal():
+    assert _styled("run `a*b_c*` now") == [("a*b_c*", ("code",))]
+    assert _styled("*see `x*y` here*") == [("see ", ("italic",)), ("x*y", ("code",)), (" here", ("italic",))]
+
+
+def test_nested_bold_and_italic():
+    assert _styled("**bold *both* bold**") == [("bold ", ("bold",)), ("both", ("bold_italic",)), (" bold", ("bold",))]
+
+
+def test_held_back_text_is_released_by_the_closer_or_the_line_end():
+    stream = MarkdownStream()
+    assert _text(stream.feed("plain *wait")) == "plain "
+    assert _merged(stream.feed("ing* more")) == [("waiting", ("italic",)), (" more", ())]
+    assert _text(stream.feed(" *open")) == " "
+    assert _text(stream.feed(" still\n")) == "*open still\n"
+
+
+def test_long_line_with_an_open_delimiter_is_scanned_once():
+    stream = MarkdownStream()
+    stream.feed("*")
+    for _ in range(2000):
+        stream.feed("word ")
+    assert stream._lookahead[1] - stream._lookahead[0] == 1 + 5 * 2000 # Resumes at the end, not the start
+    assert _text(stream.flush()).startswith("*word word")
@@ -0,0 +1,114 @@
+# --- tests/test_render_scheduler.py ---
+import pytest
+
+from ui import render_scheduler
+from ui.render_scheduler import RenderScheduler
+from utils.stream_engine import StreamHandle
+
+
+class _Root:
+    """Enough of a Tk root for the scheduler: after() only records, run() fires one frame."""
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+        return len(self.pending)
+
+    def run(self):
+        callback = self.pending.pop(0)
+        callback()
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(render_scheduler.time, "perf_counter", clock.perf_counter)
+    return clock
+
+
+def _attach(scheduler, *chunks):
+    handle, texts, ends = StreamHandle(), [], []
+    for chunk in chunks:
+        handle.queue.put(chunk)
+    scheduler.attach(handle, texts.append, lambda: ends.append(True))
+    return handle, texts, ends
+
+
+def test_chunks_are_merged_into_one_call_per_frame(clock):
+    root = _Root()
+    scheduler = RenderScheduler(root, fps=60, typewriter_cps=0)
+    handle, texts, ends = _attach(scheduler, "a", "b", "c")
+    root.run()
+    assert texts == ["abc"] and ends == []
+    handle.queue.put("d")
+    handle.queue.put(None)
+    root.run()
+    assert texts == ["abc", "d"] and ends == [True]
+    assert root.pending == [] and scheduler._timer is None # Idle once nothing streams
+
+
+def test_attach_after_idle_starts_the_timer_again(clock):
+    root = _Root()
+    scheduler = RenderScheduler(root, typewriter_cps=0)
+    _attach(scheduler, "x", None)
+    root.run()
+    assert scheduler._timer is None
+    _, texts, _ = _attach(scheduler, "y", None)
+    assert len(root.pending) == 1
+    root.run()
+    assert texts == ["y"]
+
+
+def test_cancelled_stream_is_dropped_without_on_end(clock):
+    root = _Root()
+    scheduler = RenderScheduler(root, typewriter_cps=0)
+    handle, texts, ends = _attach(scheduler, "a")
+    handle.cancelled = True
+    root.run()
+    assert texts == [] and ends == [] and scheduler._timer is None
+
+
+def test_a_raising_callback_keeps_the_timer_alive_for_other_streams(clock):
+    root = _Root()
+    scheduler = RenderScheduler(root, typewriter_cps=0)
+    bad = StreamHandle()
+    bad.queue.put("boom")
+    scheduler.attach(bad, lambda text: 1 / 0, lambda: None)
+    good, texts, ends = _attach(scheduler)
+    with pytest.raises(ZeroDivisionError):
+        root.run()
+    assert scheduler._timer is not None and len(root.pending) == 1 # Still ticking
+    good.queue.put("ok")
+    good.queue.put(None)
+    root.run()
+    assert texts == ["ok"] and ends == [True]
+    assert scheduler._timer is None # The failing stream was detached too
+
+
+def test_typewriter_reveals_text_over_time_and_catches_up(clock):
+    root = _Root()
+    scheduler = RenderScheduler(root, typewriter_cps=80)
+    _, texts, ends = _attach(scheduler, "x" * 40, None)
+    clock.now += 0.125
+    root.run()
+    assert texts == ["x" * 10]
+    clock.now += 0.125
+    root.run()
+    assert len("".join(texts)) == 20 and ends == []
+    _, texts2, _ = _attach(scheduler, "y" * 500, None) # Far ahead: at most MAX_TYPEWRITER_LAG is held back
+    clock.now += 0.125
+    root.run()
+    assert len(texts2[0]) == 500 - int(80 * render_scheduler.MAX_TYPEWRITER_LAG)
+    while root.pending:
+        clock.now += 1
+        root.run()
+    assert "".join(texts) == "x" * 40 and ends == [True]
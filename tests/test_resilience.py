@@ -0,0 +1,105 @@
+# --- tests/test_resilience.py ---
+import asyncio
+import email.utils
+import time
+
+import httpx
+import pytest
+
+from utils.gemini_client import GeminiClient
+from utils.resilience import AttemptFailure, AttemptLog, RetryPolicy, classify, parse_retry_after
+
+HISTORY = [{"role": "user", "parts": [{"text": "Hi"}]}]
+
+
+def _status_error(status, headers=None):
+    request = httpx.Request("POST", "https://example.invalid/")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("status", request=request, response=response)
+
+
+def test_backoff_grows_stays_capped_and_honours_retry_after(monkeypatch):
+    monkeypatch.setattr("utils.resilience.random.uniform", lambda low, high: high) # Worst-case jitter
+    policy = RetryPolicy(base_delay=0.5, max_delay=3.0)
+    assert [policy.backoff(n) for n in (1, 2, 3, 4)] == [0.5, 1.0, 2.0, 3.0]
+    assert policy.backoff(1, retry_after=5) == 5
+
+
+def test_parse_retry_after_takes_seconds_or_a_date():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None and parse_retry_after("soon") is None
+    in_ten = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8 <= parse_retry_after(in_ten) <= 10
+
+
+@pytest.mark.parametrize("status, retryable, fallback_worthy", [
+    (429, True, True), (500, True, True), (503, True, True),
+    (404, False, True), (400, False, False), (403, False, False),
+])
+def test_classify_http_statuses(status, retryable, fallback_worthy):
+    failure = classify(_status_error(status, {"Retry-After": "2"}))
+    assert failure.status == status
+    assert failure.retryable is retryable
+    assert failure.fallback_worthy is fallback_worthy
+    assert failure.retry_after == 2.0
+    assert failure.args[0].startswith(f"Error: API returned an HTTP error: {status}")
+
+
+def test_classify_transport_errors_and_others():
+    request = httpx.Request("POST", "https://example.invalid/")
+    assert classify(httpx.ConnectError("down", request=request)).retryable
+    assert classify(httpx.ReadTimeout("slow", request=request)).retryable
+    failure = classify(ValueError("bad"))
+    assert not failure.retryable and failure.args[0].startswith("Error: An unexpected error")
+    same = AttemptFailure("Error: x")
+    assert classify(same) is same
+
+
+def test_attempt_log_counts_and_percentiles():
+    log = AttemptLog(maxlen=3)
+    for elapsed in (0.1, 0.2, 0.3, 0.4):
+        log.record("m", 1, "ok", 200, elapsed)
+    log.record("m", 1, "retry", 503)
+    assert log.counts() == {"ok": 2, "retry": 1} # Only the newest three are kept
+    assert log.percentile(0.5) == 0.4
+    assert log.percentile(0.5, "failed") is None
+
+
+def _turn(base_url, **kwargs):
+    async def run():
+        client = GeminiClient(base_url=base_url, retry_policy=RetryPolicy(base_delay=0.0))
+        try:
+            chunks = [c async for c in client.stream("test-key-000000", HISTORY, "gemini-test", **kwargs)]
+            return "".join(chunks), client.attempt_log.counts()
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_client_retries_a_rate_limit_then_succeeds(stand_in):
+    server, base_url = stand_in(rate_limit_first=2, retry_after=0)
+    reply, counts = _turn(base_url)
+    assert reply == "Hello from the stand-in server."
+    assert counts == {"retry": 2, "ok": 1} and server.requests == 3
+
+
+def test_client_falls_back_when_the_model_keeps_failing(stand_in):
+    _, base_url = stand_in(unavailable_models=("gemini-test",))
+    reply, counts = _turn(base_url, fallback_models=("gemini-backup",))
+    assert reply == "Hello from the stand-in server."
+    assert counts == {"retry": 2, "fallback": 1, "ok": 1}
+
+
+def test_client_gives_up_with_the_last_error(stand_in):
+    server, base_url = stand_in(error_status=400)
+    reply, counts = _turn(base_url, fallback_models=("gemini-backup",))
+    assert reply.startswith("Error: API returned an HTTP error: 400")
+    assert counts == {"failed": 1} and server.requests == 1 # Not retryable, not worth a fallback
+
+
+def test_a_long_retry_after_skips_to_the_next_model(stand_in):
+    server, base_url = stand_in(rate_limit_first=1, retry_after=120)
+    reply, counts = _turn(base_url, fallback_models=("gemini-backup",))
+    assert reply == "Hello from the stand-in server."
+    assert counts == {"fallback": 1, "ok": 1}
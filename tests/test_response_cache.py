@@ -0,0 +1,134 @@
+# --- tests/test_response_cache.py ---
+import asyncio
+import os
+
+import pytest
+
+from utils import response_cache
+from utils.gemini_client import GeminiClient
+from utils.resilience import RetryPolicy
+from utils.response_cache import ResponseCache
+
+HISTORY = [{"role": "user", "parts": [{"text": "Hi"}]}]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock.time)
+    return clock
+
+
+def _cache(tmp_path, **kwargs):
+    return ResponseCache(directory=str(tmp_path / "responses"), **kwargs)
+
+
+def test_key_covers_model_instruction_history_and_image():
+    key = ResponseCache.make_key("m", "persona", HISTORY, b"png")
+    assert key == ResponseCache.make_key("m", "persona", [dict(HISTORY[0])], b"png")
+    others = [ResponseCache.make_key("m2", "persona", HISTORY, b"png"),
+              ResponseCache.make_key("m", "persona 2", HISTORY, b"png"),
+              ResponseCache.make_key("m", "persona", HISTORY + HISTORY, b"png"),
+              ResponseCache.make_key("m", "persona", HISTORY, b"jpg"),
+              ResponseCache.make_key("m", "persona", HISTORY)]
+    assert len({key, *others}) == 6
+
+
+def test_put_then_get_counts_hits_and_misses(tmp_path, clock):
+    cache = _cache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", iter(["a", "b"]))
+    assert cache.get("k") == ["a", "b"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_the_ttl_in_both_tiers(tmp_path, clock):
+    cache = _cache(tmp_path, ttl_seconds=60)
+    cache.put("k", ["a"])
+    clock.now += 60
+    assert cache.get("k") == ["a"]
+    clock.now += 1
+    assert cache.get("k") is None
+    assert os.listdir(cache.directory) == [] # The expired file is deleted too
+
+
+def test_least_recently_used_entry_leaves_memory_first(tmp_path, clock):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.put("a", ["1"])
+    cache.put("b", ["2"])
+    cache.get("a") # Now "b" is the least recently used
+    cache.put("c", ["3"])
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.get("b") == ["2"] # Still on disk, and back in memory
+    assert list(cache._entries) == ["c", "b"]
+
+
+def test_memory_tier_is_capped_in_bytes(tmp_path, clock):
+    cache = _cache(tmp_path, max_memory_bytes=10)
+    cache.put("a", ["x" * 6])
+    cache.put("b", ["y" * 6])
+    assert list(cache._entries) == ["b"]
+    assert cache._memory_bytes == 6
+
+
+def test_disk_tier_drops_the_oldest_files_over_its_cap(tmp_path, clock):
+    cache = _cache(tmp_path, max_disk_bytes=200) # Room for two of these files
+    for i, key in enumerate("abc"):
+        cache.put(key, ["z" * 40])
+        os.utime(cache._path(key), (i, i)) # Distinct, increasing mtimes
+    cache._trim_disk()
+    assert sorted(os.listdir(cache.directory)) == ["b.json", "c.json"]
+
+
+def test_clear_empties_both_tiers(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.put("k", ["a"])
+    cache.clear()
+    assert cache.get("k") is None
+    assert os.listdir(cache.directory) == []
+
+
+def _replies(base_url, cache, turns, **kwargs):
+    async def run():
+        client = GeminiClient(base_url=base_url, retry_policy=RetryPolicy(base_delay=0.0))
+        client.response_cache = cache
+        try:
+            replies = []
+            for _ in range(turns):
+                chunks = [c async for c in client.stream("test-key-000000", HISTORY, "gemini-test", **kwargs)]
+                replies.append("".join(chunks))
+            return replies
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_client_replays_a_complete_reply_from_the_cache(stand_in, tmp_path):
+    server, base_url = stand_in()
+    cache = _cache(tmp_path)
+    assert _replies(base_url, cache, 2) == ["Hello from the stand-in server."] * 2
+    assert server.requests == 1 and cache.hits == 1
+
+
+def test_client_does_not_cache_a_fallback_models_reply(stand_in, tmp_path):
+    server, base_url = stand_in(unavailable_models=("gemini-test",))
+    cache = _cache(tmp_path)
+    replies = _replies(base_url, cache, 2, fallback_models=("gemini-backup",))
+    assert replies == ["Hello from the stand-in server."] * 2
+    assert server.requests > 2 # The requested model was tried again on the second turn
+    assert cache.hits == 0 and not cache._entries
+
+
+def test_client_does_not_cache_an_interrupted_reply(stand_in, tmp_path):
+    server, base_url = stand_in(error_after=2)
+    cache = _cache(tmp_path)
+    _replies(base_url, cache, 2)
+    assert server.requests == 2 and cache.hits == 0
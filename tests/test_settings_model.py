@@ -0,0 +1,95 @@
+# --- tests/test_settings_model.py ---
+import json
+
+import pytest
+
+from utils.settings_model import FIELDS, Settings
+
+NON_DEFAULT = dict(image_max_edge=0, image_byte_budget_kb=0, autopilot_activity_threshold=0.5,
+                   screen_change_threshold=0.2, typewriter_cps=0, render_fps=30,
+                   autopilot_intervals=[30, 60], autopilot_cooldown_seconds=5, history_token_budget=4000,
+                   persona="Be brief.", api_key="key-123")
+
+
+@pytest.mark.parametrize("values", [{}, NON_DEFAULT], ids=["defaults", "non-default"])
+def test_form_round_trip_changes_nothing(values):
+    settings = Settings(**values)
+    before = settings.to_dict()
+    form = settings.form_values()
+    assert all(isinstance(value, str) for value in form.values())
+    settings.apply_form(form)
+    assert settings.to_dict() == before
+
+
+@pytest.mark.parametrize("field, value", [
+    ("autopilot_cooldown_seconds", "0"),
+    ("autopilot_activity_threshold", "1.5"),
+    ("history_token_budget", "999"),
+    ("screen_change_threshold", "-0.1"),
+    ("image_max_edge", "-1"),
+    ("render_fps", "0"),
+    ("typewriter_cps", "-5"),
+    ("autopilot_intervals", "30, -1"),
+    ("autopilot_intervals", " , "),
+    ("render_fps", "fast"),
+])
+def test_invalid_form_value_raises_and_changes_nothing(field, value):
+    settings = Settings()
+    before = settings.to_dict()
+    form = settings.form_values()
+    form[field] = value
+    with pytest.raises(ValueError):
+        settings.apply_form(form)
+    assert settings.to_dict() == before
+
+
+def test_form_strips_whitespace():
+    settings = Settings()
+    form = settings.form_values()
+    form.update(api_key="  key  ", persona=" Hi \n", autopilot_intervals=" 10 ,20, ")
+    settings.apply_form(form)
+    assert (settings.api_key, settings.persona, settings.autopilot_intervals) == ("key", "Hi", [10, 20])
+
+
+def test_save_then_load_round_trips(tmp_path):
+    path = str(tmp_path / "settings.json")
+    Settings(**NON_DEFAULT).save(path)
+    loaded, needs_save = Settings.load(path)
+    assert loaded.to_dict() == Settings(**NON_DEFAULT).to_dict()
+    assert not needs_save
+
+
+def test_missing_keys_fall_back_to_the_defaults(tmp_path, monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({"theme": "light"}))
+    loaded, needs_save = Settings.load(str(path))
+    assert loaded.theme == "light"
+    assert {key: getattr(loaded, key) for key in FIELDS if key != "theme"} == \
+        {key: default for key, (default, _) in FIELDS.items() if key != "theme"}
+    assert not needs_save
+
+
+def test_invalid_or_unreadable_values_are_reset_and_saved(tmp_path, monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({"theme": "purple", "render_fps": 0, "autopilot_intervals": []}))
+    loaded, needs_save = Settings.load(str(path))
+    assert (loaded.theme, loaded.render_fps) == (FIELDS["theme"][0], FIELDS["render_fps"][0])
+    assert loaded.autopilot_intervals == FIELDS["autopilot_intervals"][0]
+    assert needs_save
+    path.write_text("{not json")
+    assert Settings.load(str(path))[1]
+    assert Settings.load(str(tmp_path / "missing.json"))[1]
+
+
+def test_api_key_falls_back_to_the_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", " env-key ")
+    loaded, _ = Settings.load(str(tmp_path / "missing.json"))
+    assert loaded.api_key == "env-key"
+
+
+def test_list_defaults_are_not_shared_between_instances():
+    first, second = Settings(), Settings()
+    first.autopilot_intervals.append(1)
+    assert second.autopilot_intervals == FIELDS["autopilot_intervals"][0]
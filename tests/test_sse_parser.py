@@ -0,0 +1,80 @@
+# --- tests/test_sse_parser.py ---
+import json
+
+import pytest
+
+from utils.sse_parser import JSON_BACKENDS, SSEParser, finish_reason, iter_text_parts
+
+
+def _event(text, finish=None):
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}}
+    if finish:
+        candidate["finishReason"] = finish
+    return {"candidates": [candidate]}
+
+
+def _stream(*events, newline=b"\r\n"):
+    return b"".join(b"data: " + json.dumps(e).encode() + newline + newline for e in events)
+
+
+EVENTS = [_event("Hello"), _event(" wörld"), _event("!", "STOP")]
+
+
+@pytest.mark.parametrize("backend", sorted(JSON_BACKENDS))
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_any_chunking_gives_the_same_events(backend, size):
+    raw = _stream(*EVENTS)
+    parser = SSEParser(backend)
+    events = []
+    for i in range(0, len(raw), size):
+        events += parser.feed(raw[i:i + size])
+    events += parser.flush()
+    assert events == EVENTS
+
+
+def test_multiline_data_is_joined_with_newlines():
+    parser = SSEParser("json")
+    assert parser.feed(b'data: {"a":\ndata: 1}\n\n') == [{"a": 1}]
+
+
+def test_comments_and_other_fields_are_ignored():
+    parser = SSEParser("json")
+    assert parser.feed(b': keep-alive\nevent: message\nid: 7\ndata: {"a": 1}\n\n') == [{"a": 1}]
+
+
+def test_malformed_event_is_none_and_parsing_goes_on():
+    parser = SSEParser("json")
+    assert parser.feed(b"data: {oops\n\n" + _stream(EVENTS[0])) == [None, EVENTS[0]]
+
+
+def test_feed_accepts_memoryview_and_bytearray():
+    raw = bytearray(_stream(EVENTS[0]))
+    parser = SSEParser("json")
+    events = parser.feed(memoryview(raw)[:10])
+    raw[:10] = b"x" * 10 # The parser must not keep looking at the caller's buffer
+    events += parser.feed(bytes(_stream(EVENTS[0]))[10:])
+    assert events == [EVENTS[0]]
+
+
+@pytest.mark.parametrize("ending", [b"", b"\r\n", b"\r\n\r", b"\n"])
+def test_flush_returns_the_unterminated_last_event(ending):
+    raw = _stream(*EVENTS[:2]) + b"data: " + json.dumps(EVENTS[2]).encode() + ending
+    parser = SSEParser("json")
+    events = parser.feed(raw)
+    events += parser.flush()
+    assert events == EVENTS
+    assert parser.flush() == []
+
+
+def test_text_parts_and_finish_reason():
+    event = {"candidates": [{"content": {"parts": [{"text": "a"}, {"inline_data": {}}, {"text": "b"}]},
+                             "finishReason": "MAX_TOKENS"}]}
+    assert list(iter_text_parts(event)) == ["a", "b"]
+    assert finish_reason(event) == "MAX_TOKENS"
+    assert finish_reason(_event("x")) is None
+    assert list(iter_text_parts(None)) == []
+
+
+def test_error_event_becomes_an_error_text():
+    texts = list(iter_text_parts({"error": {"code": 500, "message": "boom"}}))
+    assert texts == ["Error: The API reported a problem mid-stream: boom"]
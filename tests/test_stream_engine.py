@@ -0,0 +1,66 @@
+# --- tests/test_stream_engine.py ---
+import asyncio
+
+import pytest
+
+from utils.stream_engine import StreamEngine
+
+
+@pytest.fixture
+def engine():
+    engine = StreamEngine()
+    yield engine
+    engine.close()
+
+
+def _drain(handle, timeout=5):
+    chunks = []
+    while True:
+        chunk = handle.queue.get(timeout=timeout)
+        if chunk is None:
+            return chunks
+        chunks.append(chunk)
+
+
+def test_chunks_then_sentinel(engine):
+    async def stream():
+        for text in ("a", "b"):
+            yield text
+    handle = engine.submit(stream)
+    assert _drain(handle) == ["a", "b"]
+
+
+def test_a_failing_stream_ends_with_an_error_chunk(engine):
+    async def stream():
+        yield "partial"
+        raise RuntimeError("boom")
+    handle = engine.submit(stream)
+    chunks = _drain(handle)
+    assert chunks[0] == "partial"
+    assert chunks[1].startswith("Error:") and "boom" in chunks[1]
+    assert len(chunks) == 2
+
+
+def test_cancel_ends_the_stream_without_an_error(engine):
+    closed = []
+
+    async def stream():
+        try:
+            yield "first"
+            await asyncio.sleep(60)
+            yield "never"
+        finally:
+            closed.append(True)
+    handle = engine.submit(stream)
+    assert handle.queue.get(timeout=5) == "first"
+    handle.cancel()
+    assert _drain(handle) == []
+    assert closed == [True]
+    assert handle.cancelled
+
+
+def test_run_waits_for_a_coroutine(engine):
+    async def answer():
+        await asyncio.sleep(0)
+        return 42
+    assert engine.run(answer(), timeout=5) == 42
@@ -0,0 +1,314 @@
+# --- ui/chat_view.py ---
+"""
+A virtualized chat list on a canvas.
+
+Every message gets a row with a height (estimated until its bubble has been
+shown once, then measured), but only rows in the viewport plus some overscan
+have a real MessageBubble. Bubbles that scroll out of range go back to a small
+per-role pool and are reused for the next rows that scroll in, so a loaded
+session of hundreds of messages costs a screenful of widgets, not hundreds.
+"""
+import bisect
+import math
+
+OVERSCAN_PX = 600       # Extra pixels above and below the viewport that get real bubbles
+ROW_GAP = 20            # Vertical space between bubbles
+SIDE_PADDING = 20       # Horizontal space on each side of a bubble
+POOL_PER_ROLE = 6       # Idle bubbles kept for reuse, per role
+# Rough guesses for rows that were never shown, corrected once the bubble is measured
+LINE_HEIGHT_PX = 20
+AVG_CHAR_PX = 7.5
+BUBBLE_CHROME_PX = 55   # Padding, author header and copy button around the text
+
+
+class _Row:
+    __slots__ = ("message", "height", "measured_width", "bubble", "item", "pinned")
+
+    def __init__(self, message, height, pinned=False):
+        self.message = message
+        self.height = height
+        self.measured_width = None # Bubble width the height was measured at (None = estimate)
+        self.bubble = None
+        self.item = None           # Canvas window item while the bubble is shown
+        self.pinned = pinned       # Keeps its bubble while off screen (e.g. it is streaming)
+
+
+class ChatView:
+    def __init__(self, canvas, create_bubble, on_show=None, scrollbar=None):
+        """
+        create_bubble(parent, message) makes a new MessageBubble; on_show(bubble) runs each
+        time a bubble (new or reused) is put on a row, e.g. to add its copy button.
+        """
+        self.canvas = canvas
+        self.create_bubble = create_bubble
+        self.on_show = on_show
+        self.scrollbar = scrollbar
+        self.created = 0  # Bubbles ever created, to see the recycling at work
+        self.reused = 0
+        self._rows = []
+        self._tops = []   # y of each row, kept in step with _rows
+        self._total = 0
+        self._live = []   # Rows that currently have a bubble
+        self._orphans = [] # Pinned rows whose message left the list; off the canvas until unpinned
+        self._pool = {}   # role -> idle bubbles
+        self._width = 1
+        self._refresh_id = None
+        self._refreshing = False
+        self._resized = {} # row -> new bubble height, applied in one batch
+        self._resize_id = None
+        canvas.configure(yscrollcommand=self._on_yview)
+        canvas.bind("<Configure>", self._on_canvas_configure)
+
+    def __len__(self):
+        return len(self._rows)
+
+    # --- Content ---
+
+    def set_messages(self, messages):
+        """
+        Shows a new list of messages. Pinned rows keep their bubble: in place when their
+        message is still there, off the canvas otherwise, until they are unpinned.
+        """
+        present = set(map(id, messages))
+        kept = {id(row.message): row for row in self._live if row.pinned and id(row.message) in present}
+        for row in list(self._live):
+            if id(row.message) in kept:
+                continue
+            if row.pinned:
+                self._orphan(row) # Still streaming into its bubble, so it must stay alive
+            else:
+                self._release(row)
+        self._rows = [kept.get(id(m)) or _Row(m, self._estimate(m)) for m in messages]
+        self._relayout_from(0)
+        self.scroll_to_bottom()
+
+    def append(self, message, pin=False):
+        """Adds a message at the end and returns its bubble if it is (or must stay) on screen."""
+        follow = self._at_bottom()
+        row = _Row(message, self._estimate(message), pinned=pin)
+        self._rows.append(row)
+        self._relayout_from(len(self._rows) - 1)
+        if pin:
+            self._materialize(len(self._rows) - 1)
+        if follow:
+            self.scroll_to_bottom()
+        self._refresh()
+        return row.bubble
+
+    def replace(self, old, new):
+        """Points the row of 'old' at 'new' (its bubble already shows the new text)."""
+        row = self._find(old) or self._find_orphan(old)
+        if row is not None:
+            row.message = new
+            if row.bubble is not None:
+                row.bubble.message = new
+
+    def unpin(self, message):
+        orphan = self._find_orphan(message)
+        if orphan is not None: # Its message is gone from the chat; the bubble can go now
+            self._orphans.remove(orphan)
+            if orphan.bubble.winfo_exists():
+                orphan.bubble.destroy()
+            return
+        row = self._find(message)
+        if row is not None:
+            row.pinned = False
+            self._schedule_refresh()
+
+    def remove(self, message):
+        row = self._find(message)
+        if row is None:
+            return
+        index = self._rows.index(row)
+        if row.bubble is not None:
+            self._release(row)
+        del self._rows[index]
+        self._relayout_from(index)
+        self._schedule_refresh()
+
+    def clear(self):
+        for row in list(self._live):
+            if row.pinned:
+                self._orphan(row)
+            else:
+                self._release(row)
+        self._rows = []
+        self._relayout_from(0)
+        self.canvas.yview_moveto(0)
+
+    def bubbles(self):
+        """Every bubble the view holds, shown or pooled (e.g. to recolour them after a theme switch)."""
+        for row in self._live + self._orphans:
+            yield row.bubble
+        for bubbles in self._pool.values():
+            yield from bubbles
+
+    def scroll_to_bottom(self):
+        self.canvas.yview_moveto(1.0)
+        self._schedule_refresh()
+
+    # --- Layout ---
+
+    def _find_orphan(self, message):
+        for row in self._orphans:
+            if row.message is message:
+                return row
+        return None
+
+    def _find(self, message):
+        for row in reversed(self._rows): # Usually one of the newest
+            if row.message is message:
+                return row
+        return None
+
+    def _bubble_width(self):
+        return max(1, self._width - 2 * SIDE_PADDING - 4) # A few pixels spare so nothing clips
+
+    def _estimate(self, message):
+        chars_per_line = max(1, int(self._bubble_width() / AVG_CHAR_PX))
+        lines = sum(max(1, math.ceil(len(line) / chars_per_line)) for line in message.text.split("\n"))
+        return lines * LINE_HEIGHT_PX + BUBBLE_CHROME_PX
+
+    def _relayout_from(self, index):
+        """Recomputes the y of rows from 'index' on and moves the bubbles that are shown."""
+        if index:
+            y = self._tops[index - 1] + self._rows[index - 1].height + ROW_GAP
+        else:
+            y = ROW_GAP // 2
+        del self._tops[index:]
+        for row in self._rows[index:]:
+            self._tops.append(y)
+            if row.item is not None:
+                self.canvas.coords(row.item, SIDE_PADDING, y)
+            y += row.height + ROW_GAP
+        self._total = y - ROW_GAP // 2 if self._rows else 0
+        self.canvas.configure(scrollregion=(0, 0, self._width, self._total))
+
+    def _at_bottom(self):
+        return self.canvas.yview()[1] >= 0.999
+
+    def _on_canvas_configure(self, event):
+        if event.width == self._width:
+            return
+        self._width = event.width
+        width = self._bubble_width()
+        for row in self._rows:
+            if row.item is not None:
+                self.canvas.itemconfig(row.item, width=width) # Re-measured by their <Configure>
+            elif row.measured_width != width:
+                row.height = self._estimate(row.message)
+        self._relayout_from(0)
+        self._schedule_refresh()
+
+    def _on_row_resize(self, row, height):
+        # Collected and applied together, so a window resize relays the list out once
+        if height > 1:
+            self._resized[row] = height
+            if self._resize_id is None:
+                self._resize_id = self.canvas.after_idle(self._apply_resizes)
+
+    def _apply_resizes(self):
+        self._resize_id = None
+        resized, self._resized = self._resized, {}
+        follow = self._at_bottom()
+        view_top = self.canvas.canvasy(0)
+        width = self._bubble_width()
+        first, shift = None, 0
+        for index, row in enumerate(self._rows):
+            height = resized.get(row)
+            if height is None or row.bubble is None:
+                continue
+            row.measured_width = width
+            if height == row.height:
+                continue
+            if self._tops[index] + row.height <= view_top:
+                shift += height - row.height # Above the viewport
+            row.height = height
+            if first is None:
+                first = index
+        if first is None:
+            return
+        self._relayout_from(first + 1)
+        if follow:
+            self.canvas.yview_moveto(1.0)
+        elif shift and self._total:
+            self.canvas.yview_moveto((view_top + shift) / self._total) # Keep what is on screen in place
+        self._schedule_refresh()
+
+    # --- Bubbles ---
+
+    def _on_yview(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self._refresh_id is None:
+            self._refresh_id = self.canvas.after_idle(self._refresh)
+
+    def _refresh(self):
+        """Gives bubbles to the rows in the viewport plus overscan and takes them from the rest."""
+        self._refresh_id = None
+        if self._refreshing:
+            # Bubbles call update_idletasks() while drawing; try again from the event loop
+            self._refresh_id = self.canvas.after(1, self._refresh)
+            return
+        self._refreshing = True
+        try:
+            view_top = self.canvas.canvasy(0)
+            top = view_top - OVERSCAN_PX
+            bottom = view_top + self.canvas.winfo_height() + OVERSCAN_PX
+            first = max(0, bisect.bisect_right(self._tops, top) - 1)
+            last = bisect.bisect_left(self._tops, bottom)
+            wanted = set(map(id, self._rows[first:last]))
+            for row in list(self._live):
+                if id(row) not in wanted and not row.pinned:
+                    self._release(row)
+            for index in range(first, last):
+                self._materialize(index)
+        finally:
+            self._refreshing = False
+
+    def _materialize(self, index):
+        row = self._rows[index]
+        if row.bubble is not None:
+            return row.bubble
+        pool = self._pool.get(row.message.role)
+        if pool:
+            bubble = pool.pop()
+            bubble.rebind(row.message)
+            self.reused += 1
+        else:
+            bubble = self.create_bubble(self.canvas, row.message)
+            self.created += 1
+        if self.on_show:
+            self.on_show(bubble)
+        row.bubble = bubble
+        row.item = self.canvas.create_window(SIDE_PADDING, self._tops[index], window=bubble,
+                                             anchor="nw", width=self._bubble_width())
+        bubble.bind("<Configure>", lambda e, r=row: self._on_row_resize(r, e.height))
+        self._live.append(row)
+        return bubble
+
+    def _orphan(self, row):
+        """Takes a pinned row's bubble off the canvas but keeps it alive for its stream."""
+        self._live.remove(row)
+        self.canvas.delete(row.item)
+        row.item = None
+        row.bubble.unbind("<Configure>") # Not in the layout anymore
+        self._orphans.append(row)
+
+    def _release(self, row):
+        """Takes a row's bubble off the canvas, into the pool if there is room."""
+        bubble = row.bubble
+        self._live.remove(row)
+        self.canvas.delete(row.item) # Unmaps the bubble without destroying it
+        row.bubble = row.item = None
+        if not bubble.winfo_exists():
+            return
+        bubble.unbind("<Configure>")
+        pool = self._pool.setdefault(row.message.role, [])
+        if len(pool) < POOL_PER_ROLE:
+            pool.append(bubble)
+        else:
+            bubble.destroy()
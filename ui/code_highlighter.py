@@ -0,0 +1,160 @@
+# --- ui/code_highlighter.py ---
+"""
+Pygments highlighting for code blocks, off the Tk thread.
+
+Bubbles hand over a block's text and where it starts; a worker thread picks a
+lexer (from the fence language, or guessed once and cached by content hash),
+lexes it and turns the tokens into tag ranges. The Tk thread then applies
+those ranges a batch per frame, so even a huge code answer never stalls the UI.
+Pygments is only imported by the worker, so it costs nothing at startup.
+"""
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+
+# Token types that bubbles give a colour to (as tag names); sub-types use their nearest styled parent
+STYLED_TAGS = (
+    "Token.Keyword", "Token.Name.Builtin", "Token.Name.Function", "Token.Name.Class",
+    "Token.Literal.String", "Token.Literal.Number", "Token.Comment", "Token.Operator.Word",
+)
+GUESS_SAMPLE_CHARS = 4096 # guess_lexer() tries every lexer, so it only sees the start of a block
+LEXER_OPTIONS = {"stripnl": False, "ensurenl": False} # Keep offsets lined up with the widget text
+
+
+_tag_cache = {}
+
+def _styled_tag(ttype):
+    """The tag name for a token type, or None if it isn't coloured."""
+    try:
+        return _tag_cache[ttype]
+    except KeyError:
+        pass
+    tag, current = None, ttype
+    while current is not None:
+        if str(current) in STYLED_TAGS:
+            tag = str(current)
+            break
+        current = current.parent
+    _tag_cache[ttype] = tag
+    return tag
+
+
+class CodeHighlighter:
+    def __init__(self, root, ranges_per_frame=500, frame_ms=16, max_guesses=256):
+        self.root = root
+        self.ranges_per_frame = ranges_per_frame
+        self.frame_ms = frame_ms
+        self.max_guesses = max_guesses
+        self._named_lexers = {}        # Fence language -> lexer (None if Pygments doesn't know it)
+        self._guessed = OrderedDict()  # sha1 of the block -> guessed lexer, most recent last
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()  # (widget, is_current, {tag: [index, index, ...]}) from the worker
+        self._applying = None          # The result being applied, with its remaining ranges
+        self._pending = 0              # Jobs submitted but not fully applied
+        self._timer = None
+        self._thread = threading.Thread(target=self._work, name="code-highlighter", daemon=True)
+        self._thread.start()
+
+    def highlight(self, widget, start, code, language=None, is_current=lambda: True):
+        """
+        Queues one code block. 'start' is the Tk index where 'code' begins in 'widget';
+        is_current() is checked on the Tk thread before applying, so a bubble that was
+        redrawn or destroyed in the meantime is skipped. Call from the Tk thread.
+        """
+        if not code.strip():
+            return
+        self._pending += 1
+        self._jobs.put((widget, start, code, language, is_current))
+        if self._timer is None:
+            self._timer = self.root.after(self.frame_ms, self._apply_batch)
+
+    # --- Worker thread ---
+
+    def _work(self):
+        while True:
+            widget, start, code, language, is_current = self._jobs.get()
+            try:
+                ranges = self._tag_ranges(start, code, language)
+            except Exception as e:
+                print(f"[HIGHLIGHT] Could not highlight a {language or 'code'} block: {e}")
+                ranges = {}
+            self._results.put((widget, is_current, ranges))
+
+    def _lexer_for(self, code, language):
+        from pygments.lexers import get_lexer_by_name, guess_lexer
+        from pygments.lexers.special import TextLexer
+        from pygments.util import ClassNotFound
+        if language:
+            name = language.lower()
+            if name not in self._named_lexers:
+                try:
+                    self._named_lexers[name] = get_lexer_by_name(name, **LEXER_OPTIONS)
+                except ClassNotFound:
+                    self._named_lexers[name] = None
+            if self._named_lexers[name] is not None:
+                return self._named_lexers[name]
+
+        key = hashlib.sha1(code.encode("utf-8", "replace")).hexdigest()
+        lexer = self._guessed.get(key)
+        if lexer is None:
+            try:
+                lexer = guess_lexer(code[:GUESS_SAMPLE_CHARS], **LEXER_OPTIONS)
+            except ClassNotFound:
+                lexer = TextLexer()
+            self._guessed[key] = lexer
+            if len(self._guessed) > self.max_guesses:
+                self._guessed.popitem(last=False)
+        else:
+            self._guessed.move_to_end(key)
+        return lexer
+
+    def _tag_ranges(self, start, code, language):
+        """Lexes a block into {tag: [start, end, start, end, ...]} Tk indices."""
+        from pygments import lex
+        from pygments.lexers.special import TextLexer
+        lexer = self._lexer_for(code, language)
+        if isinstance(lexer, TextLexer):
+            return {}
+        ranges = {}
+        offset = 0
+        for ttype, value in lex(code, lexer):
+            end = offset + len(value)
+            tag = _styled_tag(ttype)
+            if tag and value.strip():
+                ranges.setdefault(tag, []).extend((f"{start}+{offset}c", f"{start}+{end}c"))
+            offset = end
+        return ranges
+
+    # --- Tk thread ---
+
+    def _apply_batch(self):
+        """Applies up to ranges_per_frame ranges, then yields back to the event loop."""
+        budget = self.ranges_per_frame
+        while budget > 0:
+            if self._applying is None:
+                try:
+                    widget, is_current, ranges = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._applying = (widget, is_current, list(ranges.items()))
+
+            widget, is_current, remaining = self._applying
+            if not (is_current() and widget.winfo_exists()):
+                remaining.clear() # Redrawn or destroyed since it was queued
+            while remaining and budget > 0:
+                tag, indices = remaining[-1]
+                take = min(len(indices), budget * 2)
+                widget.tag_add(tag, *indices[:take]) # One call for many ranges of the same tag
+                del indices[:take]
+                budget -= take // 2
+                if not indices:
+                    remaining.pop()
+            if not remaining:
+                self._applying = None
+                self._pending -= 1
+
+        if self._pending > 0:
+            self._timer = self.root.after(self.frame_ms, self._apply_batch)
+        else:
+            self._timer = None
@@ -1,17 +1,10 @@
 # --- ui/main_window.py ---
 import tkinter as tk
 from tkinter import ttk, messagebox
-import os
-import threading
-import mss
-import mss.tools
 from tkinter import filedialog
 import json
 import time
 import sys
-import pywinstyles
-import copy
-import queue
 from utils.theme_manager import ThemeProvider
 
 
@@ -19,13 +12,31 @@ from utils.theme_manager import ThemeProvider
 from ui.placeholder_entry import PlaceholderEntry
 from utils.context_manager import get_active_window_info
 from ui.region_selector import RegionSelector
-from ui.message_bubble import MessageBubble
+from ui.message_bubble import MessageBubble, BODY_FONT, TAG_FONTS, TAG_MARGINS
+from ui.chat_view import ChatView
+from ui import render_scheduler
+from ui.code_highlighter import CodeHighlighter
+from ui.text_measure import TextMeasurer
+from ui.theme_registry import ThemeRegistry
+from ui.toast import Toast
+from ui import winstyles
 from utils import gemini_client
+from utils import screen_capture
+from utils.capture_service import CaptureService
+from utils import history_window
+from utils import frame_diff
+from utils.response_cache import ResponseCache
+from utils.stream_engine import StreamEngine
+from utils.conversation_store import ConversationStore, Message
+from utils.settings_model import Settings, DEFAULT_MODEL
 from utils.autopilot import Autopilot
+from utils.input_activity import InputActivityMonitor
 from utils.theme_manager import ThemeProvider
 from ui.components.modern_widgets import ModernButton, ModernEntry
 
-DEFAULT_PERSONA = "You are TARS from the movie Interstellar. You are a former U.S. Marine Corps tactical robot. Your personality is witty, sarcastic, and humorous. You were programmed this way to be a better companion. Keep your answers brief, well-formatted, and to the point. Use Markdown for clarity."
+# Dropdown order doubles as the fallback chain: a failing model falls back to the ones after it
+MODEL_CHOICES = ["gemini-3-flash-preview", "gemini-2.5-flash", "gemini-2.5-flash-lite"]
+CAPTURE_POLL_MS = 5 # How often the Tk thread checks on a pending capture
 
 # --- PRE-MADE PERSONA PROMPTS ---
 PERSONA_PRESETS = {
@@ -38,28 +49,46 @@ PERSONA_PRESETS = {
 }
 class OverlayApp:
     def __init__(self, root):
-        self.root = root; self.api_key = os.getenv("GEMINI_API_KEY"); self.is_visible = True
-        self.conversation_history = []; self.capture_mode_var = tk.StringVar(value="No Capture")
+        self.root = root; self.is_visible = True
+        self.conversation = ConversationStore(); self.capture_mode_var = tk.StringVar(value="No Capture")
         
-        # --- Settings Attributes ---
-        # Using tk.StringVar for model so the dropdown updates automatically
-        self.current_model = tk.StringVar() 
-        self.api_key_var = tk.StringVar() # NEW: For in-app API key management
-        self.current_persona = ""
+        # --- Settings ---
+        # Plain values loaded before any widget exists; the dashboard is built the first time it opens
+        self.settings, needs_save = Settings.load()
+        if needs_save: # Only when the file was missing or had to be repaired
+            self.settings.save()
+        self.settings_frame = None # The dashboard, once built
+        self.settings_form = {}    # Its text field variables, keyed like Settings.form_values()
+        self.setting_checks = {}   # Its checkbutton variables, keyed by setting
         self.settings_visible = False # State for the collapsible panel
-        self.share_context = tk.BooleanVar(value=True) # On by default
         self.thinking_animation_id = None # To control the "thinking" animation
         self.autopilot_enabled = tk.BooleanVar(value=False) # Off by default
 
-        # --- NEW: Autopilot intervals are now instance attributes ---
-        self.autopilot_intervals = [120, 200, 360, 260, 300] # Default values
-        self.autopilot_intervals_var = tk.StringVar() # For the settings Entry widget
-        self.autopilot_cooldown_seconds = 50 # Default value
-        self.autopilot_cooldown_var = tk.StringVar() # For the settings Entry widget
-        self.autopilot = Autopilot(self, intervals=self.autopilot_intervals) # Create an instance of our engine
+        # Skips re-uploading a screen the model already saw
+        self.screen_change_detector = frame_diff.ScreenChangeDetector(threshold=self.settings.screen_change_threshold)
+        # Lets Autopilot ticks on a screen that hasn't changed pass without a capture or API call
+        self.activity_detector = frame_diff.ActivityDetector(threshold=self.settings.autopilot_activity_threshold)
+        self.pending_status_note = None # Extra text for the status label on the next request
+        self.pending_screen_reference = None # (image, thumbnail) of the last capture, until it is sent
+        self.capture_excluded = False # True while Windows leaves the overlay out of screen captures
+        self.capture_service = CaptureService() # Grabs and encodes off the Tk thread, one mss for the session
+        self._configure_image_encoder()
+        # Keyboard/mouse activity anywhere on the system; hooked once the window is up (see main.py)
+        self.input_activity = InputActivityMonitor()
+        self.autopilot = Autopilot(self, intervals=self.settings.autopilot_intervals) # Create an instance of our engine
+        # One long-lived client so every turn reuses the same pooled, keep-alive connection.
+        # All requests run on the engine's background event loop and can be cancelled.
+        self.stream_engine = StreamEngine()
+        self.gemini_client = gemini_client.GeminiClient()
+        self.active_stream = None # StreamHandle of the in-flight response, if any
+        self.active_stream_view = None # (bubble, placeholder Message) that the stream is rendering into
+        self.render_scheduler = render_scheduler.RenderScheduler(self.root, self.settings.render_fps, self.settings.typewriter_cps)
+        self.code_highlighter = CodeHighlighter(self.root) # Lexes code blocks off the Tk thread
+        self.text_measurer = TextMeasurer(self.root, BODY_FONT, TAG_FONTS, TAG_MARGINS) # Bubble heights without layout passes
         self.last_user_interaction_time = time.time()
-        self.current_theme = tk.StringVar(value="dark") # 'dark' or 'light'
+        self.current_theme = tk.StringVar(value=self.settings.theme) # 'dark' or 'light'
         self.theme_provider = ThemeProvider(self.current_theme.get())
+        self.theme_registry = ThemeRegistry(self.theme_provider) # Widgets register a role; a switch recolours them in one pass
         
         # Apply palette from theme provider
         self._apply_palette()
@@ -78,15 +107,12 @@ class OverlayApp:
         self.root.wm_attributes("-topmost", True)
 
         # The container that holds all our VISIBLE widgets
-        self.container = tk.Frame(root, bg=self.BG_COLOR, padx=10, pady=10)
+        self.container = self.theme_registry.register(tk.Frame(root, bg=self.BG_COLOR, padx=10, pady=10), "window")
         self.container.pack(fill="both", expand=True)
         
         # Apply modern rounding to the main container
-        try:
-            import pywinstyles
-            pywinstyles.apply_style(self.container, "rounded")
-            pywinstyles.apply_style(root, "mica" if self.current_theme.get() == "dark" else "normal")
-        except: pass
+        winstyles.apply_style(self.container, "rounded")
+        winstyles.apply_style(root, "mica" if self.current_theme.get() == "dark" else "normal")
 
         # Create the opacity variable and set the initial transparency ON THE CONTAINER
         self.opacity_var = tk.DoubleVar(value=0.85)
@@ -102,30 +128,21 @@ class OverlayApp:
         self.create_control_bar_widgets()
         self.create_magic_prompts_bar()
         self.create_response_area_widgets()
-        self.create_settings_panel() # Create the hidden settings panel (moved to end for Z-order)
 
-        self._load_settings() # Load settings (including theme) on startup
-        self._apply_theme() # Apply the loaded theme
+        self._apply_theme() # Window style and ttk styles for the loaded theme
         self._apply_settings_changes() # Start Autopilot if it's enabled on launch
-        
-        # NUCLEAR OPTION: Force an internal sync and save on startup
-        self.api_key = self.api_key_var.get().strip()
-        self.current_persona = self.persona_text.get("1.0", "end-1c").strip()
-        self._save_settings() 
-
-        # Open settings automatically on startup as requested
-        self.toggle_settings_panel()
 
-        # At the end of the __init__ method
-        self.last_feedback_bubble = None # To keep a reference to the temporary message
-        self.feedback_timer_id = None    # To manage the auto-hide timer
+        # The dashboard is only built when it is first opened; without an API key that is right away
+        if not self.settings.api_key:
+            self.root.after(1000, lambda: (self.toggle_settings_panel(), self.show_feedback("Please enter your Gemini API key!")))
 
         # --- Drag Logic Binding ---
         self.control_bar.bind("<ButtonPress-1>", self._on_press)
         self.control_bar.bind("<B1-Motion>", self._on_drag)
 
         # --- NEW: Resize Logic ---
-        self.resize_grip = tk.Label(self.container, text="◢", bg=self.C_WIDGET_BG, fg=self.C_TEXT_SECONDARY, cursor="bottom_right_corner")
+        self.resize_grip = self.theme_registry.register(
+            tk.Label(self.container, text="◢", bg=self.C_WIDGET_BG, fg=self.C_TEXT_SECONDARY, cursor="bottom_right_corner"), "grip")
         self.resize_grip.place(relx=1.0, rely=1.0, anchor="se")
         self.resize_grip.bind("<ButtonPress-1>", self._on_resize_press)
         self.resize_grip.bind("<B1-Motion>", self._on_resize_motion)
@@ -152,7 +169,8 @@ class OverlayApp:
 
     def create_sidebar(self):
         """Creates a professional vertical navigation sidebar."""
-        self.sidebar = tk.Frame(self.container, bg=self.theme_provider.get_palette()["C_SIDEBAR"], width=60)
+        self.sidebar = self.theme_registry.register(
+            tk.Frame(self.container, bg=self.theme_provider.get_palette()["C_SIDEBAR"], width=60), "sidebar")
         self.sidebar.grid(row=0, column=0, rowspan=4, sticky="ns", padx=(0, 10))
         self.sidebar.grid_propagate(False)
 
@@ -164,6 +182,7 @@ class OverlayApp:
             ("🔗", self.toggle_context_sharing, "Share Context"),
             ("💾", self.save_chat, "Save Chat"),
             ("📂", self.load_chat, "Load Chat"),
+            ("⏹", self.stop_response, "Stop"),
             ("🔄", self.refresh_ui, "Refresh UI"),
             ("🧹", self.clear_chat, "Clear")
         ]
@@ -173,11 +192,9 @@ class OverlayApp:
                             command=cmd, bg=self.sidebar["bg"], fg=self.C_TEXT_SECONDARY,
                             activebackground=self.C_ACCENT, activeforeground="white",
                             bd=0, relief="flat", padx=10, pady=15)
+            self.theme_registry.register(btn, "sidebar_button")
             btn.pack(side="top", fill="x")
-            try:
-                import pywinstyles
-                pywinstyles.apply_style(btn, "rounded")
-            except: pass
+            winstyles.apply_style(btn, "rounded")
             # Hover effect
             btn.bind("<Enter>", lambda e, b=btn: b.config(fg=self.C_ACCENT))
             btn.bind("<Leave>", lambda e, b=btn: b.config(fg=self.C_TEXT_SECONDARY))
@@ -278,32 +295,32 @@ class OverlayApp:
 
     def create_control_bar_widgets(self):
         """The Smart Top Bar containing the main prompt and branding."""
-        self.control_bar = tk.Frame(self.container, bg=self.BG_COLOR)
+        self.control_bar = self.theme_registry.register(tk.Frame(self.container, bg=self.BG_COLOR), "window")
         self.control_bar.grid(row=0, column=1, sticky="ew", pady=(0, 10))
         self.control_bar.grid_columnconfigure(0, weight=1)
 
         # Smart Prompt Container
         self.prompt_container = tk.Frame(self.control_bar, bg=self.C_INPUT_BG, padx=5, pady=2,
                                          highlightthickness=1, highlightbackground=self.C_BORDER)
+        self.theme_registry.register(self.prompt_container, "prompt")
         self.prompt_container.grid(row=0, column=0, sticky="ew")
-        try:
-            import pywinstyles
-            pywinstyles.apply_style(self.prompt_container, "rounded")
-        except: pass
+        winstyles.apply_style(self.prompt_container, "rounded")
         
         self.user_input = tk.Entry(self.prompt_container, font=(self.font_family, 12),
                                   bg=self.C_INPUT_BG, fg=self.C_TEXT_PRIMARY,
                                   insertbackground=self.C_TEXT_PRIMARY, bd=0, relief="flat")
+        self.theme_registry.register(self.user_input, "prompt_entry")
         self.user_input.pack(side="left", fill="x", expand=True, padx=10, pady=8)
         self.user_input.bind("<Return>", self.on_user_submit)
         
         # Branding / Title in the bar
         self.branding_label = tk.Label(self.control_bar, text="Overlay Cutex", font=(self.font_family, 10, "bold"),
                                       bg=self.BG_COLOR, fg=self.C_ACCENT)
+        self.theme_registry.register(self.branding_label, "brand")
         self.branding_label.grid(row=0, column=1, padx=10)
     def create_magic_prompts_bar(self):
         """Minimal horizontal bar for quick actions or status."""
-        self.magic_bar = tk.Frame(self.container, bg=self.BG_COLOR)
+        self.magic_bar = self.theme_registry.register(tk.Frame(self.container, bg=self.BG_COLOR), "window")
         self.magic_bar.grid(row=1, column=1, sticky="w", pady=(0, 10), padx=5)
         
         # Capture Mode Switcher (Sleeker design)
@@ -311,25 +328,29 @@ class OverlayApp:
                                   font=(self.font_family, 9), bg=self.C_ACCENT, fg="white",
                                   command=self.cycle_capture_mode, relief="flat", padx=15, pady=4,
                                   activebackground=self.C_ACCENT_HOVER, activeforeground="white")
+        self.theme_registry.register(self.mode_btn, "accent_button")
         self.mode_btn.pack(side="left")
         
         # Add a subtle separator or status text here if needed
         self.status_label = tk.Label(self.magic_bar, text="Ready", font=(self.font_family, 9),
                                     bg=self.BG_COLOR, fg=self.C_TEXT_SECONDARY)
+        self.theme_registry.register(self.status_label, "status")
         self.status_label.pack(side="left", padx=15)
 
     def create_settings_panel(self):
-        """Redesigning the settings panel as a professional two-column dashboard."""
-        self.settings_frame = tk.Frame(self.container, bg=self.C_SIDEBAR, 
-                                      highlightthickness=1, highlightbackground=self.C_BORDER)
-        # Wider but shorter for a dashboard feel
-        self.settings_frame.place(relx=0.5, rely=0.5, anchor="center", relwidth=0.9, relheight=0.85)
-        self.settings_frame.place_forget()
+        """Builds the two-column settings dashboard (hidden). Called the first time it is opened."""
+        start = time.perf_counter()
+        theme = self.theme_registry.register # Every widget gets its colour role as it is created
+        self.settings_frame = theme(tk.Frame(self.container, bg=self.C_SIDEBAR, 
+                                             highlightthickness=1, highlightbackground=self.C_BORDER), "panel_border")
+        # Form fields hold strings until SAVE CONFIGURATION validates them into the settings model
+        self.settings_form = {key: tk.StringVar(value=value) for key, value in self.settings.form_values().items() if key != "persona"}
+        self.model_var = tk.StringVar(value=self.settings.model)
 
         # Canvas for scrollback if needed, but designed for 1-page view
-        self.settings_canvas = tk.Canvas(self.settings_frame, bg=self.C_SIDEBAR, highlightthickness=0, bd=0)
+        self.settings_canvas = theme(tk.Canvas(self.settings_frame, bg=self.C_SIDEBAR, highlightthickness=0, bd=0), "panel")
         self.settings_scrollbar = ttk.Scrollbar(self.settings_frame, orient="vertical", command=self.settings_canvas.yview)
-        self.settings_inner = tk.Frame(self.settings_canvas, bg=self.C_SIDEBAR, padx=30, pady=25)
+        self.settings_inner = theme(tk.Frame(self.settings_canvas, bg=self.C_SIDEBAR, padx=30, pady=25), "panel")
         
         self.settings_inner.bind("<Configure>", lambda e: self.settings_canvas.configure(scrollregion=self.settings_canvas.bbox("all")))
         self.settings_canvas_window = self.settings_canvas.create_window((0, 0), window=self.settings_inner, anchor="nw") 
@@ -339,35 +360,54 @@ class OverlayApp:
         self.settings_canvas.pack(side="left", fill="both", expand=True)
         self.settings_scrollbar.pack(side="right", fill="y")
         
-        try:
-            import pywinstyles
-            pywinstyles.apply_style(self.settings_frame, "rounded")
-        except: pass
+        winstyles.apply_style(self.settings_frame, "rounded")
 
         # Title
-        tk.Label(self.settings_inner, text="CONTROL DASHBOARD", font=(self.font_family, 18, "bold"), 
-                 bg=self.C_SIDEBAR, fg=self.C_ACCENT).grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 20))
+        theme(tk.Label(self.settings_inner, text="CONTROL DASHBOARD", font=(self.font_family, 18, "bold"), 
+                       bg=self.C_SIDEBAR, fg=self.C_ACCENT), "heading").grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 20))
 
         # --- LEFT COLUMN: AI CONFIG ---
-        left_col = tk.Frame(self.settings_inner, bg=self.C_SIDEBAR)
+        left_col = theme(tk.Frame(self.settings_inner, bg=self.C_SIDEBAR), "panel")
         left_col.grid(row=1, column=0, sticky="nsew", padx=(0, 40)) # More padding for breathing room
 
-        tk.Label(left_col, text="AI CORE", font=(self.font_family, 11, "bold"), bg=self.C_SIDEBAR, fg=self.C_ACCENT).pack(anchor="w", pady=(0, 10))
-
-        tk.Label(left_col, text="Gemini Model:", font=(self.font_family, 10, 'bold'), 
-                 bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY).pack(anchor="w")
-        models = ["gemini-3-flash-preview", "gemini-2.5-flash", "gemini-2.5-flash-lite"]
-        self.model_dropdown = ttk.Combobox(left_col, textvariable=self.current_model, values=models, state="readonly")
-        self.model_dropdown.pack(fill="x", pady=(5, 10))
-
-        tk.Label(left_col, text="API Key:", font=(self.font_family, 10, 'bold'), 
-                 bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY).pack(anchor="w")
-        self.api_key_entry = ttk.Entry(left_col, textvariable=self.api_key_var, show="*")
-        self.api_key_entry.pack(fill="x", pady=(5, 15))
-
-        tk.Label(left_col, text="Persona Presets:", font=(self.font_family, 10, 'bold'), 
-                 bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY).pack(anchor="w")
-        self.preset_frame = tk.Frame(left_col, bg=self.C_SIDEBAR)
+        theme(tk.Label(left_col, text="AI CORE", font=(self.font_family, 11, "bold"), bg=self.C_SIDEBAR, fg=self.C_ACCENT), "heading").pack(anchor="w", pady=(0, 10))
+
+        theme(tk.Label(left_col, text="Gemini Model:", font=(self.font_family, 10, 'bold'), 
+                       bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w")
+        self.model_dropdown = ttk.Combobox(left_col, textvariable=self.model_var, values=MODEL_CHOICES, state="readonly")
+        self.model_dropdown.pack(fill="x", pady=(5, 0))
+        self.model_dropdown.bind("<<ComboboxSelected>>", lambda e: setattr(self.settings, "model", self.model_var.get()))
+        self.fallback_check = self._setting_check(left_col, "Fall back to lighter models when busy", "model_fallback_enabled")
+        self.fallback_check.pack(anchor="w", pady=(0, 10))
+
+        theme(tk.Label(left_col, text="API Key:", font=(self.font_family, 10, 'bold'), 
+                       bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w")
+        self.api_key_entry = ttk.Entry(left_col, textvariable=self.settings_form["api_key"], show="*")
+        self.api_key_entry.pack(fill="x", pady=(5, 10))
+
+        theme(tk.Label(left_col, text="History Budget (tokens):", font=(self.font_family, 10, 'bold'), 
+                       bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w")
+        self.history_budget_entry = ttk.Entry(left_col, textvariable=self.settings_form["history_token_budget"])
+        self.history_budget_entry.pack(fill="x", pady=(5, 15))
+
+        theme(tk.Label(left_col, text="Screen Change Threshold (0-1):", font=(self.font_family, 10, 'bold'), 
+                       bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w")
+        self.screen_threshold_entry = ttk.Entry(left_col, textvariable=self.settings_form["screen_change_threshold"])
+        self.screen_threshold_entry.pack(fill="x", pady=(5, 15))
+
+        theme(tk.Label(left_col, text="Screenshot Long Edge (px, 0 = full):", font=(self.font_family, 10, 'bold'), 
+                       bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w")
+        self.image_max_edge_entry = ttk.Entry(left_col, textvariable=self.settings_form["image_max_edge"])
+        self.image_max_edge_entry.pack(fill="x", pady=(5, 15))
+
+        theme(tk.Label(left_col, text="Screenshot Budget (KB, 0 = lossless):", font=(self.font_family, 10, 'bold'), 
+                       bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w")
+        self.image_budget_entry = ttk.Entry(left_col, textvariable=self.settings_form["image_byte_budget_kb"])
+        self.image_budget_entry.pack(fill="x", pady=(5, 15))
+
+        theme(tk.Label(left_col, text="Persona Presets:", font=(self.font_family, 10, 'bold'), 
+                       bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w")
+        self.preset_frame = theme(tk.Frame(left_col, bg=self.C_SIDEBAR), "panel")
         self.preset_frame.pack(fill="x", pady=5)
         for i, key in enumerate(PERSONA_PRESETS):
             btn = tk.Button(self.preset_frame, text=key, font=(self.font_family, 8),
@@ -375,79 +415,108 @@ class OverlayApp:
                             bg=self.C_INPUT_BG, fg=self.C_TEXT_PRIMARY, 
                             activebackground=self.C_ACCENT, activeforeground="white",
                             relief="flat", bd=0, padx=8, pady=4)
-            btn.grid(row=i//3, column=i%3, padx=2, pady=2, sticky="ew")
-            try: pywinstyles.apply_style(btn, "rounded")
-            except: pass
+            theme(btn, "button").grid(row=i//3, column=i%3, padx=2, pady=2, sticky="ew")
+            winstyles.apply_style(btn, "rounded")
 
-        tk.Label(left_col, text="Custom Persona Instructions:", font=(self.font_family, 10, 'bold'), 
-                 bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY).pack(anchor="w", pady=(10, 0))
+        theme(tk.Label(left_col, text="Custom Persona Instructions:", font=(self.font_family, 10, 'bold'), 
+                       bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w", pady=(10, 0))
         self.persona_text = tk.Text(left_col, height=3, font=(self.font_family, 9), 
                                    relief="flat", bg=self.C_INPUT_BG, fg=self.C_TEXT_PRIMARY, 
                                    insertbackground=self.C_TEXT_PRIMARY, padx=10, pady=10)
-        self.persona_text.pack(fill="x", pady=5)
+        theme(self.persona_text, "input").pack(fill="x", pady=5)
+        self.persona_text.insert("1.0", self.settings.persona)
 
         # --- RIGHT COLUMN: APP & SHORTCUTS ---
-        right_col = tk.Frame(self.settings_inner, bg=self.C_SIDEBAR)
+        right_col = theme(tk.Frame(self.settings_inner, bg=self.C_SIDEBAR), "panel")
         right_col.grid(row=1, column=1, sticky="nsew")
 
         # Shortcuts Guide (Compact)
-        tk.Label(right_col, text="QUICK SHORTCUTS", font=(self.font_family, 11, "bold"), bg=self.C_SIDEBAR, fg=self.C_ACCENT).pack(anchor="w", pady=(0, 10))
+        theme(tk.Label(right_col, text="QUICK SHORTCUTS", font=(self.font_family, 11, "bold"), bg=self.C_SIDEBAR, fg=self.C_ACCENT), "heading").pack(anchor="w", pady=(0, 10))
         shortcuts_list = [
             ("Alt + X", "Show/Hide UI"), ("Alt + A", "Focus Chat"),
             ("Alt + 0", "Capture Mode"), ("Alt + D", "Themes"),
             ("Alt + 5", "Context Sync"), ("Alt + W/S", "Opacity")
         ]
-        sc_frame = tk.Frame(right_col, bg=self.C_SIDEBAR)
+        sc_frame = theme(tk.Frame(right_col, bg=self.C_SIDEBAR), "panel")
         sc_frame.pack(fill="x", pady=(0, 15))
         for i, (k, d) in enumerate(shortcuts_list):
-            f = tk.Frame(sc_frame, bg=self.C_SIDEBAR)
+            f = theme(tk.Frame(sc_frame, bg=self.C_SIDEBAR), "panel")
             f.pack(fill="x", pady=1)
-            tk.Label(f, text=k, font=(self.font_family, 9, "bold"), bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY, width=10, anchor="w").pack(side="left")
-            tk.Label(f, text=d, font=(self.font_family, 9), bg=self.C_SIDEBAR, fg=self.C_TEXT_SECONDARY).pack(side="left")
+            theme(tk.Label(f, text=k, font=(self.font_family, 9, "bold"), bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY, width=10, anchor="w"), "label").pack(side="left")
+            theme(tk.Label(f, text=d, font=(self.font_family, 9), bg=self.C_SIDEBAR, fg=self.C_TEXT_SECONDARY), "hint").pack(side="left")
 
         # Autopilot Section
-        tk.Label(right_col, text="AUTOPILOT ENGINE", font=(self.font_family, 10, "bold"), bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY).pack(anchor="w")
-        auto_grid = tk.Frame(right_col, bg=self.C_SIDEBAR)
+        theme(tk.Label(right_col, text="AUTOPILOT ENGINE", font=(self.font_family, 10, "bold"), bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w")
+        auto_grid = theme(tk.Frame(right_col, bg=self.C_SIDEBAR), "panel")
         auto_grid.pack(fill="x", pady=5)
-        tk.Label(auto_grid, text="Intervals (s):", bg=self.C_SIDEBAR, fg=self.C_TEXT_SECONDARY, font=(self.font_family, 9)).grid(row=0, column=0, sticky="w")
-        self.autopilot_intervals_entry = ttk.Entry(auto_grid, textvariable=self.autopilot_intervals_var, width=15)
+        theme(tk.Label(auto_grid, text="Intervals (s):", bg=self.C_SIDEBAR, fg=self.C_TEXT_SECONDARY, font=(self.font_family, 9)), "hint").grid(row=0, column=0, sticky="w")
+        self.autopilot_intervals_entry = ttk.Entry(auto_grid, textvariable=self.settings_form["autopilot_intervals"], width=15)
         self.autopilot_intervals_entry.grid(row=0, column=1, padx=5, pady=2)
-        tk.Label(auto_grid, text="Cooldown:", bg=self.C_SIDEBAR, fg=self.C_TEXT_SECONDARY, font=(self.font_family, 9)).grid(row=1, column=0, sticky="w")
-        self.autopilot_cooldown_entry = ttk.Entry(auto_grid, textvariable=self.autopilot_cooldown_var, width=15)
+        theme(tk.Label(auto_grid, text="Cooldown:", bg=self.C_SIDEBAR, fg=self.C_TEXT_SECONDARY, font=(self.font_family, 9)), "hint").grid(row=1, column=0, sticky="w")
+        self.autopilot_cooldown_entry = ttk.Entry(auto_grid, textvariable=self.settings_form["autopilot_cooldown_seconds"], width=15)
         self.autopilot_cooldown_entry.grid(row=1, column=1, padx=5, pady=2)
+        theme(tk.Label(auto_grid, text="Activity (0-1):", bg=self.C_SIDEBAR, fg=self.C_TEXT_SECONDARY, font=(self.font_family, 9)), "hint").grid(row=2, column=0, sticky="w")
+        self.autopilot_activity_entry = ttk.Entry(auto_grid, textvariable=self.settings_form["autopilot_activity_threshold"], width=15)
+        self.autopilot_activity_entry.grid(row=2, column=1, padx=5, pady=2)
 
         # Appearance & Misc
-        tk.Label(right_col, text="VISUALS", font=(self.font_family, 10, "bold"), bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY).pack(anchor="w", pady=(15, 5))
+        theme(tk.Label(right_col, text="VISUALS", font=(self.font_family, 10, "bold"), bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY), "label").pack(anchor="w", pady=(15, 5))
         self.opacity_slider = ttk.Scale(right_col, from_=0.2, to=1.0, orient="horizontal", variable=self.opacity_var, command=self._on_opacity_change)
         self.opacity_slider.pack(fill="x", pady=5)
+
+        render_grid = theme(tk.Frame(right_col, bg=self.C_SIDEBAR), "panel")
+        render_grid.pack(fill="x")
+        theme(tk.Label(render_grid, text="Render FPS:", bg=self.C_SIDEBAR, fg=self.C_TEXT_SECONDARY, font=(self.font_family, 9)), "hint").grid(row=0, column=0, sticky="w")
+        self.render_fps_entry = ttk.Entry(render_grid, textvariable=self.settings_form["render_fps"], width=15)
+        self.render_fps_entry.grid(row=0, column=1, padx=5, pady=2)
+        theme(tk.Label(render_grid, text="Typewriter (chars/s, 0 = off):", bg=self.C_SIDEBAR, fg=self.C_TEXT_SECONDARY, font=(self.font_family, 9)), "hint").grid(row=1, column=0, sticky="w")
+        self.typewriter_cps_entry = ttk.Entry(render_grid, textvariable=self.settings_form["typewriter_cps"], width=15)
+        self.typewriter_cps_entry.grid(row=1, column=1, padx=5, pady=2)
         
-        misc_frame = tk.Frame(right_col, bg=self.C_SIDEBAR)
+        misc_frame = theme(tk.Frame(right_col, bg=self.C_SIDEBAR), "panel")
         misc_frame.pack(fill="x", pady=10)
         self.theme_button = tk.Button(misc_frame, text="Switch Theme", command=self._toggle_theme, 
                                      bg=self.C_ACCENT, fg="white", font=(self.font_family, 9, "bold"),
                                      relief="flat", padx=15, pady=6)
-        self.theme_button.pack(side="left")
-        try: pywinstyles.apply_style(self.theme_button, "rounded")
-        except: pass
+        theme(self.theme_button, "accent_button").pack(side="left")
+        winstyles.apply_style(self.theme_button, "rounded")
         
-        self.share_ctx_check = tk.Checkbutton(misc_frame, text="Sync Context", variable=self.share_context,
-                                             bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY, selectcolor=self.C_SIDEBAR,
-                                             activebackground=self.C_SIDEBAR, activeforeground=self.C_ACCENT,
-                                             font=(self.font_family, 9))
+        self.share_ctx_check = self._setting_check(misc_frame, "Sync Context", "share_context")
         self.share_ctx_check.pack(side="left", padx=15)
 
+        self.keep_captures_check = self._setting_check(misc_frame, "Keep Captures", "keep_captures")
+        self.keep_captures_check.pack(side="left")
+
+        self.cache_check = self._setting_check(misc_frame, "Cache Replies", "response_cache_enabled")
+        self.cache_check.pack(side="left", padx=(15, 0))
+
+        self.capture_in_place_check = self._setting_check(right_col, "Capture without hiding the overlay", "capture_in_place")
+        self.capture_in_place_check.pack(anchor="w")
+
         # Save/Close Actions
-        btn_frame = tk.Frame(self.settings_inner, bg=self.C_SIDEBAR)
+        btn_frame = theme(tk.Frame(self.settings_inner, bg=self.C_SIDEBAR), "panel")
         btn_frame.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(20, 0))
         
         ttk.Button(btn_frame, text="SAVE CONFIGURATION", command=self.update_settings).pack(side="right", padx=10)
         close_btn = tk.Button(btn_frame, text="CLOSE", command=self.toggle_settings_panel, bg=self.C_INPUT_BG, fg=self.C_TEXT_SECONDARY, 
                   relief="flat", bd=0, padx=20, pady=8)
-        close_btn.pack(side="right")
-        try: pywinstyles.apply_style(close_btn, "rounded")
-        except: pass
+        theme(close_btn, "quiet_button").pack(side="right")
+        winstyles.apply_style(close_btn, "rounded")
+        print(f"[SETTINGS] Dashboard built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def _setting_check(self, parent, text, key):
+        """A checkbutton for a boolean setting. It takes effect at once and is persisted on save."""
+        var = tk.BooleanVar(value=getattr(self.settings, key))
+        self.setting_checks[key] = var
+        check = tk.Checkbutton(parent, text=text, variable=var, command=lambda: setattr(self.settings, key, var.get()),
+                               bg=self.C_SIDEBAR, fg=self.C_TEXT_PRIMARY, selectcolor=self.C_SIDEBAR,
+                               activebackground=self.C_SIDEBAR, activeforeground=self.C_ACCENT,
+                               font=(self.font_family, 9))
+        return self.theme_registry.register(check, "check")
 
     def toggle_settings_panel(self):
+        if self.settings_frame is None:
+            self.create_settings_panel()
         if self.settings_visible:
             self.settings_frame.place_forget() # Use place_forget for place() managed widgets
         else:
@@ -456,113 +525,34 @@ class OverlayApp:
         self.settings_visible = not self.settings_visible
 
     def update_settings(self):
-        # --- NEW: Parse and update autopilot intervals ---
-        intervals_str = self.autopilot_intervals_var.get().strip()
-        cooldown_str = self.autopilot_cooldown_var.get().strip()
+        form = {key: var.get() for key, var in self.settings_form.items()}
+        form["persona"] = self.persona_text.get("1.0", "end-1c")
+        old_intervals = self.settings.autopilot_intervals
         try:
-            # --- NEW: Validate Cooldown ---
-            new_cooldown = int(cooldown_str)
-            if new_cooldown <= 0:
-                raise ValueError("Cooldown must be a positive number.")
-            self.autopilot_cooldown_seconds = new_cooldown
-
-            new_intervals = [int(x.strip()) for x in intervals_str.split(',') if x.strip()]
-            if not new_intervals or any(i <= 0 for i in new_intervals):
-                raise ValueError("Intervals must be positive numbers.")
-
-            # If intervals have changed, update the autopilot instance
-            if new_intervals != self.autopilot_intervals:
-                self.autopilot.stop() # Stop the old one
-                self.autopilot_intervals = new_intervals
-                self.autopilot = Autopilot(self, intervals=self.autopilot_intervals) # Create a new one
-                self._apply_settings_changes() # Restart if it was enabled
-                
+            self.settings.apply_form(form)
         except ValueError as e:
-            messagebox.showerror("Invalid Input", f"There was an error in your Autopilot settings: {e}")
+            messagebox.showerror("Invalid Input", f"There was an error in your Autopilot, history, capture or render settings: {e}")
             return # Stop the save process if input is invalid
 
-        self.current_persona = self.persona_text.get("1.0", "end-1c").strip()
-        self.api_key = self.api_key_var.get().strip() # Update the active key
+        self.screen_change_detector.threshold = self.settings.screen_change_threshold
+        self.activity_detector.threshold = self.settings.autopilot_activity_threshold
+        self._configure_image_encoder()
+        # If intervals have changed, update the autopilot instance
+        if self.settings.autopilot_intervals != old_intervals:
+            self.autopilot.stop() # Stop the old one
+            self.autopilot = Autopilot(self, intervals=self.settings.autopilot_intervals) # Create a new one
         self._save_settings()
+        self._apply_settings_changes() # Restarts Autopilot if it was enabled
         self.show_feedback("Settings saved!")
         self.toggle_settings_panel()
 
-    def _load_settings(self):
-        tars_persona = DEFAULT_PERSONA
-        default_intervals = [120, 200, 360, 260, 300]
-        default_cooldown = 50
-        
-        needs_save = False
-        try:
-            with open("settings.json", 'r') as f:
-                settings = json.load(f)
-                self.current_theme.set(settings.get("theme", "dark"))
-                self.current_model.set(settings.get("model", "gemini-3-flash-preview"))
-                self.current_persona = settings.get("persona", tars_persona)
-                self.share_context.set(settings.get("share_context", True))
-                
-                # Robust API Key Loading: Favor file but fallback to .env
-                file_key = settings.get("api_key", "").strip()
-                if file_key:
-                    self.api_key_var.set(file_key)
-                elif os.getenv("GEMINI_API_KEY"):
-                    self.api_key_var.set(os.getenv("GEMINI_API_KEY").strip())
-                
-                self.api_key = self.api_key_var.get().strip()
-                
-                # If no API key is found, gently nudge the user to the settings panel
-                if not self.api_key:
-                    self.root.after(1000, lambda: (self.toggle_settings_panel(), self.show_feedback("Please enter your Gemini API key!")))
-                
-                self.autopilot_cooldown_seconds = settings.get("autopilot_cooldown_seconds", default_cooldown)
-                if not isinstance(self.autopilot_cooldown_seconds, int) or self.autopilot_cooldown_seconds <= 0:
-                    self.autopilot_cooldown_seconds = default_cooldown
-                    needs_save = True
-
-                loaded_intervals = settings.get("autopilot_intervals", default_intervals)
-                if isinstance(loaded_intervals, list) and all(isinstance(i, int) for i in loaded_intervals):
-                    self.autopilot_intervals = loaded_intervals
-                else:
-                    self.autopilot_intervals = default_intervals
-                    needs_save = True
-
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.current_theme.set("dark")
-            self.current_model.set("gemini-3-flash-preview")
-            self.current_persona = tars_persona
-            self.share_context.set(True)
-            self.autopilot_intervals = default_intervals
-            self.autopilot_cooldown_seconds = default_cooldown
-            needs_save = True
-        
-        if needs_save:
-            self._save_settings()
-
-        self.persona_text.delete("1.0", tk.END)
-        self.persona_text.insert("1.0", self.current_persona)
-        
-        # Ensure all variables are in sync for the UI
-        self.autopilot_intervals_var.set(", ".join(map(str, self.autopilot_intervals)))
-        self.autopilot_cooldown_var.set(str(self.autopilot_cooldown_seconds))
-        self.autopilot.stop()
-        self.autopilot = Autopilot(self, intervals=self.autopilot_intervals)
-        
-        # Always save immediately after loading to ensure file is fresh
-        self._save_settings()
-
     def _save_settings(self):
-        settings = {
-            "theme": self.current_theme.get(),
-            "model": self.current_model.get(),
-            "persona": self.current_persona,
-            "share_context": self.share_context.get(),
-            "api_key": self.api_key_var.get(), # Persist the API key
-            "autopilot_intervals": self.autopilot_intervals,
-            "autopilot_cooldown_seconds": self.autopilot_cooldown_seconds
-        }
-        with open("settings.json", 'w') as f:
-            json.dump(settings, f, indent=4)
-        print(f"[SETTINGS] Configuration persisted to settings.json at {time.strftime('%H:%M:%S')}")
+        self.settings.save()
+
+    def _configure_image_encoder(self):
+        """Screenshots are downscaled and compressed on the capture thread to these limits."""
+        self.capture_service.encoder.max_edge = self.settings.image_max_edge
+        self.capture_service.encoder.byte_budget = self.settings.image_byte_budget_kb * 1000
 
     def _thinking_animation(self, bubble, counter=0):
         """Creates a pulsing 'thinking' animation in a message bubble."""
@@ -579,7 +569,7 @@ class OverlayApp:
     # PRESERVED: Your save_chat method
     def save_chat(self):
         """Saves the current chat history to a file, returning True on success."""
-        if not self.conversation_history:
+        if not self.conversation:
             messagebox.showinfo("Info", "There is nothing to save.")
             return False # Nothing was saved.
         filepath = filedialog.asksaveasfilename(
@@ -591,7 +581,7 @@ class OverlayApp:
             return False # User cancelled.
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.conversation_history, f, indent=4)
+                json.dump(self.conversation.to_list(), f, indent=4)
             self.show_feedback("Chat saved successfully!")
             return True # Success!
         except (IOError, OSError) as e:
@@ -620,9 +610,15 @@ class OverlayApp:
                 raise ValueError("Invalid chat file format. Each message must be a dictionary with 'role' and 'parts'.")
 
             self.clear_chat(feedback=False)
-            self.conversation_history = loaded_history
+            self.conversation = ConversationStore.from_list(loaded_history)
+            dropped = len(loaded_history) - len(self.conversation)
             self.rebuild_chat_display()
-            self.show_feedback("Chat loaded successfully!")
+            if dropped:
+                # Older versions saved status toasts and errors as chat turns
+                print(f"[APP] Dropped {dropped} status/error entries from the loaded chat")
+                self.show_feedback(f"Chat loaded ({dropped} status messages removed)")
+            else:
+                self.show_feedback("Chat loaded successfully!")
         except (IOError, OSError) as e:
             messagebox.showerror("Load Error", f"A file system error occurred:\n{e}")
         except json.JSONDecodeError:
@@ -639,30 +635,13 @@ class OverlayApp:
         self.persona_text.delete("1.0", tk.END)
         self.persona_text.insert("1.0", persona_text)
     
-    # ---- NEW HELPER FOR DYNAMIC RESIZING ----
-    def _on_bubble_resize(self):
-        """Forces the chat canvas to update its scroll region and scrolls to the bottom."""
-        # This makes sure all pending UI events are processed
-        self.root.update_idletasks()
-        # This tells the canvas to recalculate its total size based on its content
-        self.chat_canvas.config(scrollregion = self.chat_canvas.bbox("all"))
-        # This scrolls to the end so you can see the new message
-        self.scroll_to_bottom()
-        
     # PRESERVED: Your show_feedback method
     def show_feedback(self, message):
         """
-        Shows a temporary, self-destructing system message that replaces any previous one.
+        Shows a temporary status toast that replaces any previous one. It is not part of
+        the conversation, so it is never sent to the model or saved with the chat.
         """
-        # 1. Clear any old feedback message and its timer
-        self._clear_feedback_bubble()
-
-        # 2. Create the new feedback bubble
-        # We pass "system" as the role to get the right styling
-        self.last_feedback_bubble = self.show_message(message, "system")
-
-        # 3. Schedule the new bubble to disappear after 2 seconds (3000ms)
-        self.feedback_timer_id = self.root.after(2000, self._clear_feedback_bubble)
+        self.toast.show(message)
     #prompt focus
     def focus_prompt_entry(self):
         """Forces focus on the main Smart Bar input."""
@@ -675,15 +654,12 @@ class OverlayApp:
 
     # PRESERVED: Your clear_chat method
     def clear_chat(self, feedback=True):
-        self.conversation_history = []
-        # Safely clear the UI
-        for widget in self.chat_frame.winfo_children(): 
-            widget.destroy()
-        
-        # Explicitly reset canvas positioning and scroll region
-        self.chat_canvas.yview_moveto(0)
-        self.root.update_idletasks()
-        self.chat_canvas.config(scrollregion=(0, 0, 0, 0))
+        self._cancel_active_stream()
+        self.conversation.clear()
+        self.screen_change_detector.reset() # The model has no screenshot to refer back to anymore
+        self.activity_detector.reset()
+        # Idle bubbles stay pooled for the next chat
+        self.chat_view.clear()
         
         if feedback: 
             self.show_feedback("Chat cleared!")
@@ -696,21 +672,23 @@ class OverlayApp:
     
     def create_response_area_widgets(self):
         """The main conversation area, now using column 1."""
-        self.response_container = tk.Frame(self.container, bg=self.BG_COLOR)
+        self.response_container = self.theme_registry.register(tk.Frame(self.container, bg=self.BG_COLOR), "window")
         self.response_container.grid(row=2, column=1, sticky="nsew") # Row 2 in column 1
         self.response_container.grid_rowconfigure(0, weight=1)
         self.response_container.grid_columnconfigure(0, weight=1)
 
-        self.chat_canvas = tk.Canvas(self.response_container, bg=self.BG_COLOR, highlightthickness=0)
+        self.chat_canvas = self.theme_registry.register(
+            tk.Canvas(self.response_container, bg=self.BG_COLOR, highlightthickness=0), "window")
         self.scrollbar = ttk.Scrollbar(self.response_container, orient="vertical", command=self.chat_canvas.yview)
-        
-        self.chat_frame = tk.Frame(self.chat_canvas, bg=self.BG_COLOR)
-        self.chat_frame.bind("<Configure>", lambda e: self.chat_canvas.configure(scrollregion=self.chat_canvas.bbox("all")))
-        
-        self.canvas_window = self.chat_canvas.create_window((0, 0), window=self.chat_frame, anchor="nw")
-        self.chat_canvas.bind("<Configure>", self._on_canvas_configure)
 
-        self.chat_canvas.configure(yscrollcommand=self.scrollbar.set)
+        # Only the bubbles in view (plus some overscan) exist; they are recycled as you scroll
+        self.chat_view = ChatView(self.chat_canvas, lambda parent, message: MessageBubble(parent, message, self),
+                                  on_show=self._on_bubble_shown, scrollbar=self.scrollbar)
+        self.theme_registry.add_hook(self._recolor_bubbles)
+
+        # Transient status floats over the chat instead of becoming a message
+        self.toast = Toast(self.response_container, self.theme_provider)
+        self.theme_registry.add_hook(self.toast.apply_theme)
         
         self.chat_canvas.grid(row=0, column=0, sticky="nsew")
         self.scrollbar.grid(row=0, column=1, sticky="ns")
@@ -723,42 +701,43 @@ class OverlayApp:
         if hasattr(self, 'settings_canvas_window'):
             self.settings_canvas.itemconfig(self.settings_canvas_window, width=event.width)
 
-    def _on_canvas_configure(self, event):
-        """Adjusts the width of the chat_frame inside the canvas when the canvas resizes."""
-        # Use a small offset to prevent horizontal scrollbars from appearing
-        canvas_width = event.width - 4
-        self.chat_canvas.itemconfig(self.canvas_window, width=canvas_width)
-
     def _on_mousewheel(self, event):
         """Handles mousewheel scrolling for the chat canvas."""
         self.chat_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
 
-    def scroll_to_bottom(self): self.chat_canvas.update_idletasks(); self.chat_canvas.yview_moveto(1.0)
+    def scroll_to_bottom(self): self.chat_view.scroll_to_bottom()
     
-    def show_message(self, message_data, role=None, is_rebuilding=False):
-        """Displays a message bubble. Now handles both raw strings and data dicts."""
-        if isinstance(message_data, str):
-            message_data = {"role": role or "system", "parts": [{"text": message_data}]}
+    def show_message(self, message, role=None, is_rebuilding=False, pin=False):
+        """
+        Adds a message to the chat view. Handles both raw strings and Message records.
+        Returns its bubble, or None if it was added off screen; pin=True always gives
+        a bubble and keeps it until unpinned (the streaming reply).
+        """
+        if isinstance(message, str):
+            message = Message.from_text(role or "system", message)
         
         if not is_rebuilding:
-            self.conversation_history.append(message_data)
-        
-        # Create and add the bubble
-        bubble = MessageBubble(self.chat_frame, message_data, self)
-        # Ensure it fills the entire width of the chat_frame
-        bubble.pack(fill="x", expand=True, padx=20, pady=10)
-        
-        if message_data.get("role") == "model" and message_data["parts"][0]["text"] != "...":
-            bubble.add_copy_button()
+            self.conversation.append(message)
         
+        bubble = self.chat_view.append(message, pin=pin)
         self.scroll_to_bottom()
         return bubble
+
+    def _on_bubble_shown(self, bubble):
+        """Runs whenever the chat view puts a new or recycled bubble on screen."""
+        if bubble.message.role == "model" and bubble.message.text != "...":
+            bubble.add_copy_button()
     
-    def process_stream(self, image_path, active_context):
-        history_for_api = copy.deepcopy(self.conversation_history)
-        ai_message_data = {"role": "model", "parts": [{"text": "..."}]}
-        self.conversation_history.append(ai_message_data)
-        loading_bubble = self.show_message(ai_message_data, is_rebuilding=True)
+    def process_stream(self, image, active_context):
+        """
+        Starts a streamed reply. 'image' is an EncodedImage or None. Runs on the Tk thread;
+        the network work runs on the stream engine.
+        """
+        self._cancel_active_stream()
+        # O(1) and immune to later edits, so no deep copy is needed for the request
+        history_for_api = self.conversation.snapshot()
+        ai_message = self.conversation.append(Message.from_text("model", "..."))
+        loading_bubble = self.show_message(ai_message, is_rebuilding=True, pin=True)
 
         if self.thinking_animation_id:
             self.root.after_cancel(self.thinking_animation_id)
@@ -767,78 +746,121 @@ class OverlayApp:
         # Initialize state for the new streaming session
         self.streamed_text_buffer = ""
         self.is_first_chunk_received = True
-        # Use a queue to safely pass data from the worker thread to the main thread
-        self.chunk_queue = queue.Queue()
-
-        # Capture thread-hostile Tkinter variables in the main thread
-        # Sync the internal attribute with the UI variable just in case
-        api_key_from_ui = self.api_key_var.get().strip()
-        if api_key_from_ui:
-            self.api_key = api_key_from_ui
-            
-        api_key_to_use = api_key_from_ui or self.api_key
-        model_name_to_use = self.current_model.get().strip() or "gemini-3-flash-preview"
-
-        def stream_worker():
-            """Fetches response chunks from the API and puts them in the queue."""
-            response_stream = gemini_client.get_gemini_response_stream(
-                api_key_to_use, 
-                history_for_api, 
-                model_name_to_use, 
-                self.current_persona, 
-                image_path, 
-                active_context
-            )
-            for chunk in response_stream:
-                self.chunk_queue.put(chunk)
-            # Put a sentinel value to indicate the end of the stream
-            self.chunk_queue.put(None)
-
-        # Start the animation loop on the main thread
-        self.root.after(100, self._process_animation_queue, loading_bubble, ai_message_data)
-        # Start the data fetching in a separate thread
-        threading.Thread(target=stream_worker, daemon=True).start()
-
-    def _process_animation_queue(self, bubble, ai_message_data):
-        """Processes the queue of chunks to animate them sequentially."""
-        try:
-            chunk = self.chunk_queue.get_nowait()
-
-            if chunk is None:  # End of stream sentinel
-                # Finalization logic
-                if len(self.conversation_history) >= 2:
-                    user_prompt_msg = self.conversation_history[-2]
-                    if user_prompt_msg.get("role") == "user" and user_prompt_msg["parts"][0]["text"].startswith("(System Observation)"):
-                        self.conversation_history.pop(-2)
-                ai_message_data["parts"][0]["text"] = self.streamed_text_buffer
-                if self.streamed_text_buffer and not self.streamed_text_buffer.lower().startswith("error"):
-                    bubble.add_copy_button()
-                self.scroll_to_bottom()
-                return # End the animation loop
-
-            if self.is_first_chunk_received:
-                if self.thinking_animation_id:
-                    self.root.after_cancel(self.thinking_animation_id)
-                    self.thinking_animation_id = None
-                bubble.set_text("")
-                self.is_first_chunk_received = False
-            
-            # Start animating the letters of this chunk, and when done, process the next chunk
-            self._animate_letter(bubble, chunk, 0, lambda: self._process_animation_queue(bubble, ai_message_data))
-
-        except queue.Empty:
-            # If the queue is empty, check again in a moment
-            self.root.after(50, self._process_animation_queue, bubble, ai_message_data)
-
-    def _animate_letter(self, bubble, text, index, on_finish_callback):
-        """Recursively adds one letter at a time, then calls the on_finish_callback."""
-        if index < len(text):
-            self.streamed_text_buffer += text[index]
-            bubble.set_text(self.streamed_text_buffer)
-            self.root.after(1, self._animate_letter, bubble, text, index + 1, on_finish_callback)
+
+        # A key typed into the dashboard is used even before it is saved
+        api_key_from_ui = self.settings_form["api_key"].get().strip() if self.settings_form else ""
+        api_key_to_use = api_key_from_ui or self.settings.api_key
+        model_name_to_use = self.settings.model.strip() or DEFAULT_MODEL
+        persona_to_use = self.settings.persona
+        fallback_models = self._fallback_models(model_name_to_use) if self.settings.model_fallback_enabled else ()
+
+        # The change detector only takes this screenshot as "seen" once the reply came back complete
+        on_complete = None
+        pending, self.pending_screen_reference = self.pending_screen_reference, None
+        if image is not None and pending is not None and pending[0] is image:
+            on_complete = lambda: self.root.after(0, self.screen_change_detector.mark_sent, pending[1], len(image.data))
+
+        # Only the persona and the newest turns that fit the token budget are sent
+        window = history_window.window_history(history_for_api, self.settings.history_token_budget,
+                                               persona_to_use, has_image=image is not None)
+        status = window.describe()
+        if self.pending_status_note:
+            status = f"{status} | {self.pending_status_note}"
+            self.pending_status_note = None
+        self.status_label.config(text=status)
+
+        # The engine fills handle.queue from its event loop; we only read it here
+        handle = self.stream_engine.submit(lambda: self.gemini_client.stream(
+            api_key_to_use,
+            window.contents,
+            model_name_to_use,
+            persona_to_use,
+            image.data if image else None,
+            active_context,
+            image_mime_type=image.mime_type if image else "image/png",
+            fallback_models=fallback_models,
+            on_complete=on_complete
+        ))
+        self.active_stream = handle
+        self.active_stream_view = (loading_bubble, ai_message)
+
+        # One frame-paced timer draws whatever arrived since the last frame
+        self.render_scheduler.attach(handle,
+                                     lambda text: self._on_stream_text(loading_bubble, text),
+                                     lambda: self._on_stream_end(loading_bubble, ai_message))
+
+    def _fallback_models(self, model_name):
+        """The dropdown models after the selected one, e.g. 3-flash-preview -> 2.5-flash -> 2.5-flash-lite."""
+        if model_name in MODEL_CHOICES:
+            return MODEL_CHOICES[MODEL_CHOICES.index(model_name) + 1:]
+        return MODEL_CHOICES
+
+    def _on_stream_text(self, bubble, text):
+        """Called by the render scheduler at most once per frame with everything that arrived."""
+        if self.is_first_chunk_received:
+            if self.thinking_animation_id:
+                self.root.after_cancel(self.thinking_animation_id)
+                self.thinking_animation_id = None
+            bubble.set_text("")
+            self.is_first_chunk_received = False
+        self.streamed_text_buffer += text
+        bubble.append_text(text) # Only the new text is inserted, not the whole reply again
+
+    def _on_stream_end(self, bubble, ai_message):
+        self.active_stream = None
+        self.active_stream_view = None
+        self._finalize_stream(bubble, ai_message)
+
+    def _finalize_stream(self, bubble, ai_message, stopped=False):
+        """Commits the streamed text to the history once a reply ends or is stopped."""
+        if self.thinking_animation_id: # A reply that ended without any text still shows the dots
+            self.root.after_cancel(self.thinking_animation_id)
+            self.thinking_animation_id = None
+        if len(self.conversation) >= 2 and self.conversation.last is ai_message:
+            user_prompt_msg = self.conversation[-2]
+            if user_prompt_msg.role == "user" and user_prompt_msg.text.startswith("(System Observation)"):
+                self.conversation.remove(user_prompt_msg)
+        final_text = self.streamed_text_buffer
+        if stopped:
+            final_text = (final_text + "\n\n" if final_text else "") + "(Stopped)"
+            bubble.set_text(final_text)
+        elif self.is_first_chunk_received:
+            bubble.set_text(final_text) # Nothing arrived; clear the dots
         else:
-            # This chunk is done, call the callback to start processing the next one
-            on_finish_callback()
+            bubble.finish_text()
+        # Messages are immutable: swap the "..." placeholder for the finished reply
+        final_message = Message.from_text("model", final_text)
+        try:
+            self.conversation.replace(ai_message, final_message)
+        except ValueError:
+            pass # The chat was cleared or reloaded while we were streaming
+        self.chat_view.replace(ai_message, final_message)
+        self.chat_view.unpin(final_message)
+        if self.streamed_text_buffer and not self.streamed_text_buffer.lower().startswith("error"):
+            bubble.add_copy_button()
+        self.scroll_to_bottom()
+
+    def _cancel_active_stream(self):
+        """Cancels the in-flight reply, if any. Returns True if something was stopped."""
+        handle = self.active_stream
+        if handle is None:
+            return False
+        self.active_stream = None
+        handle.cancel()
+        self.render_scheduler.detach(handle)
+        if self.thinking_animation_id:
+            self.root.after_cancel(self.thinking_animation_id)
+            self.thinking_animation_id = None
+        bubble, ai_message = self.active_stream_view
+        self.active_stream_view = None
+        if bubble.winfo_exists():
+            self._finalize_stream(bubble, ai_message, stopped=True)
+        return True
+
+    def stop_response(self):
+        """Sidebar 'Stop' action."""
+        if self._cancel_active_stream():
+            self.show_feedback("Response stopped")
 
     # PRESERVED: Your copy_to_clipboard method
     def copy_to_clipboard(self, text):
@@ -850,7 +872,7 @@ class OverlayApp:
     # PRESERVED: Your _update_ui_with_error method
     def _update_ui_with_error(self, error_text): 
         self._fade_in(); 
-        self.show_message(error_text, "error"); 
+        self.toast.show(error_text, kind="error") # Not a chat message: "error" is no role the API accepts
         messagebox.showerror("Application Error", error_text)
     
     def toggle_visibility(self):
@@ -868,14 +890,17 @@ class OverlayApp:
         STEP 1: Decides if the window needs to fade out, or can proceed instantly.
         """
         capture_mode = self.capture_mode_var.get()
-        should_share_context = self.share_context.get()
+        should_share_context = self.settings.share_context
 
         # If we are in "No Capture" mode AND context sharing is off,
         # we can have the super-fast, flicker-free experience.
         if capture_mode == "No Capture" and not should_share_context:
             active_context = "Context sharing is disabled by user."
             # We can start the AI process immediately, no fading needed.
-            threading.Thread(target=self.process_stream, args=(None, active_context), daemon=True).start()
+            self.root.after(0, self.process_stream, None, active_context)
+        elif self.settings.capture_in_place:
+            # The overlay stays up: it is left out of the capture or masked out of the frame
+            self._get_context_and_proceed()
         else:
             # For all other cases, we must fade out to get a clean screenshot
             # or to get the real application context.
@@ -883,7 +908,8 @@ class OverlayApp:
 
     def _get_context_and_proceed(self):
         """
-        STEP 2: Runs only after the window is hidden. Gets the context and decides the next action.
+        STEP 2: Runs once the window is hidden (or right away when capturing in place).
+        Gets the context and decides the next action.
         """
         active_context = get_active_window_info()
         capture_mode = self.capture_mode_var.get()
@@ -897,7 +923,7 @@ class OverlayApp:
         else: # "No Capture" mode.
             # We have the context, we don't need a screenshot. Bring the window back and process.
             self._fade_in()
-            threading.Thread(target=self.process_stream, args=(None, active_context), daemon=True).start()
+            self.root.after(0, self.process_stream, None, active_context)
 
     def _on_region_selected_final(self, region, active_context):
         """STEP 3 (for Region Capture): The callback from the selector."""
@@ -907,26 +933,72 @@ class OverlayApp:
         else:
             # User cancelled selection. Bring the window back and clean up the UI.
             self._fade_in()
-            if self.conversation_history and self.conversation_history[-1]['role'] == 'user':
-                self.conversation_history.pop()
+            if self.conversation and self.conversation.last.role == 'user':
+                self.conversation.pop()
             self.rebuild_chat_display()
 
     def _capture_and_process_final(self, region, active_context):
         """STEP 4 (for Captures): Takes screenshot, shows window, starts AI stream."""
-        output_filename = "screenshot.png"
+        def on_captured(image, active_context, error):
+            if error is not None:
+                self._update_ui_with_error(f"Screenshot error: {error}")
+                return
+            # Now that the screenshot is taken, bring the window back.
+            self._fade_in()
+            # Start the AI processing; the network part runs on the stream engine.
+            self.process_stream(image, active_context)
+
+        # The encoded image stays in memory all the way to the request payload
+        self._capture_for_model(region, active_context, on_captured)
+
+    def _capture_for_model(self, region, active_context, on_done):
+        """
+        Grabs and encodes the screen on the capture thread, then calls
+        on_done(image, active_context, error) back on the Tk thread, image being an
+        EncodedImage. A full-screen frame that looks like the last one the model saw
+        is not encoded or uploaded again; the context gets a note instead and image is None.
+        """
+        future = self.capture_service.submit(region, self._overlay_mask(), self.screen_change_detector)
+        self._after_future(future, self._when_captured, active_context, on_done)
+
+    def _overlay_mask(self):
+        """The overlay's screen rectangle when it would show up in a capture, else None."""
+        if self.is_visible and not self.capture_excluded: # Captured in place: paint the overlay out
+            return (self.root.winfo_rootx(), self.root.winfo_rooty(), self.root.winfo_width(), self.root.winfo_height())
+        return None
+
+    def _after_future(self, future, callback, *args):
+        """Calls callback(future, *args) on the Tk thread once the capture thread is done with it."""
+        if not future.done(): # The Tk thread only checks in; it never waits on the capture
+            self.root.after(CAPTURE_POLL_MS, self._after_future, future, callback, *args)
+            return
+        callback(future, *args)
+
+    def _when_captured(self, future, active_context, on_done):
         try:
-            with mss.mss() as sct:
-                monitor_to_capture = region if region is not None else sct.monitors[1]
-                img = sct.grab(monitor_to_capture)
-                mss.tools.to_png(img.rgb, img.size, output=output_filename)
+            capture = future.result()
         except Exception as e:
-            self.root.after(0, self._update_ui_with_error, f"Screenshot error: {e}")
+            on_done(None, active_context, e)
             return
-        
-        # Now that the screenshot is safely saved, bring the window back.
-        self._fade_in()
-        # Start the AI processing in a thread.
-        threading.Thread(target=self.process_stream, args=(output_filename, active_context), daemon=True).start()
+        width, height = capture.size
+        encoded = f" -> {capture.image.describe()}" if capture.image else ""
+        print(f"[CAPTURE] {width}x{height}: grab {capture.grab_ms:.1f} ms, encode {capture.encode_ms:.1f} ms{encoded}")
+        if capture.unchanged:
+            print(f"[CAPTURE] Screen unchanged (score {self.screen_change_detector.last_score:.4f}), skipping upload. "
+                  f"{self.screen_change_detector.bytes_saved // 1024} KB saved so far.")
+            self.pending_status_note = self.screen_change_detector.describe()
+            note = "(Screen unchanged since the last screenshot you were shown, so no new image is attached.)"
+            on_done(None, f"{active_context} {note}", None)
+            return
+        self._keep_capture_if_enabled(capture.image)
+        if capture.screen_reference is not None:
+            self.pending_screen_reference = (capture.image, capture.screen_reference)
+        on_done(capture.image, active_context, None)
+
+    def _keep_capture_if_enabled(self, image):
+        """Writes the capture to disk only when the user asked for it in settings."""
+        if self.settings.keep_captures:
+            screen_capture.save_capture(image.data, extension=image.extension)
 
         # ---- NEW FADE IN/OUT ANIMATION METHODS ----
 
@@ -966,6 +1038,10 @@ class OverlayApp:
 
     def _fade_in(self, callback=None):
         """Fades the window back in, then calls the optional callback function."""
+        if self.is_visible: # Never hidden (e.g. a capture in place), so there is nothing to fade
+            if callback:
+                callback()
+            return
         self.is_visible = True # State is now 'visible'
         target_alpha = self.opacity_var.get() # Get the user-defined opacity
         try:
@@ -990,15 +1066,6 @@ class OverlayApp:
             if callback:
                 callback()
     
-    def _clear_feedback_bubble(self):
-        """Hides the temporary feedback bubble."""
-        if self.last_feedback_bubble:
-            self.last_feedback_bubble.destroy()
-            self.last_feedback_bubble = None
-        if self.feedback_timer_id:
-            self.root.after_cancel(self.feedback_timer_id)
-            self.feedback_timer_id = None
-
     def on_user_submit(self, event=None):
         """Common entry point for both the Smart Bar and Hotkeys."""
         self.last_user_interaction_time = time.time()
@@ -1007,7 +1074,9 @@ class OverlayApp:
         user_prompt = self.user_input.get().strip()
         if not user_prompt: return
         
-        self.show_message(user_prompt)
+        # A new prompt supersedes whatever is still streaming
+        self._cancel_active_stream()
+        self.show_message(user_prompt, "user")
         self.user_input.delete(0, tk.END)
         self.root.after(10, self._start_interaction_flow)
 
@@ -1015,125 +1084,40 @@ class OverlayApp:
         """Switches between themes using the ThemeProvider."""
         new_theme, palette = self.theme_provider.switch_theme()
         self.current_theme.set(new_theme)
+        self.settings.theme = new_theme
         self._apply_palette()
         self._apply_theme()
         self._save_settings()
         self.show_feedback(f"Theme: {new_theme.capitalize()}")
 
     def _apply_theme(self):
-        """Applies the current theme's visual properties across all widgets."""
+        """Recolours every registered widget and the chat bubbles in place for the current theme."""
+        start = time.perf_counter()
         p = self.theme_provider.get_palette()
-        
-        # Update main container and root
-        self.container.config(bg=self.C_BG)
         self.root.config(bg=self.TRANSPARENT_COLOR)
         
         # Windows Specific Styling
         if sys.platform == "win32" and hasattr(self, 'root'):
-            try:
-                import pywinstyles
-                pywinstyles.apply_style(self.root, p.get("WIN_STYLE", "mica"))
-            except: pass
-
-        # Update Sidebar
-        if hasattr(self, 'sidebar'):
-            sidebar_bg = p["C_SIDEBAR"]
-            self.sidebar.config(bg=sidebar_bg)
-            for child in self.sidebar.winfo_children():
-                if isinstance(child, tk.Button):
-                    child.config(bg=sidebar_bg, fg=p["C_TEXT_SECONDARY"], activebackground=p["C_ACCENT"])
-
-        # Update Control Bar
-        if hasattr(self, 'control_bar'):
-            self.control_bar.config(bg=self.C_BG)
-            self.prompt_container.config(bg=self.C_INPUT_BG, highlightbackground=self.C_BORDER)
-            self.user_input.config(bg=self.C_INPUT_BG, fg=self.C_TEXT_PRIMARY, insertbackground=self.C_TEXT_PRIMARY)
-            if hasattr(self, 'branding_label'):
-                self.branding_label.config(bg=self.C_BG, fg=self.C_ACCENT)
-        # Update Magic Bar
-        if hasattr(self, 'magic_bar'):
-            self.magic_bar.config(bg=self.C_BG)
-            if hasattr(self, 'mode_btn'):
-                self.mode_btn.config(bg=p["C_ACCENT"])
-            if hasattr(self, 'status_label'):
-                self.status_label.config(bg=self.C_BG, fg=self.C_TEXT_SECONDARY)
-
-        # Update Settings Panel
-        if hasattr(self, 'settings_frame'):
-            self.settings_frame.config(bg=p["C_SIDEBAR"], highlightbackground=self.C_BORDER)
-            if hasattr(self, 'settings_canvas'):
-                self.settings_canvas.config(bg=p["C_SIDEBAR"])
-            if hasattr(self, 'settings_inner'):
-                self.settings_inner.config(bg=p["C_SIDEBAR"])
-                # Recursively update labels and other widgets in settings
-                self._update_widget_colors(self.settings_inner, p)
-        
-        # Ensure scrollable settings also scale
-        if hasattr(self, 'settings_canvas') and hasattr(self, 'settings_canvas_window'):
-            w = self.settings_canvas.winfo_width()
-            if w > 1: # Only scale if mapped
-                self.settings_canvas.itemconfig(self.settings_canvas_window, width=w)
-
-        # Update Response area
-        if hasattr(self, 'response_container'):
-            self.response_container.config(bg=self.C_BG)
-            self.chat_canvas.config(bg=self.C_BG)
-            self.chat_frame.config(bg=self.C_BG)
-            self.rebuild_chat_display()
+            winstyles.apply_style(self.root, p.get("WIN_STYLE", "mica"))
 
+        # One config() per registered widget, plus the bubbles through the chat view hook
+        recolored = self.theme_registry.apply()
         self.setup_ttk_styles()
+        print(f"[THEME] {self.theme_provider.theme_name}: {recolored} widgets and bubbles recoloured "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
 
-    def _update_widget_colors(self, parent, p):
-        """Recursively updates colors for all children of a parent widget based on theme palette."""
-        is_settings = (parent == self.settings_frame or parent == self.settings_inner or parent == self.settings_canvas)
-        bg_to_use = p["C_SIDEBAR"] if is_settings else parent["bg"]
-        
-        for child in parent.winfo_children():
-            try:
-                if isinstance(child, tk.Label):
-                    # Check if it's a "header" label by font size/weight
-                    font_info = str(child.cget("font")).lower()
-                    if "bold" in font_info and ("18" in font_info or "14" in font_info):
-                        child.config(bg=bg_to_use, fg=p["C_ACCENT"])
-                    else:
-                        fg_color = p["C_TEXT_PRIMARY"] if "bold" in font_info else p["C_TEXT_SECONDARY"]
-                        child.config(bg=bg_to_use, fg=fg_color)
-                elif isinstance(child, (tk.Frame, tk.Canvas)):
-                    child.config(bg=bg_to_use)
-                    self._update_widget_colors(child, p)
-                elif isinstance(child, tk.Button):
-                    text = str(child.cget("text")).upper()
-                    if "SAVE" in text or "THEME" in text:
-                        child.config(bg=p["C_ACCENT"], fg="white", activebackground=p["C_ACCENT_HOVER"])
-                    else:
-                        child.config(bg=p["C_INPUT"], fg=p["C_TEXT_PRIMARY"], activebackground=p["C_ACCENT"])
-                elif isinstance(child, tk.Text):
-                    child.config(bg=p["C_INPUT"], fg=p["C_TEXT_PRIMARY"], insertbackground=p["C_TEXT_PRIMARY"])
-                elif isinstance(child, tk.Checkbutton):
-                    child.config(bg=bg_to_use, fg=p["C_TEXT_PRIMARY"], selectcolor=bg_to_use, 
-                                 activebackground=bg_to_use, activeforeground=p["C_ACCENT"])
-                elif isinstance(child, ttk.Entry):
-                    # ttk widgets are handled via styles, but we can nudge them
-                    pass
-            except:
-                continue
+    def _recolor_bubbles(self, palette):
+        """Theme hook: existing bubbles (shown and pooled) are recoloured, not rebuilt."""
+        count = 0
+        for bubble in self.chat_view.bubbles():
+            bubble.apply_theme()
+            count += 1
+        return count
 
     def rebuild_chat_display(self):
-        """Clears and re-adds all message bubbles from history."""
-        # 1. Clear existing widgets
-        for widget in self.chat_frame.winfo_children():
-            widget.destroy()
-        
-        # 2. Force a layout update to ensure frames are ready
-        self.root.update_idletasks()
-        
-        # 3. Re-add messages
-        history = list(self.conversation_history) # Work with a shallow copy
-        for msg in history:
-            self.show_message(msg, is_rebuilding=True)
-        
-        # 4. Final scroll update
-        self._on_bubble_resize()
+        """Re-syncs the chat view with the history. Only the bubbles in view get (re)drawn."""
+        history = self.conversation.snapshot() # Stable even if the store changes meanwhile
+        self.chat_view.set_messages(list(history))
 
         # ---- HOTKEY ACTIONS ----
 
@@ -1175,8 +1159,10 @@ class OverlayApp:
 
     def toggle_context_sharing(self):
         """Toggles the 'share_context' setting and saves it."""
-        new_state = not self.share_context.get()
-        self.share_context.set(new_state)
+        new_state = not self.settings.share_context
+        self.settings.share_context = new_state
+        if "share_context" in self.setting_checks: # Keep the dashboard's checkbox in step
+            self.setting_checks["share_context"].set(new_state)
         self._save_settings() # Save the change immediately
         feedback = "ON" if new_state else "OFF"
         self.show_feedback(f"Context sharing: {feedback}")
@@ -1188,15 +1174,80 @@ class OverlayApp:
             self.autopilot.start()
         else:
             self.autopilot.stop()
+        self._configure_response_cache()
+        self._configure_capture_exclusion()
+        self.render_scheduler.fps = self.settings.render_fps
+        self.render_scheduler.typewriter_cps = self.settings.typewriter_cps
+
+    def _configure_response_cache(self):
+        """Attaches the reply cache to the client when enabled, detaches it otherwise."""
+        if not self.settings.response_cache_enabled:
+            self.gemini_client.response_cache = None
+        elif self.gemini_client.response_cache is None or self.gemini_client.response_cache.ttl_seconds != self.settings.response_cache_ttl_seconds:
+            self.gemini_client.response_cache = ResponseCache(ttl_seconds=self.settings.response_cache_ttl_seconds)
+
+    def _configure_capture_exclusion(self):
+        """Leaves the overlay out of screen captures while capturing in place is on (Windows only)."""
+        if self.settings.capture_in_place == self.capture_excluded:
+            return
+        if not self.root.winfo_ismapped(): # Tk creates the real top-level window when it is first mapped
+            self.root.after(100, self._configure_capture_exclusion)
+            return
+        try:
+            hwnd = int(self.root.wm_frame(), 16) # The top-level window around Tk's client area
+            excluded = screen_capture.exclude_window(hwnd, self.settings.capture_in_place)
+        except (tk.TclError, ValueError, OSError, AttributeError) as e:
+            print(f"[CAPTURE] Window exclusion unavailable: {e}")
+            excluded = False
+        self.capture_excluded = excluded and self.settings.capture_in_place
+        if self.settings.capture_in_place and not excluded:
+            print("[CAPTURE] Capturing in place by masking the overlay out of the frame.")
+
+    def idle_seconds(self):
+        """
+        Seconds since the user last typed or clicked anywhere, or sent a message here.
+        Only reads floats, so the Autopilot thread can call it too.
+        """
+        since_submit = time.time() - self.last_user_interaction_time
+        since_input = self.input_activity.seconds_since_input()
+        return since_submit if since_input is None else min(since_submit, since_input)
 
     def on_autopilot_tick(self):
         """The Autopilot's 'brain'. It decides if it should speak."""
         print("[APP] Autopilot tick received!")
-        time_since_last_interaction = time.time() - self.last_user_interaction_time
-        if time_since_last_interaction < self.autopilot_cooldown_seconds:
+        if self.active_stream is not None:
+            print("[AUTOPILOT] Tick skipped, a response is still streaming.")
+            return
+        if self.input_activity.is_busy():
+            print(f"[AUTOPILOT] Tick cancelled, the user is busy ({self.input_activity.describe()}). Resetting timer.")
+            self.autopilot.reset_timer(); return
+        time_since_last_interaction = self.idle_seconds()
+        if time_since_last_interaction < self.settings.autopilot_cooldown_seconds:
             print(f"[AUTOPILOT] Tick skipped, user was active {int(time_since_last_interaction)}s ago. Resetting timer.")
             self.autopilot.reset_timer(); return
 
+        # A grayscale thumbnail and the window title decide whether there is anything new to observe
+        active_context = get_active_window_info()
+        self._after_future(self.capture_service.submit_probe(self._overlay_mask()), self._on_autopilot_probe, active_context)
+
+    def _on_autopilot_probe(self, future, active_context):
+        try:
+            thumb = future.result()
+        except Exception as e:
+            print(f"[AUTOPILOT] Activity probe failed ({e}), observing anyway.")
+        else:
+            if not self.activity_detector.should_fire(thumb, active_context):
+                print(f"[AUTOPILOT] Tick skipped, screen is static (activity {self.activity_detector.last_score:.4f} "
+                      f"< {self.activity_detector.threshold}). {self.activity_detector.describe()}")
+                return
+            print(f"[AUTOPILOT] Activity {self.activity_detector.last_score:.4f}. {self.activity_detector.describe()}")
+        if self.active_stream is not None: # The user asked something while the probe ran
+            return
+
+        if self.settings.capture_in_place:
+            print("[AUTOPILOT] User is idle. Observing with the overlay in place...")
+            self._autopilot_worker()
+            return
         print("[AUTOPILOT] User is idle. Fading out to start observation...")
         # CRITICAL FIX: Start the fade-out process, and tell it to call
         # our new worker function when it's finished.
@@ -1295,22 +1346,38 @@ class OverlayApp:
 
         if user_choice is True: # Save Chat
             # If there's no history, we can just close.
-            if not self.conversation_history:
-                self.root.destroy()
+            if not self.conversation:
+                self._shutdown()
                 return
             # If save is successful, then destroy the window.
             if self.save_chat():
-                self.root.destroy()
+                self._shutdown()
             # If the user cancels the save dialog, we do *not* quit.
 
         elif user_choice is False: # Don't Save
             # The user doesn't want to save, so just quit.
-            self.root.destroy()
+            self._shutdown()
 
         # else: # Cancel (user_choice is None)
             # The user cancelled the quit operation, so do nothing.
             return
 
+    def _shutdown(self):
+        """Stops background work, releases pooled connections and destroys the window."""
+        self.autopilot.stop()
+        self.input_activity.stop()
+        self._cancel_active_stream()
+        try:
+            self.stream_engine.run(self.gemini_client.aclose(), timeout=2)
+        except Exception as e:
+            print(f"[APP] Could not close the Gemini client cleanly: {e}")
+        self.stream_engine.close()
+        self.capture_service.close()
+        for line in self.capture_service.summary(): # Grab/encode times per resolution for this session
+            print(f"[CAPTURE] {line}")
+        print(f"[AUTOPILOT] {self.activity_detector.describe()}")
+        self.root.destroy()
+
     def _autopilot_worker(self):
         """
         The Autopilot's background worker for capturing context and screen.
@@ -1319,24 +1386,21 @@ class OverlayApp:
         active_context = get_active_window_info()
         
         # Now, take a full-screen screenshot quietly in the background
-        output_filename = "autopilot_screenshot.png"
-        try:
-            with mss.mss() as sct:
-                img = sct.grab(sct.monitors[1])
-                mss.tools.to_png(img.rgb, img.size, output=output_filename)
-        except Exception as e:
-            print(f"[AUTOPILOT] Screenshot failed: {e}")
+        self._capture_for_model(None, active_context, self._on_autopilot_capture)
+
+    def _on_autopilot_capture(self, image, active_context, error):
+        # THE CRITICAL FIX: Tell the window to reappear!
+        self._fade_in()
+        if error is not None:
+            print(f"[AUTOPILOT] Screenshot failed: {error}")
             return # Abort if we can't see
-        
+
         # --- This is the setup for Phase 3 ---
         # We create a special, "hidden" user prompt for the AI
         autopilot_prompt = "(System Observation): Based on the user's context and the attached screenshot, make a brief, friendly, and non-intrusive observation about what they might be doing. Be curious and offer help gently."
         
         # We add it to the history for the API call
-        self.conversation_history.append({"role": "user", "parts": [{"text": autopilot_prompt}]})
-        
-            # THE CRITICAL FIX: Tell the window to reappear!
-        self.root.after(0, self._fade_in)
+        self.conversation.append(Message.from_text("user", autopilot_prompt))
     
         # Now, we start the stream with our hidden prompt and the new screenshot
-        self.process_stream(output_filename, active_context)
\ No newline at end of file
+        self.process_stream(image, active_context)
\ No newline at end of file
@@ -0,0 +1,269 @@
+# --- ui/markdown_stream.py ---
+"""
+A streaming markdown tokenizer for chat bubbles.
+
+Text can be fed in chunks of any size. Each call returns (text, tags) segments
+that are final, so the bubble only ever inserts at the end and nothing that was
+already handled is scanned again. A few characters are held back when they
+could still turn out to be markup (a '#' at the start of a line, a lone '*').
+
+Fenced blocks are also announced with empty marker segments, ("", (FENCE_OPEN,
+language)) and ("", (FENCE_CLOSE,)), so the bubble knows where code starts and ends.
+
+Supported: #/##/### headings, bullet and numbered lists, fenced code blocks
+(with their language), **bold**, *italic* / _italic_ and `inline code`. A style
+only opens once its closing delimiter has arrived on the same line, since a
+stream can't go back and un-bold text whose closing '**' never came: the rest of
+the line after an opening delimiter is held back until it shows up, and a
+delimiter that never closes is shown as typed. '_' only opens at the start of a
+word and closes at its end, and runs of underscores (__init__) are plain text.
+"""
+import re
+
+_INLINE_SPECIAL = re.compile(r"[`*_\n]")
+_RUNS = {"*": re.compile(r"\*+"), "_": re.compile(r"_+")}
+_UNDECIDED_PREFIX = re.compile(r" *(#{0,6}|[-*+]|\d{1,3}[.)]?|`{1,2})\Z") # Could still become markup
+_FENCE = re.compile(r" *```")
+_HEADING = re.compile(r" *(#{1,6}) ")
+_LIST_ITEM = re.compile(r"( *)([-*+]|\d{1,3}[.)]) ")
+
+HEADING_TAGS = {1: "h1", 2: "h2"} # Deeper levels all use "h3"
+FENCE_OPEN = "fence_open"
+FENCE_CLOSE = "fence_close"
+
+
+class MarkdownStream:
+    def __init__(self):
+        self._buf = ""           # Received but not handled yet
+        self._pos = 0            # Scan position in _buf during a feed()
+        self._out = []           # ([text parts], tags) produced by the current feed()
+        self._line_start = True
+        self._block = None       # "h1".."h3", "list", "code_block" or None for the current line
+        self._bold_end = self._italic_end = self._code_end = None # Stream offset of an open style's closer
+        self._consumed = 0       # Characters cut off the front of _buf so far
+        self._lookahead = None   # (opener, resume, in_code) stream offsets of a closer search waiting for text
+        self._prev = "\n"        # Last character handled, for '_' word-boundary checks
+        self.in_fence = False
+        self.fence_language = None # Language of the open fenced block, e.g. "python"
+
+    def feed(self, text):
+        """Consumes a chunk and returns the (text, tags) segments it completed."""
+        self._buf += text
+        self._run(final=False)
+        return self._take()
+
+    def flush(self):
+        """Returns whatever was held back, once the text is complete."""
+        self._run(final=True)
+        if not self._line_start:
+            self._emit("\n")
+            self._end_line()
+        if self.in_fence: # The reply ended inside a code block
+            self.in_fence = False
+            self._out.append(([""], (FENCE_CLOSE,)))
+        return self._take()
+
+    def _take(self):
+        out, self._out = self._out, []
+        return [("".join(parts), tags) for parts, tags in out]
+
+    # --- Output ---
+
+    def _tags(self):
+        tags = (self._block,) if self._block else ()
+        bold, italic = self._bold_end is not None, self._italic_end is not None
+        if self._code_end is not None:
+            return tags + ("code",)
+        if bold and italic:
+            return tags + ("bold_italic",)
+        if bold:
+            return tags + ("bold",)
+        if italic:
+            return tags + ("italic",)
+        return tags
+
+    def _emit(self, text):
+        if not text:
+            return
+        tags = self._tags()
+        if self._out and self._out[-1][1] == tags:
+            self._out[-1][0].append(text) # Joined once in _take()
+        else:
+            self._out.append(([text], tags))
+        self._prev = text[-1]
+
+    def _end_line(self):
+        self._line_start = True
+        self._block = None
+        self._bold_end = self._italic_end = self._code_end = None
+
+    # --- Scanning ---
+
+    def _run(self, final):
+        # Scans by position and only cuts the buffer once at the end, so one big feed() stays linear
+        self._pos = 0
+        end = len(self._buf)
+        while self._pos < end:
+            if self._line_start:
+                if not self._start_line(final):
+                    break
+            elif self._block == "code_block":
+                self._code_line()
+            elif not self._inline(final):
+                break
+        self._consumed += self._pos
+        self._buf = self._buf[self._pos:]
+
+    def _start_line(self, final):
+        """Decides what kind of line this is. Returns False to wait for more text."""
+        buf, pos = self._buf, self._pos
+        newline = buf.find("\n", pos)
+        head = buf[pos:newline] if newline >= 0 else buf[pos:]
+        if newline < 0 and not final and _UNDECIDED_PREFIX.match(head):
+            return False
+
+        if _FENCE.match(head):
+            if newline < 0 and not final:
+                return False # The language is only known once the fence line is complete
+            self._pos = newline + 1 if newline >= 0 else len(buf)
+            self.in_fence = not self.in_fence
+            self.fence_language = (head.strip()[3:].strip() or None) if self.in_fence else None
+            self._out.append(([""], (FENCE_OPEN, self.fence_language) if self.in_fence else (FENCE_CLOSE,)))
+            return True # Fence lines themselves are not shown
+
+        self._line_start = False
+        if self.in_fence:
+            self._block = "code_block"
+            return True
+
+        match = _HEADING.match(head)
+        if match:
+            self._block = HEADING_TAGS.get(len(match.group(1)), "h3")
+            self._pos = pos + match.end()
+            return True
+
+        match = _LIST_ITEM.match(head)
+        if match:
+            self._block = "list"
+            indent, marker = match.group(1), match.group(2)
+            self._emit(indent + ("• " if marker in "-*+" else marker + " "))
+            self._pos = pos + match.end()
+        return True
+
+    def _code_line(self):
+        buf, pos = self._buf, self._pos
+        newline = buf.find("\n", pos)
+        if newline < 0:
+            self._emit(buf[pos:])
+            self._pos = len(buf)
+            return
+        self._emit(buf[pos:newline + 1])
+        self._pos = newline + 1
+        self._end_line()
+
+    def _inline(self, final):
+        """Handles text up to and including the next markup character. Returns False to wait."""
+        buf, pos = self._buf, self._pos
+        match = _INLINE_SPECIAL.search(buf, pos)
+        if match is None:
+            self._emit(buf[pos:])
+            self._pos = len(buf)
+            return True
+        i = match.start()
+        if i > pos:
+            self._emit(buf[pos:i])
+        self._pos = i
+        char = buf[i]
+        offset = self._consumed + i
+
+        if char == "\n":
+            self._emit("\n")
+            self._end_line()
+            self._pos = i + 1
+            return True
+        if char == "`":
+            delim = "`" # The backticks themselves are not shown
+        elif self._code_end is not None:
+            self._emit(char) # '*' and '_' are literal inside inline code
+            self._pos = i + 1
+            return True
+        else:
+            run = _RUNS[char].match(buf, i).end() - i
+            if i + run == len(buf) and not final:
+                return False # Need the character after the run to decide
+            if char == "_" and run > 1:
+                self._emit(buf[i:i + run]) # __init__ and ___ are text, not emphasis
+                self._pos = i + run
+                return True
+            delim = "**" if run > 1 else char
+
+        style = "_code_end" if delim == "`" else "_bold_end" if delim == "**" else "_italic_end"
+        end = getattr(self, style)
+        if end is not None:
+            if end == offset:
+                setattr(self, style, None)
+            else:
+                self._emit(delim) # The style is already open, e.g. a '*' inside _italic_
+        elif self._opens(delim, i):
+            closer = self._find_closer(delim, i, final)
+            if closer is None:
+                return False
+            if closer < 0:
+                self._emit(delim) # Never closed on this line
+            else:
+                setattr(self, style, self._consumed + closer)
+        else:
+            self._emit(delim) # A lone '*' like in "2 * 3", or a '_' inside a word
+        self._pos = i + len(delim)
+        self._prev = delim[-1]
+        return True
+
+    def _opens(self, delim, i):
+        """Whether the delimiter at i could open a style, going by its neighbours."""
+        after = self._buf[i + len(delim):i + len(delim) + 1]
+        if delim == "`":
+            return True
+        if after in (" ", "\n", ""):
+            return False
+        return delim != "_" or not _is_word(self._prev)
+
+    def _find_closer(self, delim, i, final):
+        """Index in _buf of the delimiter closing the one at i, -1 when the line has none,
+        or None to wait for more text. A search that waits resumes where it stopped."""
+        buf, opener = self._buf, self._consumed + i
+        k, in_code = i + len(delim), False
+        if self._lookahead and self._lookahead[0] == opener:
+            k, in_code = self._lookahead[1] - self._consumed, self._lookahead[2]
+        self._lookahead = None
+        while k < len(buf):
+            c = buf[k]
+            if c == "\n":
+                return -1
+            if c == "`":
+                if delim == "`":
+                    return k
+                in_code = not in_code # Delimiters inside inline code don't count
+            elif c == delim[0] and not in_code:
+                run = _RUNS[c].match(buf, k).end() - k
+                if k + run == len(buf) and not final:
+                    break
+                before, after = buf[k - 1], buf[k + run:k + run + 1]
+                if run == len(delim) and not before.isspace() and (delim != "_" or not _is_word(after)):
+                    return k
+                k += run
+                continue
+            k += 1
+        if final:
+            return -1
+        self._lookahead = (opener, self._consumed + k, in_code)
+        return None
+
+
+def _is_word(char):
+    return char.isalnum() or char == "_"
+
+
+def render_segments(text):
+    """Tokenizes a complete text in one go (used for finished messages)."""
+    stream = MarkdownStream()
+    return stream.feed(text) + stream.flush()
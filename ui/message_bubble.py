@@ -1,115 +1,230 @@
 # --- ui/message_bubble.py ---
 import tkinter as tk
-import re
-from pygments import lex
-from pygments.lexers import get_lexer_by_name, guess_lexer
-from pygments.styles import get_style_by_name
-from pygments.token import Token
+from ui import winstyles
+from ui.markdown_stream import MarkdownStream, FENCE_OPEN, FENCE_CLOSE
+
+# Text fonts, shared with the app's TextMeasurer so measured heights match what is drawn
+BODY_FONT = ("Segoe UI", 11)
+TAG_FONTS = { # In tag_configure order: later tags win
+    "bold": ("Segoe UI", 11, "bold"),
+    "italic": ("Segoe UI", 11, "italic"),
+    "bold_italic": ("Segoe UI", 11, "bold italic"),
+    "h3": ("Segoe UI", 12, "bold"),
+    "h2": ("Segoe UI", 13, "bold"),
+    "h1": ("Segoe UI", 14, "bold"),
+    "code": ("Consolas", 10),
+    "code_block": ("Consolas", 10),
+}
+TAG_MARGINS = {"list": 20, "code_block": 10} # Left margin of wrapped lines, in px
 
 class MessageBubble(tk.Frame):
     """Professional, card-style message bubble using the active theme."""
-    def __init__(self, parent, message_data, app_instance, **kwargs):
+    def __init__(self, parent, message, app_instance, **kwargs):
         super().__init__(parent, **kwargs)
         self.app_instance = app_instance
-        self.message_data = message_data
+        self.message = message # An immutable conversation_store.Message
+        self.copy_button = None
+        
+        author = message.role or "system"
+        text = message.text
+        self.is_user = author == "user"
+        self.is_system = author == "system"
+        self.config(padx=12, pady=10)
+        
+        # Apply rounding to the bubble frame
+        winstyles.apply_style(self, "rounded")
+        
+        # --- Header ---
+        self.header_frame = tk.Frame(self)
+        self.header_frame.pack(side="top", fill="x")
         
-        author = message_data.get("role", "system")
-        text = message_data.get("parts", [{}])[0].get("text", "")
-        is_user = author == "user"
-        is_system = author == "system"
+        # Author Label
+        author_txt = "YOU" if self.is_user else author.upper()
+        self.author_label = tk.Label(self.header_frame, text=author_txt, font=("Segoe UI", 9, "bold"))
+        self.author_label.pack(side="left")
+
+        # --- Content ---
+        self.message_text = tk.Text(self, font=BODY_FONT, wrap=tk.WORD, 
+                                   relief="flat", bd=0, highlightthickness=0, 
+                                   state="disabled", height=1, width=1) # Width=1 allows expansion
+        self.message_text.pack(side="top", fill="x", expand=True, pady=(5, 0))
         
+        # Markdown Tags (later tags win, so headings keep their size over bold/italic)
+        self.message_text.tag_configure("bold", font=TAG_FONTS["bold"])
+        self.message_text.tag_configure("italic", font=TAG_FONTS["italic"])
+        self.message_text.tag_configure("bold_italic", font=TAG_FONTS["bold_italic"])
+        self.message_text.tag_configure("list", lmargin1=6, lmargin2=TAG_MARGINS["list"])
+        self.message_text.tag_configure("h3", font=TAG_FONTS["h3"], spacing1=4)
+        self.message_text.tag_configure("h2", font=TAG_FONTS["h2"], spacing1=5)
+        self.message_text.tag_configure("h1", font=TAG_FONTS["h1"], spacing1=5)
+        self.message_text.tag_configure("code", font=TAG_FONTS["code"])
+        self.message_text.tag_configure("code_block", font=TAG_FONTS["code_block"], 
+                                       spacing1=5, spacing3=5, lmargin1=TAG_MARGINS["code_block"],
+                                       lmargin2=TAG_MARGINS["code_block"])
+        self.apply_theme()
+
+        # Streaming state: the tokenizer, plus a "tail" mark at the start of the last line
+        self._markdown = MarkdownStream()
+        self._lines_before_tail = 0 # Display lines (wrapped) above the last line
+        self.message_text.mark_set("tail", "1.0")
+        self.message_text.mark_gravity("tail", "left")
+        self._code_start = None # Where the open code block begins, and its fence language
+        self._code_language = None
+        self._generation = 0 # Bumped by set_text() so stale highlighting results are dropped
+        self._source = "" # The markdown shown so far, for measuring
+        self._wrap_width = None # Known from the first <Configure>
+        self.message_text.bind("<Configure>", self._on_text_configure)
+        self.set_text(text)
+
+    def apply_theme(self):
+        """Colours the bubble for the app's current theme. Safe to call again after a switch."""
         # Deriving colors from ThemeProvider
         p = self.app_instance.theme_provider.get_palette()
         is_light = self.app_instance.current_theme.get() == "light"
+        is_user = self.is_user
         
         self.bubble_bg = p["C_CARD"] if not is_user else p["C_ACCENT"]
         self.text_fg = p["C_TEXT_PRIMARY"] if not is_user else "#FFFFFF"
         self.author_fg = p["C_ACCENT"] if not is_user else ("#E0E0E0" if not is_light else "#F0F0F0")
         
-        if is_system:
+        if self.is_system:
             self.bubble_bg = p["C_BG"]
             self.text_fg = p["C_TEXT_SECONDARY"]
 
         # Add a subtle border in light mode for "card" definition
         border_thickness = 1 if (is_light and not is_user) else 0
-        self.config(bg=self.bubble_bg, padx=12, pady=10, 
-                    highlightthickness=border_thickness, highlightbackground=p["C_BORDER"])
-        
-        # Apply rounding to the bubble frame
-        try:
-            import pywinstyles
-            pywinstyles.apply_style(self, "rounded")
-        except: pass
-        
-        # --- Header ---
-        header_frame = tk.Frame(self, bg=self.bubble_bg)
-        header_frame.pack(side="top", fill="x")
-        
-        # Author Label
-        author_txt = "YOU" if is_user else author.upper()
-        tk.Label(header_frame, text=author_txt, font=("Segoe UI", 9, "bold"), 
-                 bg=self.bubble_bg, fg=self.author_fg).pack(side="left")
-
-        # --- Content ---
-        self.message_text = tk.Text(self, font=("Segoe UI", 11), wrap=tk.WORD, 
-                                   bg=self.bubble_bg, fg=self.text_fg, 
-                                   relief="flat", bd=0, highlightthickness=0, 
-                                   state="disabled", height=1, width=1) # Width=1 allows expansion
-        self.message_text.pack(side="top", fill="x", expand=True, pady=(5, 0))
-        
-        # Markdown Tags
-        self.message_text.tag_configure("h1", font=("Segoe UI", 14, "bold"), spacing1=5)
-        self.message_text.tag_configure("bold", font=("Segoe UI", 11, "bold"))
+        self.config(bg=self.bubble_bg, highlightthickness=border_thickness, highlightbackground=p["C_BORDER"])
+        self.header_frame.config(bg=self.bubble_bg)
+        self.author_label.config(bg=self.bubble_bg, fg=self.author_fg)
+        self.message_text.config(bg=self.bubble_bg, fg=self.text_fg)
         
         code_bg = p["C_INPUT"] if is_light else p["C_BG"]
-        self.message_text.tag_configure("code_block", font=("Consolas", 10), 
-                                       background=code_bg, foreground=p["C_TEXT_PRIMARY"],
-                                       spacing1=5, spacing3=5, lmargin1=10, lmargin2=10)
-        
+        self.message_text.tag_configure("code", background=code_bg)
+        self.message_text.tag_configure("code_block", background=code_bg, foreground=p["C_TEXT_PRIMARY"])
         self.configure_pygments(p)
-        self.set_text(text)
+        if self.copy_button is not None:
+            self.copy_button.config(bg=self.bubble_bg, fg=self.author_fg,
+                                    activebackground=self.bubble_bg, activeforeground=self.text_fg)
 
     def configure_pygments(self, palette):
         """Minimalist professional code highlighting."""
-        # Simple high-contrast colors for Obsidian theme
-        self.message_text.tag_configure(str(Token.Keyword), foreground=palette["C_ACCENT"])
-        self.message_text.tag_configure(str(Token.String), foreground="#A5D6FF")
-        self.message_text.tag_configure(str(Token.Comment), foreground=palette["C_TEXT_SECONDARY"])
+        # Simple high-contrast colors for Obsidian theme (the tags are applied by the app's CodeHighlighter,
+        # named after Pygments token types, so Pygments itself isn't imported here)
+        self.message_text.tag_configure("Token.Keyword", foreground=palette["C_ACCENT"])
+        self.message_text.tag_configure("Token.Operator.Word", foreground=palette["C_ACCENT"])
+        self.message_text.tag_configure("Token.Name.Builtin", foreground="#FFA657")
+        self.message_text.tag_configure("Token.Name.Function", foreground="#D2A8FF")
+        self.message_text.tag_configure("Token.Name.Class", foreground="#D2A8FF")
+        self.message_text.tag_configure("Token.Literal.String", foreground="#A5D6FF")
+        self.message_text.tag_configure("Token.Literal.Number", foreground="#79C0FF")
+        self.message_text.tag_configure("Token.Comment", foreground=palette["C_TEXT_SECONDARY"])
 
     def set_text(self, text):
+        """Replaces the whole content. Used for finished messages and the thinking dots."""
         self.message_text.config(state="normal")
         self.message_text.delete("1.0", tk.END)
-        
-        # Simple Markdown parsing (optimized)
-        lines = text.split("\n")
-        in_code = False
-        for line in lines:
-            if line.strip().startswith("```"):
-                in_code = not in_code
-                continue
-            
-            tag = "code_block" if in_code else None
-            self.message_text.insert(tk.END, line + "\n", tag)
-            
-        # Adjust Height
-        self.message_text.bind("<Configure>", lambda e: self._adjust_height())
-        self._adjust_height()
+        self._source = text
+        self._markdown = MarkdownStream()
+        self._code_start = None
+        self._generation += 1
+        self._insert(self._markdown.feed(text) + self._markdown.flush())
+        self.message_text.mark_set("tail", "end-1c linestart")
         self.message_text.config(state="disabled")
+        self._adjust_height()
+
+    def append_text(self, text):
+        """
+        Adds streamed text at the end. Only the new text goes through the markdown
+        tokenizer and gets inserted, so each chunk costs the same however long the
+        reply already is.
+        """
+        if text:
+            self._source += text
+            self._append(self._markdown.feed(text))
+
+    def finish_text(self):
+        """Inserts whatever the tokenizer held back once the stream has ended."""
+        self._append(self._markdown.flush())
+
+    def _insert(self, segments):
+        widget = self.message_text
+        for text, tags in segments:
+            if text:
+                widget.insert("end-1c", text, tags)
+            elif tags[0] == FENCE_OPEN:
+                self._code_start, self._code_language = widget.index("end-1c"), tags[1]
+            elif tags[0] == FENCE_CLOSE and self._code_start is not None:
+                self._highlight(self._code_start, widget.index("end-1c"), self._code_language)
+                self._code_start = None
+
+    def _highlight(self, start, end, language):
+        """Hands a finished code block to the background highlighter."""
+        highlighter = self.app_instance.code_highlighter
+        if highlighter is None:
+            return
+        generation = self._generation
+        highlighter.highlight(self.message_text, start, self.message_text.get(start, end), language,
+                              is_current=lambda: generation == self._generation)
+
+    def _append(self, segments):
+        if not segments:
+            return
+        widget = self.message_text
+        widget.config(state="normal")
+        previous_tail = widget.index("tail")
+        self._insert(segments)
+        widget.mark_set("tail", "end-1c linestart")
+        widget.config(state="disabled")
+        # Only the lines finished just now, and the last one, are measured
+        if self._lines_before_tail is None: # Resized since the last chunk
+            self._lines_before_tail = self._count_lines("1.0", "tail")
+        else:
+            self._lines_before_tail += self._count_lines(previous_tail, "tail")
+        self._set_height()
+
+    def _count_lines(self, start, end):
+        lines = self.message_text.count(start, end, "displaylines")
+        return lines[0] if lines else 0
+
+    def _set_height(self):
+        num_lines = self._lines_before_tail
+        if self.message_text.compare("tail", "<", "end-1c"): # The unfinished last line, wrapped or not
+            num_lines += 1 + self._count_lines("tail", "end-1c")
+        self.message_text.config(height=num_lines or 1)
+
+    def _on_text_configure(self, event):
+        # Text wraps inside its horizontal padding; the app fits all resized bubbles in one batch
+        width = event.width - 2 * int(self.message_text.cget("padx"))
+        if width > 1 and width != self._wrap_width:
+            self.app_instance.text_measurer.request(self, width)
+
+    def fit_to_width(self, width):
+        self._wrap_width = width
+        self._adjust_height()
 
     def _adjust_height(self):
-        """Dynamically adjusts the height of the text widget based on content wrapping."""
-        # This calculation needs to happen after layout is settled
-        self.message_text.update_idletasks()
-        # count how many lines are currently visible on screen (including wrapped ones)
-        # Using 1.0 to end-1c and checking displaylines
-        d_lines = self.message_text.count("1.0", "end-1c", "displaylines")
-        num_lines = (d_lines[0] if d_lines else 1) or 1
-        self.message_text.config(height=num_lines)
+        """Sizes the text widget to its wrapped content, from cached font metrics (no layout pass)."""
+        if self._wrap_width is None:
+            return # Not laid out yet; the first <Configure> brings us back here
+        lines = self.app_instance.text_measurer.line_count(self._source, self._wrap_width)
+        self.message_text.config(height=lines)
+        self._lines_before_tail = None # Streaming recounts from the widget on its next chunk
+
+    def rebind(self, message):
+        """Reuses this bubble for another message of the same role (see ChatView)."""
+        self.message = message
+        if self.copy_button is not None:
+            self.copy_button.destroy()
+            self.copy_button = None
+        self.set_text(message.text)
 
     def add_copy_button(self):
-        text = self.message_data.get("parts", [{}])[0].get("text", "")
+        if self.copy_button is not None:
+            return
+        text = self.message.text
         btn = tk.Button(self, text="COPY LOG", font=("Segoe UI", 8, "bold"),
                         bg=self.bubble_bg, fg=self.author_fg, relief="flat", bd=0,
                         activebackground=self.bubble_bg, activeforeground=self.text_fg,
                         command=lambda: self.app_instance.copy_to_clipboard(text))
-        btn.pack(side="bottom", anchor="e", pady=(5, 0))
\ No newline at end of file
+        btn.pack(side="bottom", anchor="e", pady=(5, 0))
+        self.copy_button = btn
\ No newline at end of file
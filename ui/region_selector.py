@@ -6,7 +6,8 @@ class RegionSelector:
         self.parent = parent; self.on_selection_callback = on_selection_callback
         self.selector_window = tk.Toplevel(parent)
         self.selector_window.attributes('-fullscreen', True); self.selector_window.attributes('-alpha', 0.3)
-        self.selector_window.overrideredirect(True); self.selector_window.wait_visibility(self.selector_window)
+        self.selector_window.overrideredirect(True); self.selector_window.attributes('-topmost', True) # Above the overlay, which may stay up
+        self.selector_window.wait_visibility(self.selector_window)
         self.canvas = tk.Canvas(self.selector_window, cursor="crosshair", bg="black")
         self.canvas.pack(fill="both", expand=True)
         self.start_x = None; self.start_y = None; self.rect = None
@@ -0,0 +1,126 @@
+# --- ui/render_scheduler.py ---
+"""
+Frame-paced drawing of streamed replies.
+
+One Tk timer ticks at a fixed rate while anything is streaming. Each frame it
+drains everything the stream engine queued for a bubble and hands it over in a
+single call, so a fast model costs one redraw per frame instead of one timer per
+character. The typewriter effect is optional and time-based: it reveals a number
+of characters proportional to the time since the last frame, and catches up when
+the network gets too far ahead.
+"""
+import queue
+import time
+from collections import deque
+
+from utils.settings_model import DEFAULT_RENDER_FPS, DEFAULT_TYPEWRITER_CPS
+MAX_TYPEWRITER_LAG = 0.5 # Seconds of text we may hold back before revealing faster
+
+
+class FrameStats:
+    """Frame times and how many chunks each frame merged, over the last few hundred frames."""
+    def __init__(self, maxlen=600):
+        self.frame_times = deque(maxlen=maxlen) # Seconds spent inside each frame callback
+        self.chunks_per_frame = deque(maxlen=maxlen) # Only frames that had new chunks
+
+    def record(self, elapsed, chunks):
+        self.frame_times.append(elapsed)
+        if chunks:
+            self.chunks_per_frame.append(chunks)
+
+    def summary(self):
+        """e.g. 'frame p50 0.21 ms / p95 0.90 ms, 3.4 chunks merged per frame'."""
+        if not self.frame_times:
+            return "no frames"
+        times = sorted(self.frame_times)
+        p50 = times[len(times) // 2] * 1000
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))] * 1000
+        merged = sum(self.chunks_per_frame) / len(self.chunks_per_frame) if self.chunks_per_frame else 0
+        return f"frame p50 {p50:.2f} ms / p95 {p95:.2f} ms, {merged:.1f} chunks merged per frame"
+
+
+class _Stream:
+    __slots__ = ("handle", "on_text", "on_end", "backlog", "ended", "last_frame")
+
+    def __init__(self, handle, on_text, on_end):
+        self.handle = handle
+        self.on_text = on_text
+        self.on_end = on_end
+        self.backlog = "" # Received but not revealed yet (typewriter only)
+        self.ended = False
+        self.last_frame = time.perf_counter()
+
+
+class RenderScheduler:
+    def __init__(self, root, fps=DEFAULT_RENDER_FPS, typewriter_cps=DEFAULT_TYPEWRITER_CPS):
+        self.root = root
+        self.fps = fps
+        self.typewriter_cps = typewriter_cps
+        self.stats = FrameStats()
+        self._streams = []
+        self._timer = None
+
+    def attach(self, handle, on_text, on_end):
+        """
+        Starts drawing a StreamHandle: on_text(text) gets the merged text of each
+        frame, on_end() runs once the stream is over and everything is shown.
+        """
+        self._streams.append(_Stream(handle, on_text, on_end))
+        if self._timer is None:
+            self._timer = self.root.after(self._interval_ms(), self._frame)
+
+    def detach(self, handle):
+        """Stops drawing a stream without calling its on_end (e.g. it was cancelled)."""
+        self._streams = [s for s in self._streams if s.handle is not handle]
+
+    def _interval_ms(self, spent=0.0):
+        return max(1, int(1000 / self.fps - spent * 1000))
+
+    def _frame(self):
+        start = time.perf_counter()
+        chunks = 0
+        try:
+            for stream in list(self._streams):
+                if stream.handle.cancelled:
+                    self.detach(stream.handle)
+                    continue
+                try:
+                    chunks += self._drain(stream, start)
+                except Exception:
+                    self.detach(stream.handle) # Its callbacks would only fail again next frame
+                    raise
+        finally:
+            # Always reschedule or clear the timer, or attach() would wait on a timer that never fires
+            elapsed = time.perf_counter() - start
+            self.stats.record(elapsed, chunks)
+            self._timer = self.root.after(self._interval_ms(elapsed), self._frame) if self._streams else None
+
+    def _drain(self, stream, now):
+        """Draws one frame of a stream. Returns how many chunks it merged."""
+        parts = []
+        while not stream.ended:
+            try:
+                chunk = stream.handle.queue.get_nowait()
+            except queue.Empty:
+                break
+            if chunk is None: # End of stream sentinel
+                stream.ended = True
+            else:
+                parts.append(chunk)
+
+        text = stream.backlog + "".join(parts)
+        if self.typewriter_cps and text:
+            budget = int(self.typewriter_cps * (now - stream.last_frame)) or 1
+            budget = max(budget, len(text) - int(self.typewriter_cps * MAX_TYPEWRITER_LAG))
+            text, stream.backlog = text[:budget], text[budget:]
+        else:
+            stream.backlog = ""
+        stream.last_frame = now
+
+        if text:
+            stream.on_text(text)
+        if stream.ended and not stream.backlog:
+            self.detach(stream.handle)
+            print(f"[RENDER] Stream done at {self.fps} Hz: {self.stats.summary()}")
+            stream.on_end()
+        return len(parts)
@@ -0,0 +1,126 @@
+# --- ui/text_measure.py ---
+"""
+Wrapped line counts for bubble text, from cached font metrics.
+
+Asking a Text widget how many display lines it has needs an up-to-date layout,
+which used to mean an update_idletasks() for every bubble on every <Configure>.
+Here the text is tokenized with the same markdown rules, each word is measured
+once per font with tkinter.font and word-wrapped against the width. Results are
+cached per (font, width, text hash), and bubbles that change width are measured
+together in one idle callback instead of one layout pass each.
+"""
+import re
+import tkinter.font as tkfont
+from collections import OrderedDict
+
+from ui.markdown_stream import render_segments
+
+_TOKEN = re.compile(r"(\S+)(\s*)|(\s+)")
+
+
+class TextMeasurer:
+    def __init__(self, root, base_font, tag_fonts=None, tag_margins=None, max_entries=4096):
+        """
+        base_font is the Text widget's font; tag_fonts maps markdown tags to their fonts,
+        in the order they were configured on the widget (later ones win), and tag_margins
+        to the left margin (px) their lines get, e.g. {"list": 20}.
+        """
+        self.root = root
+        self.base_font = base_font
+        self.tag_fonts = tag_fonts or {}
+        self.tag_margins = tag_margins or {}
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._fonts = {}             # Font spec -> tkfont.Font
+        self._specs = {}             # Segment tags -> the font spec that wins
+        self._widths = {}            # (font spec, token) -> px
+        self._counts = OrderedDict() # (font spec, width, hash(text)) -> line count, most recent last
+        self._pending = {}           # bubble -> width, measured in the next idle callback
+        self._flush_id = None
+
+    def line_count(self, text, width):
+        """Display lines 'text' takes when rendered as markdown and wrapped at 'width' px."""
+        key = (self.base_font, width, hash(text))
+        count = self._counts.get(key)
+        if count is not None:
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return count
+        self.misses += 1
+        count = self._wrap(render_segments(text), width)
+        self._counts[key] = count
+        if len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+        return count
+
+    def request(self, bubble, width):
+        """Queues bubble.fit_to_width(width); all queued bubbles are fitted in one batch."""
+        self._pending[bubble] = width
+        if self._flush_id is None:
+            self._flush_id = self.root.after_idle(self._flush)
+
+    def _flush(self):
+        self._flush_id = None
+        pending, self._pending = self._pending, {}
+        for bubble, width in pending.items():
+            if bubble.winfo_exists():
+                bubble.fit_to_width(width)
+
+    # --- Measuring ---
+
+    def _font(self, spec):
+        font = self._fonts.get(spec)
+        if font is None:
+            family, size, *style = spec
+            style = " ".join(style)
+            font = tkfont.Font(root=self.root, family=family, size=size,
+                               weight="bold" if "bold" in style else "normal",
+                               slant="italic" if "italic" in style else "roman")
+            self._fonts[spec] = font
+        return font
+
+    def _spec_for(self, tags):
+        spec = self._specs.get(tags)
+        if spec is None:
+            spec = self.base_font
+            for tag, font in self.tag_fonts.items():
+                if tag in tags:
+                    spec = font # Like Tk, the tag configured last has priority
+            self._specs[tags] = spec
+        return spec
+
+    def _measure(self, spec, token):
+        key = (spec, token)
+        width = self._widths.get(key)
+        if width is None:
+            width = self._widths[key] = self._font(spec).measure(token)
+        return width
+
+    def _wrap(self, segments, width):
+        """Greedy word wrap like Tk's wrap=word: words move down whole, longer ones are split."""
+        lines, x, avail, line_start = 0, 0, width, True
+        for text, tags in segments:
+            if not text:
+                continue # Fence markers
+            spec = self._spec_for(tags)
+            for part_index, part in enumerate(text.split("\n")):
+                if part_index: # Every newline finishes a line, empty ones included
+                    lines += 1
+                    x, line_start = 0, True
+                if not part:
+                    continue
+                if line_start:
+                    avail = max(1, width - max((self.tag_margins.get(t, 0) for t in tags), default=0))
+                    line_start = False
+                for word, space, blank in _TOKEN.findall(part):
+                    word_px = self._measure(spec, word or blank)
+                    if x and x + word_px > avail:
+                        lines += 1
+                        x = 0
+                    if word_px > avail: # Too long for any line: Tk breaks it by characters
+                        lines += int(word_px // avail)
+                        word_px %= avail
+                    x += word_px + (self._measure(spec, space) if space else 0)
+        if not line_start:
+            lines += 1 # The last line had no newline
+        return max(1, lines)
@@ -0,0 +1,66 @@
+# --- ui/theme_registry.py ---
+"""
+Themed widgets, registered with a semantic role when they are created.
+
+A role says which palette colours go into which widget options, so switching
+themes is one pass of config() calls over the registry instead of walking the
+widget tree and guessing roles from fonts and button labels. Values that are
+not palette keys (like "white") are used as they are.
+"""
+import tkinter as tk
+
+ROLES = {
+    "window": {"bg": "C_BG"},
+    "brand": {"bg": "C_BG", "fg": "C_ACCENT"},
+    "status": {"bg": "C_BG", "fg": "C_TEXT_SECONDARY"},
+    "grip": {"bg": "C_CARD", "fg": "C_TEXT_SECONDARY"},
+    "sidebar": {"bg": "C_SIDEBAR"},
+    "sidebar_button": {"bg": "C_SIDEBAR", "fg": "C_TEXT_SECONDARY", "activebackground": "C_ACCENT"},
+    "prompt": {"bg": "C_INPUT", "highlightbackground": "C_BORDER"},
+    "prompt_entry": {"bg": "C_INPUT", "fg": "C_TEXT_PRIMARY", "insertbackground": "C_TEXT_PRIMARY"},
+    "accent_button": {"bg": "C_ACCENT", "fg": "white", "activebackground": "C_ACCENT_HOVER"},
+    # The settings dashboard
+    "panel": {"bg": "C_SIDEBAR"},
+    "panel_border": {"bg": "C_SIDEBAR", "highlightbackground": "C_BORDER"},
+    "heading": {"bg": "C_SIDEBAR", "fg": "C_ACCENT"},
+    "label": {"bg": "C_SIDEBAR", "fg": "C_TEXT_PRIMARY"},
+    "hint": {"bg": "C_SIDEBAR", "fg": "C_TEXT_SECONDARY"},
+    "check": {"bg": "C_SIDEBAR", "fg": "C_TEXT_PRIMARY", "selectcolor": "C_SIDEBAR",
+              "activebackground": "C_SIDEBAR", "activeforeground": "C_ACCENT"},
+    "button": {"bg": "C_INPUT", "fg": "C_TEXT_PRIMARY", "activebackground": "C_ACCENT"},
+    "quiet_button": {"bg": "C_INPUT", "fg": "C_TEXT_SECONDARY", "activebackground": "C_ACCENT"},
+    "input": {"bg": "C_INPUT", "fg": "C_TEXT_PRIMARY", "insertbackground": "C_TEXT_PRIMARY"},
+}
+
+
+class ThemeRegistry:
+    def __init__(self, theme_provider):
+        self.theme_provider = theme_provider
+        self._widgets = [] # (widget, role) in creation order
+        self._hooks = []   # hook(palette) -> how many things it recoloured, for what isn't a plain widget
+
+    def register(self, widget, role):
+        """Remembers a widget's role and colours it for the current theme. Returns the widget."""
+        self._widgets.append((widget, role))
+        self._configure(widget, role, self.theme_provider.get_palette())
+        return widget
+
+    def add_hook(self, hook):
+        self._hooks.append(hook)
+
+    def apply(self):
+        """Recolours every registered widget, then runs the hooks. Returns how many things were updated."""
+        palette = self.theme_provider.get_palette()
+        alive = []
+        for widget, role in self._widgets:
+            if self._configure(widget, role, palette):
+                alive.append((widget, role))
+        self._widgets = alive # Forget widgets that were destroyed
+        return len(alive) + sum(hook(palette) or 0 for hook in self._hooks)
+
+    def _configure(self, widget, role, palette):
+        try:
+            widget.config(**{option: palette.get(value, value) for option, value in ROLES[role].items()})
+        except tk.TclError:
+            return False
+        return True
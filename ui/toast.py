@@ -0,0 +1,47 @@
+# --- ui/toast.py ---
+"""
+A lightweight toast for transient status ("Copied!", "Opacity: 85%", errors).
+
+One label is created up front and placed over the bottom of the chat area when
+there is something to say, then hidden again. Nothing goes through the chat
+view or the conversation store, so status text never reaches the API.
+"""
+import tkinter as tk
+
+DEFAULT_DURATION_MS = 2000
+ERROR_DURATION_MS = 5000
+
+
+class Toast:
+    def __init__(self, parent, theme_provider, font=("Segoe UI", 9, "bold")):
+        self.theme_provider = theme_provider
+        self.label = tk.Label(parent, font=font, padx=14, pady=6, wraplength=480, justify="left")
+        self._hide_id = None
+        self.kind = None # "info" or "error" while shown
+
+    def show(self, text, kind="info", duration_ms=None):
+        """Shows 'text', replacing whatever toast is up, and hides it after duration_ms."""
+        if duration_ms is None:
+            duration_ms = ERROR_DURATION_MS if kind == "error" else DEFAULT_DURATION_MS
+        self.kind = kind
+        self.label.config(text=text)
+        self.apply_theme()
+        self.label.place(relx=0.5, rely=1.0, y=-12, anchor="s")
+        self.label.lift()
+        if self._hide_id:
+            self.label.after_cancel(self._hide_id)
+        self._hide_id = self.label.after(duration_ms, self.hide)
+
+    def hide(self):
+        if self._hide_id:
+            self.label.after_cancel(self._hide_id)
+            self._hide_id = None
+        self.label.place_forget()
+        self.kind = None
+
+    def apply_theme(self, palette=None):
+        """Colours the toast for the current theme (also used as a ThemeRegistry hook)."""
+        p = palette or self.theme_provider.get_palette()
+        fg = p["C_ERROR"] if self.kind == "error" else p["C_TEXT_PRIMARY"]
+        self.label.config(bg=p["C_CARD"], fg=fg, highlightthickness=1, highlightbackground=p["C_BORDER"])
+        return 1
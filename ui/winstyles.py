@@ -0,0 +1,24 @@
+# --- ui/winstyles.py ---
+"""
+pywinstyles (Windows-only and optional) behind one lazy import.
+
+It is loaded the first time a widget is styled rather than when the UI modules
+are imported, and a missing package is only looked up once.
+"""
+_pywinstyles = None # The module once imported, False if it isn't available
+
+
+def apply_style(widget, style):
+    """pywinstyles.apply_style(), or nothing where it isn't available."""
+    global _pywinstyles
+    if _pywinstyles is None:
+        try:
+            import pywinstyles
+            _pywinstyles = pywinstyles
+        except Exception:
+            _pywinstyles = False
+    if _pywinstyles:
+        try:
+            _pywinstyles.apply_style(widget, style)
+        except Exception:
+            pass
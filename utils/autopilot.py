@@ -38,6 +38,10 @@ class Autopilot:
             if self._stop_event.is_set():
                 # If we were told to stop completely during the wait
                 break
+
+            # Typing or clicking anywhere defers the tick until the user has been idle for the cooldown
+            if not self._wait_for_idle():
+                continue
             
             # If the wait finished naturally without a reset or stop, it's time to trigger!
             print("[AUTOPILOT] Timer fired! Triggering proactive tick.")
@@ -46,6 +50,16 @@ class Autopilot:
             if self.current_interval_index < len(self.intervals) - 1:
                 self.current_interval_index += 1
 
+    def _wait_for_idle(self):
+        """Holds the tick back while the user is active. False if reset or stopped meanwhile."""
+        while True:
+            remaining = self.app.settings.autopilot_cooldown_seconds - self.app.idle_seconds()
+            if remaining <= 0:
+                return True
+            print(f"[AUTOPILOT] User is active, deferring the tick by {remaining:.0f}s.")
+            if self._reset_event.wait(timeout=remaining) or self._stop_event.is_set():
+                return False
+
     def start(self):
         """Starts the Autopilot thread."""
         if self.running:
@@ -64,6 +78,7 @@ class Autopilot:
             
         print("[AUTOPILOT] Stopping...")
         self._stop_event.set() # Signal the loop to stop
+        self._reset_event.set() # And wake it from its wait
         self.thread.join(timeout=2) # Wait briefly for the thread to finish
         self.running = False
         self.current_interval_index = 0 # Reset for next time
@@ -0,0 +1,166 @@
+# --- utils/capture_service.py ---
+"""
+A long-lived capture thread that owns one mss instance.
+
+Opening mss, grabbing and PNG-encoding a multi-megapixel frame used to happen
+on the Tk thread for every capture, freezing the UI for the whole encode. Now
+the Tk thread only submits a job and gets a concurrent Future back; grabbing,
+masking, the change check and encoding (downscaled to fit a byte budget, see
+image_encoder) all run here. The thread and mss are started on the first
+capture, and grab/encode times are kept per resolution.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils import frame_diff, screen_capture
+from utils.image_encoder import ImageEncoder
+
+
+class Capture:
+    """
+    The result of one job. image (an EncodedImage) is None when the screen was unchanged.
+    screen_reference is the frame's change-detector thumbnail, for mark_sent() once sent.
+    """
+    __slots__ = ("image", "unchanged", "screen_reference", "size", "grab_ms", "encode_ms")
+
+    def __init__(self, image, unchanged, size, grab_ms, encode_ms, screen_reference=None):
+        self.image = image
+        self.unchanged = unchanged
+        self.screen_reference = screen_reference
+        self.size = size
+        self.grab_ms = grab_ms
+        self.encode_ms = encode_ms
+
+
+class CaptureTimings:
+    """Grab and encode times for one resolution."""
+    def __init__(self):
+        self.count = 0
+        self.grab_ms = 0.0
+        self.encode_ms = 0.0
+        self.encoded = 0 # Unchanged frames are grabbed but not encoded
+
+    def add(self, capture):
+        self.count += 1
+        self.grab_ms += capture.grab_ms
+        if not capture.unchanged:
+            self.encoded += 1
+            self.encode_ms += capture.encode_ms
+
+    def summary(self):
+        encode = f"{self.encode_ms / self.encoded:.1f} ms" if self.encoded else "n/a"
+        return f"grab {self.grab_ms / self.count:.1f} ms, encode {encode} (n={self.count})"
+
+
+class CaptureService:
+    def __init__(self, encoder=None):
+        self.encoder = encoder or ImageEncoder() # Its limits can be changed between jobs
+        self.timings = {} # (width, height) -> CaptureTimings
+        self._jobs = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, region=None, mask=None, detector=None):
+        """
+        Queues a capture and returns a Future for its Capture. 'region' is an mss monitor
+        dict (None = primary monitor); 'mask' a screen rectangle to paint out of the frame;
+        'detector' a ScreenChangeDetector, which skips the encode of an unchanged full screen.
+        """
+        return self._put(self._capture, region, mask, detector)
+
+    def submit_probe(self, mask=None):
+        """
+        Queues a cheap look at the primary monitor: grabbed and reduced to a grayscale
+        thumbnail (see frame_diff.thumbnail), never encoded. Returns a Future for it.
+        """
+        return self._put(self._probe, mask)
+
+    def summary(self):
+        """One line per resolution, e.g. '1920x1080: grab 14.2 ms, encode 96.0 ms (n=5)'."""
+        with self._lock:
+            return [f"{w}x{h}: {t.summary()}" for (w, h), t in sorted(self.timings.items())]
+
+    def close(self):
+        """
+        Stops the thread after the jobs already queued. Jobs it can't get to in time are
+        cancelled, so nobody waits on them forever; submit() refuses work from now on.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._jobs.put(None)
+        if thread is not None:
+            thread.join(timeout=2)
+        stuck = thread is not None and thread.is_alive() # Still busy with a slow grab
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job[0].cancel()
+        if stuck:
+            self._jobs.put(None) # Put back the stop signal the drain took
+        self._thread = None
+
+    def _put(self, job, *args):
+        future = Future()
+        with self._lock: # Nothing gets queued behind close()'s stop signal
+            if self._closed:
+                raise RuntimeError("The capture service is closed.")
+            self._ensure_started()
+            self._jobs.put((future, job, args))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="capture-service", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        sct = None
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                future, run_job, args = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if sct is None:
+                        import mss # Created on this thread; mss handles are not shared across threads
+                        sct = mss.mss()
+                    future.set_result(run_job(sct, *args))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            if sct is not None:
+                sct.close()
+
+    def _probe(self, sct, mask):
+        shot = sct.grab(sct.monitors[1])
+        if mask is not None:
+            screen_capture.mask_rect(shot, mask)
+        return frame_diff.thumbnail(shot.raw, shot.width, shot.height)
+
+    def _capture(self, sct, region, mask, detector):
+        start = time.perf_counter()
+        shot = sct.grab(region if region is not None else sct.monitors[1])
+        if mask is not None:
+            screen_capture.mask_rect(shot, mask)
+        grabbed = time.perf_counter()
+        screen_reference = detector.check(shot) if region is None and detector is not None else None
+        unchanged = region is None and detector is not None and screen_reference is None
+        image = None if unchanged else self.encoder.encode(shot)
+        capture = Capture(image, unchanged, shot.size,
+                          (grabbed - start) * 1000, (time.perf_counter() - grabbed) * 1000, screen_reference)
+        with self._lock:
+            self.timings.setdefault(tuple(shot.size), CaptureTimings()).add(capture)
+        return capture
@@ -1,9 +1,14 @@
 # --- utils/context_manager.py ---
+import os
 import sys
 
+GW_HWNDNEXT = 2 # GetWindow(): the next window down the z-order
+
 def get_active_window_info():
     """
     Gets the title and executable name of the currently active window.
+    When that is the overlay itself (it stays up while capturing), the window
+    right below it is reported instead.
     """
     active_window_info = "No context detected." # Default message
     try:
@@ -11,6 +16,12 @@ def get_active_window_info():
         if sys.platform == "win32":
             import win32gui, win32process, psutil
             hwnd = win32gui.GetForegroundWindow()
+            own_pid = os.getpid()
+            if hwnd and win32process.GetWindowThreadProcessId(hwnd)[1] == own_pid:
+                # Walk down the z-order to the first visible, titled window that isn't ours
+                while hwnd and (win32process.GetWindowThreadProcessId(hwnd)[1] == own_pid
+                                or not win32gui.IsWindowVisible(hwnd) or not win32gui.GetWindowText(hwnd)):
+                    hwnd = win32gui.GetWindow(hwnd, GW_HWNDNEXT)
             if hwnd:
                 _, pid = win32process.GetWindowThreadProcessId(hwnd)
                 app_name = psutil.Process(pid).name().replace(".exe", "").capitalize()
@@ -23,4 +34,4 @@ def get_active_window_info():
     
     # A clearer debugging message
     print(f"--- [CONTEXT CHECK] --- Detected: {active_window_info}")
-    return active_window_info
\ No newline at end of file
+    return active_window_info
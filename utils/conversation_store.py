@@ -0,0 +1,209 @@
+# --- utils/conversation_store.py ---
+"""
+Conversation history built from immutable messages with structural sharing.
+
+Messages are never mutated once created, so the same objects (and their cached
+API dicts) can be handed to a request payload without deep-copying anything.
+The store is a persistent linked list: appending or taking a snapshot is O(1),
+and older snapshots keep seeing exactly the messages they were taken with.
+"""
+import re
+
+CHARS_PER_TOKEN = 4 # Rough average for English text and code
+API_ROLES = ("user", "model") # The only roles Gemini accepts in 'contents'
+MESSAGE_OVERHEAD_TOKENS = 4 # Role and framing
+
+# Older versions saved the user's prompts with the "system" role, next to the status
+# texts show_feedback() put into the chat. These are those status texts; they are dropped
+# on load and every other "system" entry is the user's own prompt.
+LEGACY_STATUS_TEXT = re.compile(
+    r"(Autopilot (Enabled|Disabled)|Settings saved!|Please enter your Gemini API key!"
+    r"|Chat (saved|loaded) successfully!|UI Refreshed|Chat cleared!|Theme: \w+|Opacity: \d+%"
+    r"|Capture mode: .+|Context sharing: \w+)"
+)
+
+
+class Message:
+    """A single, immutable chat message."""
+    __slots__ = ("role", "parts", "_api_dict", "_tokens")
+
+    def __init__(self, role, parts):
+        object.__setattr__(self, "role", role)
+        object.__setattr__(self, "parts", tuple(parts))
+        object.__setattr__(self, "_api_dict", None)
+        object.__setattr__(self, "_tokens", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Message is immutable; create a new one instead.")
+
+    @classmethod
+    def from_text(cls, role, text):
+        return cls(role, ({"text": text},))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["role"], [dict(part) for part in data["parts"]])
+
+    @property
+    def text(self):
+        return self.parts[0].get("text", "") if self.parts else ""
+
+    @property
+    def token_estimate(self):
+        """Approximate prompt tokens for this message. Computed once, since the text never changes."""
+        if self._tokens is None:
+            chars = sum(len(part.get("text", "")) for part in self.parts)
+            object.__setattr__(self, "_tokens", MESSAGE_OVERHEAD_TOKENS + (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+        return self._tokens
+
+    def to_dict(self):
+        """The Gemini 'contents' entry for this message. Cached and shared: treat it as read-only."""
+        if self._api_dict is None:
+            object.__setattr__(self, "_api_dict", {"role": self.role, "parts": list(self.parts)})
+        return self._api_dict
+
+    def __repr__(self):
+        return f"Message({self.role!r}, {self.text[:30]!r})"
+
+
+class _Node:
+    __slots__ = ("message", "prev", "length")
+
+    def __init__(self, message, prev):
+        self.message = message
+        self.prev = prev
+        self.length = prev.length + 1 if prev else 1
+
+
+def _walk(head):
+    """Returns the messages from oldest to newest."""
+    messages = []
+    node = head
+    while node is not None:
+        messages.append(node.message)
+        node = node.prev
+    messages.reverse()
+    return messages
+
+
+class ConversationSnapshot:
+    """A frozen view of the conversation. Taking one is O(1); it shares every node with the store."""
+    __slots__ = ("_head", "_messages")
+
+    def __init__(self, head):
+        self._head = head
+        self._messages = None
+
+    def _list(self):
+        if self._messages is None:
+            self._messages = _walk(self._head)
+        return self._messages
+
+    def __len__(self):
+        return self._head.length if self._head else 0
+
+    def __iter__(self):
+        return iter(self._list())
+
+    def __getitem__(self, index):
+        return self._list()[index]
+
+    @property
+    def last(self):
+        return self._head.message if self._head else None
+
+
+class ConversationStore:
+    """The live, append-mostly conversation history."""
+    def __init__(self, messages=()):
+        self._head = None
+        for message in messages:
+            self.append(message)
+
+    @classmethod
+    def from_list(cls, data):
+        """
+        Loads a saved chat (a list of {'role', 'parts'} dicts). Chats saved by older
+        versions are migrated: their status texts and errors are dropped and their
+        "system" prompts become "user" turns.
+        """
+        return cls(message for message in map(_migrate_legacy, data) if message is not None)
+
+    def to_list(self):
+        """Plain dicts, ready for json.dump()."""
+        return [message.to_dict() for message in self]
+
+    def append(self, message):
+        self._head = _Node(message, self._head)
+        return message
+
+    def pop(self):
+        """Removes and returns the newest message."""
+        if self._head is None:
+            raise IndexError("pop from an empty conversation")
+        message = self._head.message
+        self._head = self._head.prev
+        return message
+
+    def remove(self, message):
+        """Removes a message by identity. Only the nodes after it are rebuilt."""
+        self.replace(message, None)
+
+    def replace(self, old, new):
+        """Swaps one message for another (or drops it when new is None), matched by identity."""
+        newer = []
+        node = self._head
+        while node is not None and node.message is not old:
+            newer.append(node.message)
+            node = node.prev
+        if node is None:
+            raise ValueError("message is not in the conversation")
+        head = node.prev
+        if new is not None:
+            head = _Node(new, head)
+        for message in reversed(newer):
+            head = _Node(message, head)
+        self._head = head
+
+    def clear(self):
+        self._head = None
+
+    def snapshot(self):
+        return ConversationSnapshot(self._head)
+
+    @property
+    def last(self):
+        return self._head.message if self._head else None
+
+    def __len__(self):
+        return self._head.length if self._head else 0
+
+    def __bool__(self):
+        return self._head is not None
+
+    def __iter__(self):
+        return iter(_walk(self._head))
+
+    def __getitem__(self, index):
+        # Recent messages are the common case, so walk back from the head for negative indexes
+        if index < 0:
+            node = self._head
+            for _ in range(-index - 1):
+                node = node.prev if node else None
+            if node is None:
+                raise IndexError("conversation index out of range")
+            return node.message
+        return _walk(self._head)[index]
+
+
+def _migrate_legacy(item):
+    """A saved entry as a Message, or None when it isn't part of the conversation."""
+    role = item.get("role")
+    if role == "system":
+        message = Message.from_dict(item)
+        if LEGACY_STATUS_TEXT.fullmatch(message.text.strip()):
+            return None
+        return Message("user", message.parts)
+    if role in API_ROLES:
+        return Message.from_dict(item)
+    return None # "error" turns and anything else the API doesn't accept
@@ -0,0 +1,120 @@
+# --- utils/frame_diff.py ---
+"""
+Tells whether the screen changed enough since the last screenshot the model saw.
+
+Each frame is reduced to a small grayscale grid of block averages (straight from
+mss' raw BGRA buffer, before any PNG encoding). Two frames are compared by the
+fraction of grid cells whose brightness moved noticeably, so a blinking cursor
+or a ticking clock does not count as a new screen but an opened window does.
+numpy is imported on the first comparison, so it costs nothing at startup.
+"""
+DEFAULT_THRESHOLD = 0.01 # Fraction of grid cells that must change (0 = always send)
+DEFAULT_ACTIVITY_THRESHOLD = 0.05 # Activity score an Autopilot tick needs to observe (0 = always)
+TITLE_CHANGE_WEIGHT = 1.0 # Added to the activity score when the foreground window changed
+GRID_SIZE = (90, 160) # Rows, columns of the comparison grid
+CELL_DELTA = 8 # Brightness change (0-255) for a cell to count as changed
+SAMPLE_STEP = 2 # Only every other pixel is read; plenty for block averages
+
+
+def thumbnail(raw, width, height, grid=GRID_SIZE):
+    """Downsamples a BGRA buffer to a (rows, cols) grid of mean brightness."""
+    import numpy as np
+    pixels = np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4)
+    # The green channel carries most of the luminance and saves a weighted sum
+    green = pixels[::SAMPLE_STEP, ::SAMPLE_STEP, 1]
+    rows, cols = min(grid[0], green.shape[0]), min(grid[1], green.shape[1])
+    block_h, block_w = green.shape[0] // rows, green.shape[1] // cols
+    cropped = green[:rows * block_h, :cols * block_w].astype(np.float32)
+    return cropped.reshape(rows, block_h, cols, block_w).mean(axis=(1, 3))
+
+
+def change_score(previous, current):
+    """Fraction of grid cells that changed between two thumbnails (1.0 if they can't be compared)."""
+    if previous is None or previous.shape != current.shape:
+        return 1.0
+    import numpy as np
+    return float(np.count_nonzero(np.abs(current - previous) > CELL_DELTA)) / current.size
+
+
+class ScreenChangeDetector:
+    """
+    Remembers the last frame the model actually received. Frames that are too
+    similar to it are reported as unchanged and counted as skipped uploads. A
+    changed frame only becomes the reference through mark_sent(), once the
+    request carrying it has succeeded; a cancelled or failed turn leaves the
+    old reference in place, so the next capture is still sent.
+    """
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._reference = None     # Thumbnail of the last frame sent to the model
+        self._reference_bytes = 0  # Encoded size of that frame
+        self.last_score = None
+        self.sent = 0
+        self.skipped = 0
+        self.bytes_saved = 0
+
+    def reset(self):
+        """Forgets the reference, e.g. when the chat is cleared and the model has seen nothing."""
+        self._reference = None
+        self._reference_bytes = 0
+
+    def check(self, shot):
+        """
+        Checks an mss screenshot against the reference. Returns None when it is unchanged
+        (counted as a skipped upload), else its thumbnail, for mark_sent() once it was sent.
+        """
+        current = thumbnail(shot.raw, shot.width, shot.height)
+        self.last_score = change_score(self._reference, current)
+        if self.threshold > 0 and self.last_score < self.threshold:
+            self.skipped += 1
+            self.bytes_saved += self._reference_bytes
+            return None
+        return current
+
+    def mark_sent(self, thumb, image_bytes):
+        """Makes a frame from check() the reference, once a request carrying it has succeeded."""
+        self._reference = thumb
+        self._reference_bytes = image_bytes
+        self.sent += 1
+
+    def describe(self):
+        """Short text for the status label, e.g. 'Screen unchanged, 4.2 MB saved'."""
+        return f"Screen unchanged, {self.bytes_saved / 1_000_000:.1f} MB saved"
+
+
+class ActivityDetector:
+    """
+    Decides whether an Autopilot tick is worth a capture and a model call. The
+    score is the screen change since the last observation, plus TITLE_CHANGE_WEIGHT
+    when the foreground window is a different one. The reference only moves on
+    fired ticks, so slow drift still adds up to an observation eventually.
+    """
+    def __init__(self, threshold=DEFAULT_ACTIVITY_THRESHOLD, title_weight=TITLE_CHANGE_WEIGHT):
+        self.threshold = threshold
+        self.title_weight = title_weight
+        self._reference = None # Thumbnail at the last observation
+        self._context = None   # Window info at the last observation
+        self.last_score = None
+        self.fired = 0
+        self.skipped = 0
+
+    def reset(self):
+        self._reference = None
+        self._context = None
+
+    def should_fire(self, thumb, context):
+        """Scores a probe thumbnail and the active window info, and counts the tick as fired or skipped."""
+        score = change_score(self._reference, thumb)
+        if self._context is not None and context != self._context:
+            score += self.title_weight
+        self.last_score = min(score, 1.0)
+        if self.last_score < self.threshold:
+            self.skipped += 1
+            return False
+        self.fired += 1
+        self._reference, self._context = thumb, context
+        return True
+
+    def describe(self):
+        """e.g. 'Autopilot: 3 fired, 12 skipped (12 API calls saved)'"""
+        return f"Autopilot: {self.fired} fired, {self.skipped} skipped ({self.skipped} API calls saved)"
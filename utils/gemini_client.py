@@ -1,114 +1,265 @@
 # --- utils/gemini_client.py ---
-import requests
+import asyncio
+import os
+import time
 import base64
-import copy 
-import json
-import re
+from utils.sse_parser import SSEParser, iter_text_parts, finish_reason
+from utils.resilience import RetryPolicy, AttemptLog, AttemptFailure, classify
 
-def get_gemini_response_stream(api_key, conversation_history, model_name="gemini-3-flash-preview", persona_text="You are a helpful AI.", image_path=None, active_context=None):
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+
+
+class GeminiClient:
     """
-    Sends the conversation history, an optional image, and active window context
-    to a specified Gemini model and yields the text chunks from the streaming response.
+    A long-lived Gemini client that owns one pooled, keep-alive HTTP connection pool.
+    Reusing the same instance across turns means only the first message pays
+    for the DNS lookup, TCP connect and TLS handshake.
+
+    The client is asynchronous so a stream can be cancelled mid-response; it must
+    only be used from the StreamEngine's event loop.
     """
-    api_key = api_key.strip()
-    # Handle both "models/gemini-..." and "gemini-..." identifiers
-    model_id = model_name.strip()
-    if model_id.startswith("models/"):
-        model_id = model_id.replace("models/", "", 1)
-    
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_id}:streamGenerateContent?key={api_key}&alt=sse"
-    
-    # Debug: help identify issues with keys or models
-    redacted_key = f"{api_key[:4]}...{api_key[-4:]}" if len(api_key) > 8 else "***"
-    print(f"[CLIENT] Requesting model: {model_id} (Key: {redacted_key})")
-    
-    headers = {'Content-Type': 'application/json'}
-
-    if not api_key:
-        print("[CLIENT] Error: API Key is empty!")
-        yield "Error: Gemini API key is missing."
-        return
-    if not isinstance(conversation_history, list):
-        yield "Error: Conversation history is invalid."
-        return
-
-    request_history = copy.deepcopy(conversation_history)
-
-    # We don't need to change how the image is attached.
-
-    if image_path:
-        try:
-            with open(image_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            for message in reversed(request_history):
-                if message['role'] == 'user':
-                    message['parts'].append({"inline_data": {"mime_type": "image/png", "data": image_data}})
-                    break
-        except Exception as e:
-            yield f"Error processing image: {e}"
+    def __init__(self, base_url=None, pool_size=4, retry_policy=None, verify=True, json_backend="auto"):
+        # GEMINI_BASE_URL points the app at another endpoint, e.g. the local stand-in server
+        base_url = base_url or os.getenv("GEMINI_BASE_URL") or DEFAULT_BASE_URL
+        self.base_url = base_url.rstrip("/")
+        self.json_backend = json_backend # "auto", "json" or "orjson"
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.attempt_log = AttemptLog() # Every attempt, retry and fallback, for tail-latency analysis
+        self.pool_size = pool_size
+        self.verify = verify # True, or an ssl.SSLContext (used by the local stand-in server)
+        self._http = None
+        self.response_cache = None # An optional ResponseCache, set by the app when caching is enabled
+
+    @property
+    def http(self):
+        """The pooled httpx client, created on first use so httpx isn't imported at startup."""
+        if self._http is None:
+            import httpx
+            # A single host, so one pool is enough. We keep a few connections in it
+            # so an Autopilot tick can overlap with a chat turn without reconnecting.
+            self._http = httpx.AsyncClient(
+                timeout=self.retry_policy.httpx_timeout(), # Separate connect and between-chunk limits
+                verify=self.verify,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                headers={'Content-Type': 'application/json'},
+            )
+        return self._http
+
+    async def aclose(self):
+        """Closes every pooled connection."""
+        if self._http is not None:
+            await self._http.aclose()
+
+    async def stream(self, api_key, contents, model_name="gemini-3-flash-preview", persona_text="You are a helpful AI.", image_data=None, active_context=None, image_mime_type="image/png", fallback_models=(), on_complete=None):
+        """
+        Sends the conversation history, an optional image, and active window context
+        to a specified Gemini model and yields the text chunks from the streaming response.
+
+        'contents' is the list of {'role', 'parts'} dicts from history_window.window_history(...).contents.
+        Those dicts are shared with the conversation store, so they are never modified here.
+        'image_data' is the encoded screenshot as bytes, straight from memory.
+        'fallback_models' are tried in order if the requested model keeps failing before its first chunk.
+        'on_complete()' is called on the event loop once a complete reply came from the API
+        (not from the cache), i.e. the model has really seen this request and its image.
+        """
+        api_key = api_key.strip()
+        model_id = _model_id(model_name)
+
+        # Debug: help identify issues with keys or models
+        redacted_key = f"{api_key[:4]}...{api_key[-4:]}" if len(api_key) > 8 else "***"
+        print(f"[CLIENT] Requesting model: {model_id} (Key: {redacted_key})")
+
+        if not api_key:
+            print("[CLIENT] Error: API Key is empty!")
+            yield "Error: Gemini API key is missing."
             return
-            
-    # --- THE CRITICAL FIX FOR CONTEXT PRIORITY ---
-    # We will now combine the persona and the active context into a single, smart instruction.
-    
-        # --- THE NEW "SOUL" LOGIC ---
-    full_persona = persona_text # Start with the user's chosen persona
-
-    # Check if the last message is a "System Observation" from our Autopilot
-    if request_history and request_history[-1]['parts'][0]['text'].startswith("(System Observation)"):
-        print("[CLIENT] Autopilot prompt detected! Switching to proactive persona.")
-        # If it is, we create a special set of instructions for this one action!
-        full_persona = (
-            f"Your base persona is: '{persona_text}'.\n\n"
-            "INSTRUCTIONS: Your primary focus is the user's conversation history, continue the conversation. If there is no history then start a new conversation, use the 'Active Window Context' and screenshot to understand what the user is doing and proactively mention it to make the conversation more relevant. Don't mention about the 'Active Window itself' or that you're an AI model, make your responses sound as natural and consice unless user demands.\n"
-            f"* Active Window Context: {active_context}"
-        )
-    else:
-        # This is your existing, excellent prompt for normal conversation!
-        full_persona = (
-            f"{persona_text}\n\n---\n"
-            "INSTRUCTIONS: Your primary focus is the user's question and conversation history. Use the 'Active Window Context' to understand what the user is doing and proactively mention it to make the conversation more relevant, especially if the user's message is a simple greeting or a question without much context. Don't mention about the 'Active Window itself' though, make your responses sound natural. Don't mention you're an AI model and give structed responses. Keep your responses relevant to the user's needs.\n"
-            f"* Active Window Context: {active_context}"
-        )
-
-
-    payload = {
-        "contents": request_history,
-        "system_instruction": {
-            "parts": [{"text": full_persona}]
-        },
-        "generationConfig": {
-            "maxOutputTokens": 1024,
-            "temperature": 1.0 # A little more creative for Autopilot!
+        if not isinstance(contents, list):
+            yield "Error: Conversation history is invalid."
+            return
+
+        # Shallow copy only: the one message that gets the image is rebuilt below
+        request_history = list(contents)
+
+        if image_data:
+            try:
+                # Encoding a multi-megabyte frame takes a few ms; keep it off the event loop
+                encoded = await asyncio.to_thread(base64.b64encode, image_data)
+                encoded = encoded.decode('ascii')
+                for i in range(len(request_history) - 1, -1, -1):
+                    message = request_history[i]
+                    if message['role'] == 'user':
+                        image_part = {"inline_data": {"mime_type": image_mime_type, "data": encoded}}
+                        request_history[i] = {"role": "user", "parts": message['parts'] + [image_part]}
+                        break
+            except Exception as e:
+                yield f"Error processing image: {e}"
+                return
+
+        # --- THE CRITICAL FIX FOR CONTEXT PRIORITY ---
+        # We will now combine the persona and the active context into a single, smart instruction.
+
+            # --- THE NEW "SOUL" LOGIC ---
+        full_persona = persona_text # Start with the user's chosen persona
+
+        # Check if the last message is a "System Observation" from our Autopilot
+        if request_history and request_history[-1]['parts'][0]['text'].startswith("(System Observation)"):
+            print("[CLIENT] Autopilot prompt detected! Switching to proactive persona.")
+            # If it is, we create a special set of instructions for this one action!
+            full_persona = (
+                f"Your base persona is: '{persona_text}'.\n\n"
+                "INSTRUCTIONS: Your primary focus is the user's conversation history, continue the conversation. If there is no history then start a new conversation, use the 'Active Window Context' and screenshot to understand what the user is doing and proactively mention it to make the conversation more relevant. Don't mention about the 'Active Window itself' or that you're an AI model, make your responses sound as natural and consice unless user demands.\n"
+                f"* Active Window Context: {active_context}"
+            )
+        else:
+            # This is your existing, excellent prompt for normal conversation!
+            full_persona = (
+                f"{persona_text}\n\n---\n"
+                "INSTRUCTIONS: Your primary focus is the user's question and conversation history. Use the 'Active Window Context' to understand what the user is doing and proactively mention it to make the conversation more relevant, especially if the user's message is a simple greeting or a question without much context. Don't mention about the 'Active Window itself' though, make your responses sound natural. Don't mention you're an AI model and give structed responses. Keep your responses relevant to the user's needs.\n"
+                f"* Active Window Context: {active_context}"
+            )
+
+
+        payload = {
+            "contents": request_history,
+            "system_instruction": {
+                "parts": [{"text": full_persona}]
+            },
+            "generationConfig": {
+                "maxOutputTokens": 1024,
+                "temperature": 1.0 # A little more creative for Autopilot!
+            }
         }
-    }
-
-    # The rest of the function is unchanged
-    try:
-        with requests.post(url, headers=headers, json=payload, timeout=90, stream=True) as response:
-            response.raise_for_status()
-            
-            full_response_text = ""
-            for chunk in response.iter_lines():
-                if chunk and chunk.decode('utf-8').startswith('data: '):
-                    try:
-                        data_chunk = json.loads(chunk.decode('utf-8')[6:])
-                        if 'candidates' in data_chunk:
-                            text_chunk = data_chunk['candidates'][0]['content']['parts'][0]['text']
-                            yield text_chunk
-                    except (json.JSONDecodeError, KeyError, IndexError):
-                        # This can happen with malformed SSE chunks, just skip them
-                        print(f"Warning: Skipping malformed data chunk from API stream.")
+
+        # Identical requests (same model, instructions, trimmed history and screenshot)
+        # replay the stored chunks instead of going to the network.
+        cache, cache_key = self.response_cache, None
+        if cache is not None:
+            cache_key = await asyncio.to_thread(cache.make_key, model_id, full_persona, contents, image_data)
+            cached_chunks = await asyncio.to_thread(cache.get, cache_key)
+            if cached_chunks is not None:
+                print(f"[CACHE] Replaying a cached reply ({len(cached_chunks)} chunks).")
+                for text in cached_chunks:
+                    yield text
+                return
+
+        # Retries and fallbacks happen before the first chunk, so nothing reaches the chat twice
+        chain = [model_id] + [m for m in map(_model_id, fallback_models) if m != model_id]
+        try:
+            response, body, first_chunk, answered_by = await self._open_with_retries(api_key, chain, payload)
+        except AttemptFailure as failure:
+            yield str(failure)
+            return
+
+        # If the task running us is cancelled, the finally below closes the response
+        # and drops its connection instead of reading the rest of the stream.
+        try:
+            # Raw bytes go straight into the incremental parser; it yields every text part
+            parser = SSEParser(self.json_backend)
+            received, completed = [], False
+
+            def _texts(events):
+                nonlocal completed
+                texts = []
+                for event in events:
+                    completed = completed or finish_reason(event) in ("STOP", "MAX_TOKENS")
+                    texts.extend(iter_text_parts(event))
+                received.extend(texts)
+                return texts
+
+            for text in _texts(parser.feed(first_chunk)):
+                yield text
+            async for raw_chunk in body:
+                for text in _texts(parser.feed(raw_chunk)):
+                    yield text
+            for text in _texts(parser.flush()):
+                yield text
+
+            # Only complete, successful replies from the requested model are worth replaying;
+            # a fallback's answer is keyed as the requested model's and would hide the downgrade
+            if cache_key is not None and completed and received and answered_by == model_id:
+                await asyncio.to_thread(cache.put, cache_key, received)
+            if on_complete is not None and completed:
+                on_complete()
+
+        except Exception as e:
+            # Mid-stream failures are not retried: part of the reply is already on screen
+            yield classify(e).args[0]
+        finally:
+            await response.aclose()
+
+    async def _open_with_retries(self, api_key, chain, payload):
+        """
+        Walks the model chain, retrying each model with backoff, until one returns a
+        first chunk. Returns (response, body iterator, first chunk, the model id that
+        answered) or raises the last AttemptFailure.
+        """
+        policy = self.retry_policy
+        failure = None
+        for model_index, model_id in enumerate(chain):
+            url = f"{self.base_url}/v1beta/models/{model_id}:streamGenerateContent?key={api_key}&alt=sse"
+            if model_index:
+                print(f"[CLIENT] Falling back to model: {model_id}")
+            for attempt in range(1, policy.max_attempts + 1):
+                started = time.perf_counter()
+                try:
+                    response, body, first_chunk = await self._open(url, payload)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    failure = classify(e)
+                    elapsed = time.perf_counter() - started
+                    last_try = attempt == policy.max_attempts
+                    too_long = failure.retry_after is not None and failure.retry_after > policy.max_retry_after
+                    if failure.retryable and not last_try and not too_long:
+                        delay = policy.backoff(attempt, failure.retry_after)
+                        self.attempt_log.record(model_id, attempt, "retry", failure.status, elapsed, delay)
+                        await asyncio.sleep(delay)
                         continue
+                    has_next = model_index < len(chain) - 1
+                    outcome = "fallback" if has_next and failure.fallback_worthy else "failed"
+                    self.attempt_log.record(model_id, attempt, outcome, failure.status, elapsed)
+                    if outcome == "failed":
+                        raise failure
+                    break # On to the next model
+                else:
+                    self.attempt_log.record(model_id, attempt, "ok", response.status_code, time.perf_counter() - started)
+                    return response, body, first_chunk, model_id
+        raise failure
+
+    async def _open(self, url, payload):
+        """
+        Sends one request and waits for the first body chunk, all within the
+        first-byte timeout. The pooled client reuses an open connection when there is one.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.retry_policy.first_byte_timeout
+        request = self.http.build_request("POST", url, json=payload)
+        try:
+            response = await asyncio.wait_for(self.http.send(request, stream=True), self.retry_policy.first_byte_timeout)
+        except asyncio.TimeoutError:
+            raise AttemptFailure("Error: The API did not start replying in time.", retryable=True)
+        try:
+            if response.is_error:
+                await response.aread() # Lets the connection go back to the pool
+                response.raise_for_status()
+            body = response.aiter_bytes()
+            first_chunk = await asyncio.wait_for(body.__anext__(), max(0.0, deadline - loop.time()))
+        except StopAsyncIteration:
+            await response.aclose()
+            raise AttemptFailure("Error: The API closed the stream without sending a reply.", retryable=True)
+        except asyncio.TimeoutError:
+            await response.aclose()
+            raise AttemptFailure("Error: The API did not start replying in time.", retryable=True)
+        except BaseException:
+            await response.aclose()
+            raise
+        return response, body, first_chunk
+
+
+def _model_id(model_name):
+    """Handles both "models/gemini-..." and "gemini-..." identifiers."""
+    model_id = model_name.strip()
+    if model_id.startswith("models/"):
+        model_id = model_id.replace("models/", "", 1)
+    return model_id
 
-    except requests.exceptions.HTTPError as e:
-        yield f"Error: API returned an HTTP error: {e.response.status_code} {e.response.reason}. Check your API key and model name."
-    except requests.exceptions.ConnectionError:
-        yield "Error: Could not connect to the API. Please check your internet connection."
-    except requests.exceptions.Timeout:
-        yield "Error: The request to the API timed out."
-    except requests.exceptions.RequestException as e:
-        yield f"Error: An unexpected API request error occurred: {e}"
-    except Exception as e:
-        # This is a catch-all for any other unexpected errors.
-        yield f"Error: An unexpected error occurred in the Gemini client: {e}"
\ No newline at end of file
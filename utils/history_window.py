@@ -0,0 +1,74 @@
+# --- utils/history_window.py ---
+"""
+Keeps each request inside a token budget: the persona plus the most recent
+turns that fit. Anything older is collapsed into a one-line stub so the model
+still knows the conversation had an earlier part.
+"""
+from utils.conversation_store import CHARS_PER_TOKEN
+
+DEFAULT_TOKEN_BUDGET = 8000
+IMAGE_TOKENS = 1120 # Roughly what Gemini charges for one full-screen capture
+SYSTEM_INSTRUCTION_TOKENS = 200 # The fixed instruction text the client wraps around the persona
+
+
+class HistoryWindow:
+    """The result of windowing one request."""
+    __slots__ = ("contents", "used_tokens", "budget", "trimmed_count")
+
+    def __init__(self, contents, used_tokens, budget, trimmed_count):
+        self.contents = contents
+        self.used_tokens = used_tokens
+        self.budget = budget
+        self.trimmed_count = trimmed_count
+
+    def describe(self):
+        """Short text for the status label, e.g. 'Context ~3.1k/8k tokens, 12 trimmed'."""
+        text = f"Context ~{_short(self.used_tokens)}/{_short(self.budget)} tokens"
+        if self.trimmed_count:
+            text += f", {self.trimmed_count} trimmed"
+        return text
+
+
+def _short(tokens):
+    return f"{tokens / 1000:.1f}k".replace(".0k", "k") if tokens >= 1000 else str(tokens)
+
+
+def estimate_text_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def window_history(snapshot, budget, persona_text="", has_image=False):
+    """
+    Picks the newest messages of a ConversationSnapshot that fit in 'budget'
+    tokens after the persona/system instruction (and an attached image) are
+    accounted for. The newest message is always kept, even if it alone is over.
+    """
+    used = SYSTEM_INSTRUCTION_TOKENS + estimate_text_tokens(persona_text)
+    if has_image:
+        used += IMAGE_TOKENS
+
+    messages = list(snapshot)
+    first_kept = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        cost = messages[i].token_estimate
+        if used + cost > budget and first_kept < len(messages):
+            break
+        used += cost
+        first_kept = i
+
+    contents = [message.to_dict() for message in messages[first_kept:]]
+    trimmed = first_kept
+    if trimmed:
+        stub = {"text": f"(Earlier conversation trimmed: {trimmed} older messages were left out to stay within the context budget.)"}
+        # Fold the stub into a leading user turn so roles keep alternating
+        if contents[0]["role"] != "user":
+            contents.insert(0, {"role": "user", "parts": [stub]})
+        elif len(contents) > 1:
+            contents[0] = {"role": "user", "parts": [stub] + contents[0]["parts"]}
+        else:
+            # Only the newest message fits. The client checks its first part for the
+            # "(System Observation)" marker, so the stub goes after its parts instead.
+            contents[0] = {"role": "user", "parts": contents[0]["parts"] + [stub]}
+        used += estimate_text_tokens(stub["text"])
+
+    return HistoryWindow(contents, used, budget, trimmed)
@@ -0,0 +1,132 @@
+# --- utils/image_encoder.py ---
+"""
+Turns a screen grab into an upload that fits a byte budget.
+
+Frames are downscaled to a long-edge limit first. Then the cheapest encoding
+that fits the budget wins: lossless PNG when a sample of the frame says it will
+fit (flat UIs and text usually do), otherwise JPEG with the quality stepped
+down until it fits, WebP at the lowest quality if JPEG can't get there, and a
+further downscale as the last resort. Pillow is imported on first use; without
+it frames go out as full-size PNG from mss, like before.
+"""
+import io
+
+from utils import screen_capture
+
+DEFAULT_MAX_EDGE = 1920        # px; Gemini scales large images down anyway
+DEFAULT_BYTE_BUDGET = 800_000  # Bytes before base64 (which adds a third)
+JPEG_QUALITIES = (90, 80, 70, 60, 50, 40)
+PNG_SAMPLE_BANDS = 4           # Horizontal bands PNG-encoded to estimate the full frame's size
+PNG_SAMPLE_FRACTION = 0.25     # Share of the rows those bands cover
+FALLBACK_SCALE = 0.75          # Downscale step when even the smallest lossy encoding is too big
+MIN_EDGE = 640
+
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+_pillow = None
+
+
+def _load_pillow():
+    """The PIL.Image module, or False when Pillow isn't installed."""
+    global _pillow
+    if _pillow is None:
+        try:
+            from PIL import Image, features
+            _pillow = Image if features.check("jpg") else False
+        except ImportError:
+            _pillow = False
+        if not _pillow:
+            print("[CAPTURE] Pillow not available, uploading full-size PNG.")
+    return _pillow
+
+
+class EncodedImage:
+    __slots__ = ("data", "format", "size", "quality")
+
+    def __init__(self, data, format, size, quality=None):
+        self.data = data
+        self.format = format   # "PNG", "JPEG" or "WEBP"
+        self.size = size       # (width, height) after downscaling
+        self.quality = quality # None for PNG
+
+    @property
+    def mime_type(self):
+        return MIME_TYPES[self.format]
+
+    @property
+    def extension(self):
+        return self.format.lower()
+
+    def describe(self):
+        """e.g. 'JPEG q80 1920x1080, 312 KB'"""
+        quality = f" q{self.quality}" if self.quality else ""
+        return f"{self.format}{quality} {self.size[0]}x{self.size[1]}, {len(self.data) // 1024} KB"
+
+
+class ImageEncoder:
+    def __init__(self, max_edge=DEFAULT_MAX_EDGE, byte_budget=DEFAULT_BYTE_BUDGET):
+        """max_edge 0 keeps the full resolution; byte_budget 0 always sends lossless PNG."""
+        self.max_edge = max_edge
+        self.byte_budget = byte_budget
+
+    def encode(self, shot):
+        """Encodes an mss screenshot. Returns an EncodedImage."""
+        Image = _load_pillow()
+        if not Image:
+            return EncodedImage(screen_capture.encode_png(shot), "PNG", tuple(shot.size))
+        # mss pixels are BGRA; Pillow reads them as they are, no RGB copy from mss needed
+        image = Image.frombuffer("RGB", tuple(shot.size), shot.raw, "raw", "BGRX", 0, 1)
+        image = self._downscale(Image, image, self.max_edge)
+        if not self.byte_budget:
+            return self._save(image, "PNG")
+        while True:
+            encoded = self._fit(image)
+            if len(encoded.data) <= self.byte_budget or max(image.size) * FALLBACK_SCALE < MIN_EDGE:
+                return encoded # Over budget only when the frame can't shrink any further
+            image = self._downscale(Image, image, int(max(image.size) * FALLBACK_SCALE))
+
+    def _fit(self, image):
+        if self._png_estimate(image) <= self.byte_budget:
+            png = self._save(image, "PNG")
+            if len(png.data) <= self.byte_budget:
+                return png
+        for quality in JPEG_QUALITIES:
+            jpeg = self._save(image, "JPEG", quality)
+            if len(jpeg.data) <= self.byte_budget:
+                return jpeg
+        try: # WebP gets the same quality into about a fifth fewer bytes, but encodes far slower
+            webp = self._save(image, "WEBP", JPEG_QUALITIES[-1])
+        except (KeyError, OSError): # Pillow built without WebP
+            return jpeg
+        return webp if len(webp.data) < len(jpeg.data) else jpeg
+
+    def _png_estimate(self, image):
+        """The PNG size of the frame, extrapolated from a few bands of rows spread over it."""
+        width, height = image.size
+        band = max(1, int(height * PNG_SAMPLE_FRACTION / PNG_SAMPLE_BANDS))
+        step = height // PNG_SAMPLE_BANDS
+        sampled = 0
+        for i in range(PNG_SAMPLE_BANDS):
+            top = i * step + (step - band) // 2
+            sampled += len(self._save(image.crop((0, top, width, top + band)), "PNG").data)
+        return sampled * height / (band * PNG_SAMPLE_BANDS)
+
+    @staticmethod
+    def _downscale(Image, image, max_edge):
+        width, height = image.size
+        if not max_edge or max(width, height) <= max_edge:
+            return image
+        scale = max_edge / max(width, height)
+        # reducing_gap box-filters most of the way first, which keeps this fast on 4K frames
+        return image.resize((round(width * scale), round(height * scale)), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+    @staticmethod
+    def _save(image, format, quality=None):
+        buffer = io.BytesIO()
+        if format == "PNG":
+            image.save(buffer, format, compress_level=1) # Fast; the budget, not zlib, sets the size
+        elif format == "WEBP":
+            image.save(buffer, format, quality=quality, method=0)
+        else:
+            image.save(buffer, format, quality=quality)
+        return EncodedImage(buffer.getvalue(), format, image.size, quality)
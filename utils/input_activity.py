@@ -0,0 +1,146 @@
+# --- utils/input_activity.py ---
+"""
+Knows when the user last touched the keyboard or mouse anywhere on the system,
+not just in the overlay, and roughly how busy they are.
+
+It hooks the global `keyboard` listener (already running for the hotkeys) and
+the `mouse` package when it is installed. Each source has its own channel that
+only its hook thread writes to, so the per-event work is a few float stores and
+no lock: the time of the event and an exponentially decayed count of actions.
+Key presses and mouse clicks are actions; key releases are not, and moves and
+wheel turns count at most once per MOVE_SAMPLE_S, so a wiggle of the mouse
+doesn't read as a busy user. The readers (Autopilot, the Tk thread) turn those into seconds idle and events per
+minute. On Windows, GetLastInputInfo fills in for the mouse when there is no
+mouse hook.
+"""
+import importlib
+import math
+import sys
+import time
+
+RATE_HALF_LIFE_S = 20.0 # How fast the activity rate forgets a burst
+BUSY_EVENTS_PER_MIN = 40.0 # At or above this the user is in the middle of something
+MOVE_SAMPLE_S = 0.25 # Mouse moves and wheel turns count towards the rate at most this often
+
+# What an event does to the rate (every event counts as input for the idle time)
+NOT_COUNTED, COUNTED, SAMPLED = range(3)
+
+
+def _key_action(event):
+    """Key presses count; releases don't, or every key would count twice."""
+    return COUNTED if getattr(event, "event_type", "down") == "down" else NOT_COUNTED
+
+
+def _mouse_action(event):
+    """Button presses count; moves and wheel turns (no button) are sampled."""
+    if hasattr(event, "button"):
+        return COUNTED if event.event_type == "down" else NOT_COUNTED
+    return SAMPLED
+
+
+class _Channel:
+    """Activity from one input source. Only that source's hook thread writes to it."""
+    __slots__ = ("name", "action", "last", "counted_at", "decayed", "half_life")
+
+    def __init__(self, name, half_life, action=_key_action):
+        self.name = name
+        self.action = action     # event -> NOT_COUNTED, COUNTED or SAMPLED
+        self.last = None         # time.monotonic() of the latest event
+        self.counted_at = -math.inf # Time of the latest event counted towards the rate
+        self.decayed = 0.0       # Counted events, halved every half_life seconds, as of counted_at
+        self.half_life = half_life
+
+    def on_event(self, event=None):
+        now = time.monotonic()
+        self.last = now
+        action = self.action(event)
+        if action == NOT_COUNTED or (action == SAMPLED and now - self.counted_at < MOVE_SAMPLE_S):
+            return
+        self.decayed = self.decayed * 0.5 ** ((now - self.counted_at) / self.half_life) + 1.0
+        self.counted_at = now
+
+    def rate_per_min(self, now):
+        counted_at, decayed = self.counted_at, self.decayed # A torn read only skews one estimate a little
+        # A decayed count of N with half-life h is N * ln2 / h events per second
+        return decayed * 0.5 ** ((now - counted_at) / self.half_life) * math.log(2) / self.half_life * 60
+
+
+_ACTIONS = {"keyboard": _key_action, "mouse": _mouse_action}
+
+
+class InputActivityMonitor:
+    def __init__(self, half_life=RATE_HALF_LIFE_S, busy_rate=BUSY_EVENTS_PER_MIN):
+        self.half_life = half_life
+        self.busy_rate = busy_rate
+        self.channels = []
+        self._unhooks = []
+        self._started = None # No input before start() counts as idle since then
+
+    def start(self):
+        """Installs the hooks. Safe to call when keyboard or mouse can't hook on this system."""
+        if self._started is not None:
+            return
+        self._started = time.monotonic()
+        for name in ("keyboard", "mouse"):
+            try:
+                module = importlib.import_module(name)
+                channel = _Channel(name, self.half_life, _ACTIONS[name])
+                module.hook(channel.on_event)
+            except Exception as e: # Not installed, or no permission to hook (e.g. Linux without root)
+                print(f"[INPUT] No {name} hook: {e}")
+                continue
+            self.channels.append(channel)
+            self._unhooks.append(lambda module=module, callback=channel.on_event: module.unhook(callback))
+        print(f"[INPUT] Watching {', '.join(c.name for c in self.channels) or 'nothing'} for activity.")
+
+    def stop(self):
+        for unhook in self._unhooks:
+            try:
+                unhook()
+            except Exception:
+                pass
+        self._unhooks = []
+        self.channels = []
+        self._started = None
+
+    def seconds_since_input(self):
+        """Seconds since the last keyboard or mouse event anywhere, or None when nothing is watched."""
+        now = time.monotonic()
+        lasts = [c.last for c in self.channels if c.last is not None]
+        if self._started is not None: # Before start() or after stop() only the system idle time is known
+            lasts.append(self._started)
+        system_idle = None if any(c.name == "mouse" for c in self.channels) else _system_idle_seconds()
+        if system_idle is not None:
+            lasts.append(now - system_idle)
+        elif not self.channels:
+            return None
+        return max(0.0, now - max(lasts))
+
+    def rate_per_min(self):
+        """Recent input events per minute, all sources together."""
+        now = time.monotonic()
+        return sum(c.rate_per_min(now) for c in self.channels)
+
+    def is_busy(self):
+        return self.rate_per_min() >= self.busy_rate
+
+    def describe(self):
+        """e.g. 'idle 12s, 85 events/min'"""
+        idle = self.seconds_since_input()
+        return f"idle {'unknown' if idle is None else f'{idle:.0f}s'}, {self.rate_per_min():.0f} events/min"
+
+
+def _system_idle_seconds():
+    """Seconds since any input, from Windows' GetLastInputInfo; None elsewhere or on failure."""
+    if sys.platform != "win32":
+        return None
+    import ctypes
+
+    class LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+    info = LASTINPUTINFO(ctypes.sizeof(LASTINPUTINFO))
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        return None
+    # Both are milliseconds on a 32-bit tick counter that wraps every 49.7 days
+    return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000.0
@@ -0,0 +1,131 @@
+# --- utils/resilience.py ---
+"""
+Retry, backoff and model fallback for the Gemini client.
+
+Only the part of a request before the first chunk is retried: once text has
+reached the chat, a retry would repeat it. 429s and 5xx are retried with
+jittered exponential backoff (honouring Retry-After), and when a model keeps
+failing the client can move on to the next one in the fallback chain.
+Every attempt is recorded in an AttemptLog so tail latencies can be analysed.
+"""
+import email.utils
+import random
+import time
+from collections import deque
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+FALLBACK_STATUSES = RETRY_STATUSES | {404} # 404: the model is gone or not enabled for this key
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, max_retry_after=30.0,
+                 connect_timeout=5.0, first_byte_timeout=45.0, read_timeout=30.0):
+        self.max_attempts = max_attempts       # Per model, including the first try
+        self.base_delay = base_delay           # Seconds; doubles with every retry
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after # A longer Retry-After skips ahead to the next model
+        self.connect_timeout = connect_timeout
+        self.first_byte_timeout = first_byte_timeout # Until the first body chunk arrives
+        self.read_timeout = read_timeout       # Between two chunks once the reply is flowing
+
+    def httpx_timeout(self):
+        import httpx # Only needed once the HTTP client is created
+        return httpx.Timeout(connect=self.connect_timeout, read=self.read_timeout,
+                             write=self.read_timeout, pool=self.connect_timeout)
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry number 'attempt' (1-based): full jitter, at least Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AttemptFailure(Exception):
+    """One failed attempt, classified for the retry loop."""
+    def __init__(self, message, status=None, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+    @property
+    def fallback_worthy(self):
+        return self.retryable or self.status in FALLBACK_STATUSES
+
+
+def classify(exc):
+    """Turns an exception from one attempt into an AttemptFailure with the user-facing message."""
+    if isinstance(exc, AttemptFailure):
+        return exc
+    import httpx # Already loaded by the client that raised
+    if isinstance(exc, httpx.HTTPStatusError):
+        response = exc.response
+        return AttemptFailure(
+            f"Error: API returned an HTTP error: {response.status_code} {response.reason_phrase}. Check your API key and model name.",
+            status=response.status_code,
+            retryable=response.status_code in RETRY_STATUSES,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+        )
+    if isinstance(exc, httpx.TimeoutException):
+        return AttemptFailure("Error: The request to the API timed out.", retryable=True)
+    if isinstance(exc, httpx.ConnectError):
+        return AttemptFailure("Error: Could not connect to the API. Please check your internet connection.", retryable=True)
+    if isinstance(exc, httpx.HTTPError):
+        return AttemptFailure(f"Error: An unexpected API request error occurred: {exc}", retryable=True)
+    return AttemptFailure(f"Error: An unexpected error occurred in the Gemini client: {exc}")
+
+
+class AttemptRecord:
+    __slots__ = ("time", "model", "attempt", "outcome", "status", "elapsed", "delay")
+
+    def __init__(self, model, attempt, outcome, status, elapsed, delay):
+        self.time = time.time()
+        self.model = model
+        self.attempt = attempt
+        self.outcome = outcome # "ok", "retry", "fallback" or "failed"
+        self.status = status
+        self.elapsed = elapsed # Seconds from sending the request to the first chunk (or the failure)
+        self.delay = delay     # Backoff slept before the next attempt
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class AttemptLog:
+    """The last few hundred attempts, newest last."""
+    def __init__(self, maxlen=500):
+        self.records = deque(maxlen=maxlen)
+
+    def record(self, model, attempt, outcome, status=None, elapsed=0.0, delay=0.0):
+        self.records.append(AttemptRecord(model, attempt, outcome, status, elapsed, delay))
+        if outcome != "ok":
+            print(f"[RESILIENCE] {model} attempt {attempt}: {outcome} (status {status}, "
+                  f"{elapsed * 1000:.0f} ms, next wait {delay:.2f}s)")
+
+    def counts(self):
+        totals = {}
+        for record in self.records:
+            totals[record.outcome] = totals.get(record.outcome, 0) + 1
+        return totals
+
+    def percentile(self, fraction, outcome="ok"):
+        """Time-to-first-chunk percentile (e.g. 0.95) over the recorded attempts, in seconds."""
+        values = sorted(r.elapsed for r in self.records if r.outcome == outcome)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(len(values) * fraction))]
@@ -0,0 +1,166 @@
+# --- utils/response_cache.py ---
+"""
+Optional cache for streamed replies to repeated prompts.
+
+A reply is keyed by everything that shapes it: the model, the full system
+instruction, the (already trimmed) history and a digest of the screenshot.
+Entries live in an in-memory LRU and in a small on-disk tier under the user's
+cache directory, and both tiers expire after a TTL.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = 3600
+
+
+def default_cache_dir():
+    """The per-user cache directory for this app, following each platform's convention."""
+    if sys.platform == "win32":
+        base = os.getenv("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, "OverlayCutex", "Cache", "responses")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/OverlayCutex/responses")
+    base = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "overlay-cutex", "responses")
+
+
+class ResponseCache:
+    def __init__(self, max_entries=64, max_memory_bytes=2_000_000, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 directory=None, max_disk_bytes=20_000_000):
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self.directory = directory if directory is not None else default_cache_dir()
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict() # key -> (created, chunks, size); most recently used last
+        self._memory_bytes = 0
+        self._lock = threading.Lock() # get/put run on worker threads so disk I/O stays off the event loop
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_id, system_instruction, contents, image_data=None):
+        """Hashes everything that determines the reply into a hex key."""
+        h = hashlib.sha256()
+        h.update(model_id.encode("utf-8") + b"\0")
+        h.update(system_instruction.encode("utf-8") + b"\0")
+        h.update(json.dumps(contents, sort_keys=True, separators=(",", ":")).encode("utf-8") + b"\0")
+        if image_data:
+            h.update(hashlib.sha256(image_data).digest())
+        return h.hexdigest()
+
+    def get(self, key):
+        """Returns the cached list of text chunks, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, chunks, _ = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return chunks
+                self._drop(key)
+
+            record = self._read_disk(key, now)
+            if record is None:
+                self.misses += 1
+                return None
+            created, chunks = record
+            self._remember(key, created, chunks)
+            self.hits += 1
+            return chunks
+
+    def put(self, key, chunks):
+        chunks = list(chunks)
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, chunks)
+            self._write_disk(key, created, chunks)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            for name in self._disk_files():
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    # --- Memory tier ---
+
+    def _remember(self, key, created, chunks):
+        if key in self._entries:
+            self._drop(key)
+        size = sum(len(c) for c in chunks)
+        self._entries[key] = (created, chunks, size)
+        self._memory_bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._memory_bytes > self.max_memory_bytes):
+            self._drop(next(iter(self._entries))) # Least recently used
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._memory_bytes -= size
+
+    # --- Disk tier ---
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _disk_files(self):
+        try:
+            return [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        except OSError:
+            return []
+
+    def _read_disk(self, key, now):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            created, chunks = record["created"], record["chunks"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if now - created > self.ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return created, chunks
+
+    def _write_disk(self, key, created, chunks):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(key), "w", encoding="utf-8") as f:
+                json.dump({"created": created, "chunks": chunks}, f)
+            self._trim_disk()
+        except OSError as e:
+            print(f"[CACHE] Could not write the disk cache: {e}")
+
+    def _trim_disk(self):
+        """Deletes the oldest files until the disk tier is under its size cap."""
+        files = []
+        total = 0
+        for name in self._disk_files():
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        files.sort()
+        while files and total > self.max_disk_bytes:
+            _, size, path = files.pop(0)
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,85 @@
+# --- utils/screen_capture.py ---
+"""
+Screen capture helpers that keep frames in memory. The grab itself happens on
+the CaptureService thread; frames only touch the disk when the user turned on
+"Keep Captures".
+
+The overlay doesn't have to hide for a capture: on Windows 10 2004+ its window
+can be left out of captures altogether, and elsewhere its rectangle is masked
+out of the frame before the frame is diffed or encoded.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+
+CAPTURES_DIR = "captures"
+_capture_counter = itertools.count(1)
+
+WDA_NONE = 0x00
+WDA_EXCLUDEFROMCAPTURE = 0x11 # Windows 10 2004+: the window is simply not in screenshots
+MASK_RING_PX = 6 # Width of the border around a masked rectangle that picks its fill colour
+
+
+def encode_png(shot):
+    import mss.tools
+    # With no output path, to_png() returns the encoded bytes instead of writing a file
+    return mss.tools.to_png(shot.rgb, shot.size)
+
+
+def exclude_window(hwnd, excluded=True):
+    """
+    Asks Windows to leave a top-level window out of screen captures (or put it back).
+    Returns True when that worked; False on other platforms and older Windows builds.
+    """
+    if sys.platform != "win32" or not hwnd:
+        return False
+    import ctypes
+    affinity = WDA_EXCLUDEFROMCAPTURE if excluded else WDA_NONE
+    return bool(ctypes.windll.user32.SetWindowDisplayAffinity(hwnd, affinity))
+
+
+def mask_rect(shot, rect):
+    """
+    Paints a screen rectangle (left, top, width, height) out of an mss screenshot, in
+    place, before anything reads its pixels. The hole gets the median colour of a thin
+    ring around it, so it looks like background rather than a black box.
+    Returns False when the rectangle isn't in the shot.
+    """
+    left, top, width, height = rect
+    x0, y0 = max(0, left - shot.left), max(0, top - shot.top)
+    x1, y1 = min(shot.width, left + width - shot.left), min(shot.height, top + height - shot.top)
+    if x0 >= x1 or y0 >= y1:
+        return False
+    import numpy as np
+    pixels = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+    ring_x0, ring_y0 = max(0, x0 - MASK_RING_PX), max(0, y0 - MASK_RING_PX)
+    ring_x1, ring_y1 = min(shot.width, x1 + MASK_RING_PX), min(shot.height, y1 + MASK_RING_PX)
+    ring = [pixels[ring_y0:y0, ring_x0:ring_x1], pixels[y1:ring_y1, ring_x0:ring_x1],
+            pixels[y0:y1, ring_x0:x0], pixels[y0:y1, x1:ring_x1]]
+    ring = np.concatenate([strip.reshape(-1, 4) for strip in ring])
+    fill = np.median(ring, axis=0).astype(np.uint8) if len(ring) else np.array((128, 128, 128, 255), np.uint8)
+    # One 32-bit store per pixel instead of four byte stores
+    np.frombuffer(shot.raw, dtype=np.uint32).reshape(shot.height, shot.width)[y0:y1, x0:x1] = fill.view(np.uint32)[0]
+    return True
+
+
+def save_capture(image_data, directory=CAPTURES_DIR, extension="png"):
+    """
+    Writes a capture to disk on a background thread. Every file gets a unique
+    timestamped name, so overlapping captures never overwrite each other.
+    """
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"capture_{stamp}_{next(_capture_counter):04d}.{extension}")
+
+    def _write():
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(image_data)
+            print(f"[CAPTURE] Saved {len(image_data) // 1024} KB to {path}")
+        except OSError as e:
+            print(f"[CAPTURE] Could not save capture: {e}")
+
+    threading.Thread(target=_write, daemon=True).start()
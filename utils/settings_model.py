@@ -0,0 +1,152 @@
+# --- utils/settings_model.py ---
+"""
+The app's persisted settings as plain Python values.
+
+Loading, validation and saving need no Tk widgets or variables, so the app can
+read its settings before any window exists, and the settings dashboard (built
+the first time it is opened) only copies them into its form and back.
+"""
+import json
+import os
+import time
+
+from utils import frame_diff, history_window, image_encoder
+from utils.response_cache import DEFAULT_TTL_SECONDS
+
+SETTINGS_FILE = "settings.json"
+DEFAULT_MODEL = "gemini-3-flash-preview"
+DEFAULT_RENDER_FPS = 60 # While a reply streams in; ui.render_scheduler reads both defaults from here
+DEFAULT_TYPEWRITER_CPS = 300 # Characters per second; 0 shows text as soon as it arrives
+DEFAULT_PERSONA = "You are TARS from the movie Interstellar. You are a former U.S. Marine Corps tactical robot. Your personality is witty, sarcastic, and humorous. You were programmed this way to be a better companion. Keep your answers brief, well-formatted, and to the point. Use Markdown for clarity."
+
+# Key -> (default, check). A loaded value that fails its check is replaced by the default.
+FIELDS = {
+    "theme": ("dark", lambda v: v in ("dark", "light")),
+    "model": (DEFAULT_MODEL, lambda v: isinstance(v, str)),
+    "persona": (DEFAULT_PERSONA, lambda v: isinstance(v, str)),
+    "share_context": (True, lambda v: isinstance(v, bool)),
+    "keep_captures": (False, lambda v: isinstance(v, bool)),
+    "capture_in_place": (True, lambda v: isinstance(v, bool)), # Capture with the overlay still up
+    "response_cache_enabled": (False, lambda v: isinstance(v, bool)),
+    "response_cache_ttl_seconds": (DEFAULT_TTL_SECONDS, lambda v: isinstance(v, int) and v > 0),
+    "model_fallback_enabled": (False, lambda v: isinstance(v, bool)),
+    "api_key": ("", lambda v: isinstance(v, str)),
+    "autopilot_intervals": ([120, 200, 360, 260, 300],
+                            lambda v: isinstance(v, list) and bool(v) and all(isinstance(i, int) and i > 0 for i in v)),
+    "autopilot_cooldown_seconds": (50, lambda v: isinstance(v, int) and v > 0),
+    "autopilot_activity_threshold": (frame_diff.DEFAULT_ACTIVITY_THRESHOLD, lambda v: isinstance(v, (int, float)) and 0 <= v <= 1),
+    "history_token_budget": (history_window.DEFAULT_TOKEN_BUDGET, lambda v: isinstance(v, int) and v >= 1000),
+    "screen_change_threshold": (frame_diff.DEFAULT_THRESHOLD, lambda v: isinstance(v, (int, float)) and 0 <= v <= 1),
+    "image_max_edge": (image_encoder.DEFAULT_MAX_EDGE, lambda v: isinstance(v, int) and v >= 0), # 0 = full resolution
+    "image_byte_budget_kb": (image_encoder.DEFAULT_BYTE_BUDGET // 1000, lambda v: isinstance(v, int) and v >= 0), # 0 = lossless
+    "render_fps": (DEFAULT_RENDER_FPS, lambda v: isinstance(v, int) and 1 <= v <= 240),
+    "typewriter_cps": (DEFAULT_TYPEWRITER_CPS, lambda v: isinstance(v, int) and v >= 0),
+}
+
+
+class Settings:
+    def __init__(self, **values):
+        for key, (default, _) in FIELDS.items():
+            value = values.get(key, default)
+            setattr(self, key, list(value) if isinstance(value, list) else value)
+
+    @classmethod
+    def load(cls, path=SETTINGS_FILE):
+        """
+        Reads the settings file. Returns (settings, needs_save): needs_save is True when the
+        file was missing or unreadable or a value had to be reset, so it is worth rewriting.
+        """
+        try:
+            with open(path, 'r') as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            stored = None
+        needs_save = not isinstance(stored, dict)
+        if needs_save:
+            stored = {}
+
+        values = {}
+        for key, (default, check) in FIELDS.items():
+            if key not in stored:
+                continue
+            if check(stored[key]):
+                values[key] = stored[key]
+            else:
+                needs_save = True
+        settings = cls(**values)
+        settings.api_key = settings.api_key.strip()
+        if not settings.api_key: # Favor the file but fall back to .env
+            settings.api_key = (os.getenv("GEMINI_API_KEY") or "").strip()
+        return settings, needs_save
+
+    def save(self, path=SETTINGS_FILE):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+        print(f"[SETTINGS] Configuration persisted to {path} at {time.strftime('%H:%M:%S')}")
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in FIELDS}
+
+    # --- The dashboard's text fields ---
+
+    def form_values(self):
+        """The values the dashboard's entry fields show, as strings."""
+        return {
+            "api_key": self.api_key,
+            "persona": self.persona,
+            "autopilot_intervals": ", ".join(map(str, self.autopilot_intervals)),
+            "autopilot_cooldown_seconds": str(self.autopilot_cooldown_seconds),
+            "autopilot_activity_threshold": str(self.autopilot_activity_threshold),
+            "history_token_budget": str(self.history_token_budget),
+            "screen_change_threshold": str(self.screen_change_threshold),
+            "image_max_edge": str(self.image_max_edge),
+            "image_byte_budget_kb": str(self.image_byte_budget_kb),
+            "render_fps": str(self.render_fps),
+            "typewriter_cps": str(self.typewriter_cps),
+        }
+
+    def apply_form(self, form):
+        """
+        Validates the dashboard's strings and stores them. Raises ValueError with a message for
+        the user and changes nothing when any field is invalid.
+        """
+        cooldown = int(form["autopilot_cooldown_seconds"].strip())
+        if cooldown <= 0:
+            raise ValueError("Cooldown must be a positive number.")
+
+        activity = float(form["autopilot_activity_threshold"].strip())
+        if not 0 <= activity <= 1:
+            raise ValueError("Autopilot activity threshold must be between 0 and 1.")
+
+        budget = int(form["history_token_budget"].strip())
+        if budget < 1000:
+            raise ValueError("History budget must be at least 1000 tokens.")
+
+        threshold = float(form["screen_change_threshold"].strip())
+        if not 0 <= threshold <= 1:
+            raise ValueError("Screen change threshold must be between 0 and 1.")
+
+        max_edge = int(form["image_max_edge"].strip())
+        byte_budget_kb = int(form["image_byte_budget_kb"].strip())
+        if max_edge < 0 or byte_budget_kb < 0:
+            raise ValueError("Screenshot size and budget must be 0 or more.")
+
+        fps = int(form["render_fps"].strip())
+        cps = int(form["typewriter_cps"].strip())
+        if not 1 <= fps <= 240 or cps < 0:
+            raise ValueError("Render FPS must be 1-240 and typewriter speed 0 or more.")
+
+        intervals = [int(x.strip()) for x in form["autopilot_intervals"].split(',') if x.strip()]
+        if not intervals or any(i <= 0 for i in intervals):
+            raise ValueError("Intervals must be positive numbers.")
+
+        self.autopilot_cooldown_seconds = cooldown
+        self.autopilot_activity_threshold = activity
+        self.history_token_budget = budget
+        self.screen_change_threshold = threshold
+        self.image_max_edge, self.image_byte_budget_kb = max_edge, byte_budget_kb
+        self.render_fps, self.typewriter_cps = fps, cps
+        self.autopilot_intervals = intervals
+        self.persona = form["persona"].strip()
+        self.api_key = form["api_key"].strip()
+
@@ -0,0 +1,121 @@
+# --- utils/sse_parser.py ---
+"""
+Incremental Server-Sent Events parser for the Gemini streaming API.
+
+Works directly on the raw bytes coming off the socket: lines are located with
+bytes.find() and handed to the JSON decoder as memoryview slices, so nothing is
+decoded to str or copied just to strip the "data: " prefix.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_json_decode = json.JSONDecoder().decode
+
+def _stdlib_loads(data):
+    # The stdlib decoder wants str; decoding straight from the buffer skips a bytes copy
+    return _json_decode(str(data, "utf-8"))
+
+
+JSON_BACKENDS = {"json": _stdlib_loads}
+if orjson is not None:
+    JSON_BACKENDS["orjson"] = orjson.loads # Takes memoryview as-is, no copy
+
+
+def get_json_loads(backend="auto"):
+    """Returns a loads() callable. 'auto' picks orjson when it is installed."""
+    if backend == "auto":
+        backend = "orjson" if "orjson" in JSON_BACKENDS else "json"
+    try:
+        return JSON_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown JSON backend '{backend}'. Available: {', '.join(JSON_BACKENDS)}")
+
+
+class SSEParser:
+    """
+    Feed it raw byte chunks in any size; it returns the decoded JSON of every
+    event completed by that chunk. Events made of several 'data:' lines are
+    joined with newlines, as the SSE spec requires.
+    """
+    def __init__(self, json_backend="auto"):
+        self.loads = get_json_loads(json_backend)
+        self._tail = b""        # Incomplete last line from the previous chunk
+        self._data_lines = []   # 'data:' payloads of the event being built
+
+    def feed(self, chunk):
+        """Consumes a chunk of bytes and returns a list of decoded events."""
+        if not isinstance(chunk, bytes):
+            chunk = bytes(chunk) # Slices below must not see the caller mutate it
+        buf = self._tail + chunk if self._tail else chunk
+        view = memoryview(buf)
+        events = []
+        pos = 0
+        while True:
+            newline = buf.find(b"\n", pos)
+            if newline < 0:
+                break
+            end = newline
+            if end > pos and buf[end - 1] == 13: # Strip the \r of a \r\n
+                end -= 1
+
+            if end == pos:
+                # A blank line dispatches the event
+                if self._data_lines:
+                    events.append(self._dispatch())
+            elif buf.startswith(b"data:", pos):
+                start = pos + 5
+                if start < end and buf[start] == 32: # One optional space after the colon
+                    start += 1
+                self._data_lines.append(view[start:end])
+            # Comments (':...') and the event/id/retry fields are not used by Gemini
+
+            pos = newline + 1
+
+        self._tail = buf[pos:]
+        return events
+
+    def flush(self):
+        """Returns the events left unterminated when the stream closed."""
+        events = self.feed(b"\n") if self._tail else [] # Can complete an event, e.g. after a trailing \r\n\r
+        if self._data_lines:
+            events.append(self._dispatch())
+        return events
+
+    def _dispatch(self):
+        lines = self._data_lines
+        self._data_lines = []
+        data = lines[0] if len(lines) == 1 else b"\n".join(lines)
+        try:
+            return self.loads(data)
+        except ValueError: # Covers json.JSONDecodeError and orjson.JSONDecodeError
+            print("Warning: Skipping malformed data chunk from API stream.")
+            return None
+
+
+def iter_text_parts(event):
+    """Yields every text part of a Gemini stream event, not just parts[0]."""
+    if not isinstance(event, dict):
+        return
+    if "error" in event:
+        error = event["error"]
+        message = error.get("message", error) if isinstance(error, dict) else error
+        yield f"Error: The API reported a problem mid-stream: {message}"
+        return
+    for candidate in event.get("candidates", ())[:1]:
+        for part in candidate.get("content", {}).get("parts", ()):
+            text = part.get("text")
+            if text:
+                yield text
+
+
+def finish_reason(event):
+    """The candidate's finishReason ('STOP', 'MAX_TOKENS', ...) if this event carries one."""
+    if not isinstance(event, dict):
+        return None
+    candidates = event.get("candidates") or [{}]
+    return candidates[0].get("finishReason")
@@ -0,0 +1,93 @@
+# --- utils/startup_profiler.py ---
+"""
+Startup timing for `python main.py --profile-startup`.
+
+Import this first: it notes the start time, can time every module import from
+then on (inclusive of what that module imports itself), and records named marks
+such as the first painted frame. Heavy modules the app defers until first use
+can be warmed up on a background thread once the window is on screen.
+"""
+import builtins
+import sys
+import threading
+import time
+
+START = time.perf_counter()
+
+# Deferred until first use; imported in the background after the first frame
+WARM_MODULES = ("httpx", "numpy", "mss", "mss.tools", "pygments.lexers", "PIL.Image")
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.imports = [] # (seconds, depth, name) for modules loaded while timing was on
+        self.marks = []   # (label, seconds since START)
+        self._original_import = None
+        self._depth = 0
+
+    def time_imports(self):
+        """Wraps __import__ so each newly loaded module's import time is recorded."""
+        if self._original_import is not None:
+            return
+        self._original_import = original = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules or threading.current_thread() is not threading.main_thread():
+                return original(name, globals, locals, fromlist, level)
+            depth = self._depth
+            self._depth += 1
+            start = time.perf_counter()
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                self._depth = depth
+                self.imports.append((time.perf_counter() - start, depth, name))
+
+        builtins.__import__ = timed_import
+
+    def stop_timing_imports(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - START))
+
+    def mark_first_frame(self, widget, on_done=None):
+        """Marks 'first frame' when 'widget' is first painted (its first <Expose>)."""
+        def on_expose(event):
+            widget.unbind("<Expose>", binding)
+            self.mark("first frame")
+            if on_done:
+                on_done()
+        binding = widget.bind("<Expose>", on_expose, add="+")
+
+    def summary(self):
+        """A JSON-friendly dict: marks in ms, and top-level imports by cost."""
+        top = sorted((s, n) for s, d, n in self.imports if d == 0)[::-1]
+        return {
+            "marks_ms": {label: round(t * 1000, 1) for label, t in self.marks},
+            "imports_ms": {name: round(s * 1000, 1) for s, name in top},
+            "import_total_ms": round(sum(s for s, _ in top) * 1000, 1),
+        }
+
+    def report(self, limit=15):
+        summary = self.summary()
+        print(f"[STARTUP] Top-level imports: {summary['import_total_ms']:.1f} ms in total")
+        for name, ms in list(summary["imports_ms"].items())[:limit]:
+            print(f"[STARTUP]   {ms:8.1f} ms  {name}")
+        for label, ms in summary["marks_ms"].items():
+            print(f"[STARTUP] {label}: {ms:.1f} ms after start")
+
+
+def warm_up(modules=WARM_MODULES):
+    """Imports deferred modules on a daemon thread so first use doesn't pay for them."""
+    def run():
+        for name in modules:
+            try:
+                __import__(name)
+            except Exception: # Optional or platform-specific; the feature that needs it reports it
+                pass
+    thread = threading.Thread(target=run, name="import-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,79 @@
+# --- utils/stream_engine.py ---
+"""
+A single background asyncio event loop that runs every streaming request.
+Tkinter stays on the main thread and only ever talks to a StreamHandle:
+it reads chunks from handle.queue and can call handle.cancel() at any time.
+"""
+import asyncio
+import queue
+import threading
+
+
+class StreamHandle:
+    """The Tk-side view of one in-flight request."""
+    def __init__(self):
+        self.queue = queue.Queue() # Text chunks, then a None sentinel when the stream ends
+        self.cancelled = False
+        self._future = None
+
+    def cancel(self):
+        """Cancels the request. The HTTP stream is torn down on the loop thread right away."""
+        if self.cancelled:
+            return
+        self.cancelled = True
+        if self._future is not None:
+            # Cancelling the concurrent future cancels the asyncio task behind it,
+            # which unwinds the HTTP response context and closes the connection.
+            self._future.cancel()
+
+    @property
+    def done(self):
+        return self._future is not None and self._future.done()
+
+
+class StreamEngine:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="stream-engine", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, make_stream):
+        """
+        Starts make_stream() (a callable returning an async generator of text chunks)
+        on the loop and returns a StreamHandle for it. Safe to call from any thread.
+        """
+        handle = StreamHandle()
+        handle._future = asyncio.run_coroutine_threadsafe(self._pump(make_stream, handle), self.loop)
+        return handle
+
+    async def _pump(self, make_stream, handle):
+        try:
+            async for chunk in make_stream():
+                handle.queue.put(chunk)
+        except Exception as e: # Cancellation is not an Exception, so Stop still ends quietly
+            # Nobody reads the future, so a failure has to reach the chat as text
+            print(f"[ENGINE] Stream failed: {e!r}")
+            handle.queue.put(f"Error: The reply failed unexpectedly: {e}")
+        finally:
+            # Always unblock the reader, whether we finished, failed or were cancelled
+            handle.queue.put(None)
+
+    def run(self, coro, timeout=None):
+        """Runs a coroutine on the loop and waits for its result (e.g. closing the client)."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def close(self):
+        """Cancels whatever is still running and stops the loop thread."""
+        def _cancel_all():
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            # Give the cancelled tasks one pass to unwind before stopping
+            self.loop.call_soon(self.loop.stop)
+
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(_cancel_all)
+            self._thread.join(timeout=2)